@@ -0,0 +1,84 @@
+"""Haun hinnan skaalautuminen laudan koon N mukaan (NxN).
+
+Jokaiselle koolle pelataan vakioidulla siemenellä asemia (syvyyden 1 haulla)
+ja jokainen asema haetaan tyhjillä välimuisteilla kiinteällä syvyydellä
+(best_move_iterative, syvyydet 1..--depth, ei dynaamista syvyyttä).
+Raportoi ms/siirto, solmut/siirto, µs/solmu ja ajan kasvun edelliseen kokoon
+nähden. Kaikki koot käyttävät ruudukkohakua, joten luvut ovat vertailukelpoisia
+(4x4:llä on lisäksi bittilauta, ks. kernels.py).
+
+Käyttö:
+    python -m benchmarks.board_size --sizes 3 4 5 6 --depth 2 --positions 8
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import time
+from typing import List
+
+import src.expectiminimax as ex
+from src.board import GameState, new_game
+
+
+def sample_positions(size: int, n: int, seed: int = 0, every: int = 10) -> List[GameState]:
+    """Pelaa NxN-peliä vakioidulla siemenellä ja ota talteen joka every:s asema."""
+    random.seed(seed)
+    out = []
+    s = new_game(size=size)
+    i = 0
+    while len(out) < n:
+        if s.over:
+            s = new_game(size=size)
+        d, _ = ex.best_move_expecti(s, depth=1)
+        s.move(d)
+        i += 1
+        if i % every == 0:
+            out.append(s.copy())
+    return out
+
+
+def measure(positions: List[GameState], depth: int) -> dict:
+    """Hakee asemat syvyydellä depth ja palauttaa keskiarvot siirtoa kohden."""
+    elapsed = 0.0
+    nodes = evals = 0
+    for s in positions:
+        ex.cache.clear()
+        ex._eval_cache.clear()
+        t0 = time.perf_counter()
+        ex.best_move_iterative(s, max_depth=depth)
+        elapsed += time.perf_counter() - t0
+        nodes += ex._nodes
+        evals += len(ex._eval_cache)
+    n = len(positions)
+    return {
+        "ms": 1000 * elapsed / n,
+        "nodes": nodes / n,
+        "us_per_node": 1e6 * elapsed / nodes if nodes else 0.0,
+        "evals": evals / n,
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Mittaa haun hinnan laudan koon mukaan.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5, 6])
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--positions", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--every", type=int, default=10, help="ota joka n:s asema pelistä")
+    args = ap.parse_args(argv)
+
+    print(f"syvyys {args.depth}, {args.positions} asemaa/koko, ruudukkohaku")
+    print(f"{'N':>3}{'soluja':>8}{'ms/siirto':>11}{'solmua/siirto':>15}"
+          f"{'µs/solmu':>10}{'evalit':>9}{'kasvu':>8}")
+    prev = None
+    for size in args.sizes:
+        r = measure(sample_positions(size, args.positions, args.seed, args.every), args.depth)
+        growth = f"{r['ms'] / prev:.1f}x" if prev else "-"
+        print(f"{size:>3}{size * size:>8}{r['ms']:>11.2f}{r['nodes']:>15,.0f}"
+              f"{r['us_per_node']:>10.1f}{r['evals']:>9,.0f}{growth:>8}", flush=True)
+        prev = r["ms"]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
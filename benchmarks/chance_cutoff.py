@@ -0,0 +1,51 @@
+"""Todennäköisyysrajan (prob_cutoff) vertailu pelkkään kuuden solun ohennukseen.
+
+Jokainen kokoonpano pelaa samat siemennetyt pelit (tournament.run_tournament):
+- "ohennus": nykyinen haku syvyydellä --depth,
+- "raja": sama syvyys ja todennäköisyysraja --cutoff,
+- "raja+1": todennäköisyysraja ja yhtä syvempi haku.
+
+Raportoi pelivoiman (keskipisteet, ≥2048-osuus) sekä solmut ja ajan siirtoa
+kohden, joten näkee, riittääkö karsinnan säästö syvempään hakuun samassa ajassa.
+
+Käyttö:
+    python -m benchmarks.chance_cutoff --games 20 --depth 2 --cutoff 0.01 --workers 4
+"""
+
+from __future__ import annotations
+import argparse
+
+from src.tournament import Settings, TournamentStats, run_tournament
+
+
+def configs(depth: int, cutoff: float) -> dict:
+    return {
+        "ohennus": Settings(depth=depth),
+        "raja": Settings(depth=depth, prob_cutoff=cutoff),
+        "raja+1": Settings(depth=depth + 1, prob_cutoff=cutoff),
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Vertaa todennäköisyysrajaa pelkkään ohennukseen.")
+    ap.add_argument("--games", type=int, default=20)
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--cutoff", type=float, default=0.01)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    print(f"{args.games} peliä/kokoonpano, syvyys {args.depth}, raja {args.cutoff}")
+    print(f"{'kokoonpano':<10}{'syvyys':>7}{'pisteet':>10}{'≥2048':>8}"
+          f"{'solmua/siirto':>15}{'ms/siirto':>11}")
+    for name, settings in configs(args.depth, args.cutoff).items():
+        st = TournamentStats()
+        for r in run_tournament(args.games, settings, workers=args.workers, seed=args.seed):
+            st.add(r)
+        ms = 1000 * st.game_seconds / st.moves if st.moves else 0.0
+        print(f"{name:<10}{settings.depth:>7}{st.mean_score:>10.0f}{100 * st.tile_rate(2048):>7.0f}%"
+              f"{st.nodes_per_move:>15.0f}{ms:>11.2f}", flush=True)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
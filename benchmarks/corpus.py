@@ -0,0 +1,38 @@
+"""Kiinteä asemakorpus suorituskykymittauksiin.
+
+Asemat on poimittu yhdestä siemennetystä pelistä (random.seed(2048),
+bittilautahaku syvyydellä 2). Ne on tallennettu sellaisinaan, jotta
+korpus ei muutu, vaikka haku tai heuristiikka muuttuisi.
+"""
+
+from __future__ import annotations
+from typing import Dict, List
+
+Grid = List[List[int]]
+
+CORPUS: Dict[str, List[Grid]] = {
+    "early": [
+        [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2], [0, 2, 4, 16]],
+        [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]],
+        [[16, 16, 32, 16], [2, 4, 0, 0], [0, 4, 0, 0], [0, 0, 0, 0]],
+        [[64, 32, 16, 8], [0, 0, 2, 4], [0, 0, 0, 4], [2, 0, 0, 0]],
+    ],
+    "mid": [
+        [[0, 0, 0, 64], [0, 0, 8, 32], [2, 0, 256, 8], [2, 4, 16, 4]],
+        [[2, 4, 16, 32], [0, 8, 128, 256], [4, 32, 64, 16], [0, 4, 32, 2]],
+        [[4, 0, 8, 64], [2, 4, 16, 512], [0, 8, 32, 128], [0, 4, 4, 8]],
+        [[16, 32, 256, 4], [512, 128, 32, 2], [4, 8, 0, 0], [0, 2, 0, 0]],
+    ],
+    "late": [
+        [[16, 128, 1024, 32], [2, 0, 4, 32], [0, 2, 8, 2], [0, 0, 0, 0]],
+        [[64, 128, 1024, 64], [4, 64, 32, 16], [4, 4, 2, 2], [0, 4, 0, 0]],
+        [[64, 256, 1024, 64], [0, 16, 64, 32], [2, 4, 32, 2], [0, 0, 2, 4]],
+    ],
+}
+
+PHASES = tuple(CORPUS)
+
+
+def all_positions() -> List[Grid]:
+    """Kaikki korpuksen asemat (kopioina) vaiheittain järjestettynä."""
+    return [[r[:] for r in g] for phase in PHASES for g in CORPUS[phase]]
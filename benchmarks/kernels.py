@@ -0,0 +1,255 @@
+"""Kuumien ytimien mikrobenchmarkit ja regressiovahti.
+
+Mittaa kiinteällä asemakorpuksella (ks. corpus.py):
+- siirtofunktiot (grid_ops.MOVE_FUN ja bitboard.MOVE_FUN),
+- heuristiikat (evaluate ja evaluate_bitboard) ja n-tuple-verkon arvio,
+- board.compress_row_left,
+- GameState.move ja GameState.copy,
+- koko haun best_move_expecti kiinteillä syvyyksillä (grid ja bitboard)
+  erikseen alku-, keski- ja loppupelin asemille.
+
+Jokainen ydin ajetaan --repeat kertaa ja paras kierros raportoidaan
+(operaatiota/s, haulle myös solmuja/s). Tulokset voi tallentaa JSONiksi.
+Jos --baseline on annettu, ajo päättyy virhekoodiin 1, kun jonkin ytimen
+ops/s on pudonnut yli --threshold-osuuden tallennetusta lähtötasosta.
+
+Käyttö:
+    python -m benchmarks.kernels                          # vertaa baseline.json:iin
+    python -m benchmarks.kernels --out tulokset.json
+    python -m benchmarks.kernels --save-baseline          # päivitä lähtötaso
+    python -m benchmarks.kernels --filter search --repeat 3
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import src.expectiminimax as ex
+from src import bitboard, grid_ops, heuristics, ntuple
+from src.board import GameState, compress_row_left
+
+from .corpus import CORPUS, PHASES, all_positions
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Ydin: funktio, joka valmistelee yhden kierroksen ja palauttaa
+# (ajettava, operaatioiden määrä). Valmistelu ei kuulu mitattuun aikaan.
+Kernel = Callable[[], Tuple[Callable[[], Optional[int]], int]]
+
+
+def _grid_moves() -> Tuple[Callable[[], None], int]:
+    grids = all_positions()
+    funs = list(grid_ops.MOVE_FUN.values())
+
+    def run():
+        for g in grids:
+            for f in funs:
+                f(g)
+    return run, len(grids) * len(funs)
+
+
+def _bitboard_moves() -> Tuple[Callable[[], None], int]:
+    boards = [bitboard.encode(g) for g in all_positions()]
+    funs = list(bitboard.MOVE_FUN.values())
+
+    def run():
+        for b in boards:
+            for f in funs:
+                f(b)
+    return run, len(boards) * len(funs)
+
+
+def _evaluate() -> Tuple[Callable[[], None], int]:
+    grids = all_positions()
+    evaluate = heuristics.evaluate
+
+    def run():
+        for g in grids:
+            evaluate(g)
+    return run, len(grids)
+
+
+def _evaluate_bitboard() -> Tuple[Callable[[], None], int]:
+    boards = [bitboard.encode(g) for g in all_positions()]
+    evaluate = heuristics.evaluate_bitboard
+
+    def run():
+        for b in boards:
+            evaluate(b)
+    return run, len(boards)
+
+
+def _ntuple_evaluate() -> Tuple[Callable[[], None], int]:
+    boards = [bitboard.encode(g) for g in all_positions()]
+    evaluate = ntuple.NTupleNetwork().evaluate_bitboard
+
+    def run():
+        for b in boards:
+            evaluate(b)
+    return run, len(boards)
+
+
+def _compress_row_left() -> Tuple[Callable[[], None], int]:
+    rows = [r for g in all_positions() for r in g]
+
+    def run():
+        for r in rows:
+            compress_row_left(r)
+    return run, len(rows)
+
+
+def _state_copy() -> Tuple[Callable[[], None], int]:
+    states = [GameState(grid=g) for g in all_positions()]
+
+    def run():
+        for s in states:
+            s.copy()
+    return run, len(states)
+
+
+def _state_move() -> Tuple[Callable[[], None], int]:
+    # Siirto tehdään aina tuoreeseen kopioon, joten aika sisältää myös
+    # GameState.copy:n (mitataan erikseen). Syntyvät laatat siemennetään.
+    random.seed(0)
+    states = [(GameState(grid=g), d) for g in all_positions() for d in grid_ops.MOVE_FUN]
+
+    def run():
+        for s, d in states:
+            s.copy().move(d)
+    return run, len(states)
+
+
+def _search(depth: int, backend: str, phase: str) -> Kernel:
+    def make() -> Tuple[Callable[[], int], int]:
+        states = [GameState(grid=[r[:] for r in g]) for g in CORPUS[phase]]
+
+        def run() -> int:
+            # Jokainen toisto alkaa tyhjillä välimuisteilla.
+            ex.cache.clear()
+            ex._eval_cache.clear()
+            n0 = ex._nodes
+            for s in states:
+                ex.best_move_expecti(s, depth=depth, backend=backend)
+            return ex._nodes - n0
+        return run, len(states)
+    return make
+
+
+def kernels(depths: Tuple[int, ...] = (2, 3)) -> Dict[str, Kernel]:
+    """Kaikki ytimet nimillä (nimet ovat lähtötason avaimia)."""
+    out: Dict[str, Kernel] = {
+        "grid_ops.MOVE_FUN": _grid_moves,
+        "bitboard.MOVE_FUN": _bitboard_moves,
+        "heuristics.evaluate": _evaluate,
+        "heuristics.evaluate_bitboard": _evaluate_bitboard,
+        "ntuple.evaluate_bitboard": _ntuple_evaluate,
+        "board.compress_row_left": _compress_row_left,
+        "GameState.copy": _state_copy,
+        "GameState.move": _state_move,
+    }
+    for backend in ("grid", "bitboard"):
+        for depth in depths:
+            for phase in PHASES:
+                out[f"search.{backend}.d{depth}.{phase}"] = _search(depth, backend, phase)
+    return out
+
+
+def measure(make: Kernel, repeat: int = 5, min_time: float = 0.1) -> dict:
+    """Ajaa ytimen repeat kertaa ja palauttaa parhaan kierroksen nopeudet.
+
+    Lyhyitä ytimiä toistetaan kierroksen sisällä, kunnes min_time täyttyy.
+    """
+    best = None
+    for _ in range(repeat):
+        run, ops = make()
+        loops, nodes = 0, 0
+        t0 = time.perf_counter()
+        while True:
+            nodes += run() or 0
+            loops += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        rate = ops * loops / elapsed
+        if best is None or rate > best["ops_per_sec"]:
+            best = {"ops_per_sec": rate, "seconds": elapsed / loops}
+            if nodes:
+                best["nodes"] = nodes // loops
+                best["nodes_per_sec"] = nodes / elapsed
+    return best
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            threshold: float) -> List[Tuple[str, float, float]]:
+    """Palauttaa ytimet, joiden ops/s on pudonnut yli threshold-osuuden.
+
+    Returns:
+        Lista (nimi, lähtötason ops/s, nykyinen ops/s).
+    """
+    slow = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base and r["ops_per_sec"] < base["ops_per_sec"] * (1.0 - threshold):
+            slow.append((name, base["ops_per_sec"], r["ops_per_sec"]))
+    return slow
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Mittaa kuumien ytimien nopeus ja vertaa lähtötasoon.")
+    ap.add_argument("--repeat", type=int, default=5, help="kierroksia per ydin (paras raportoidaan)")
+    ap.add_argument("--depths", type=int, nargs="+", default=[2, 3], help="hakusyvyydet")
+    ap.add_argument("--filter", default=None, help="aja vain ytimet, joiden nimessä on tämä")
+    ap.add_argument("--out", default=None, help="tallenna tulokset JSON-tiedostoon")
+    ap.add_argument("--baseline", default=BASELINE, help="lähtötason JSON-tiedosto")
+    ap.add_argument("--threshold", type=float, default=0.3,
+                    help="sallittu suhteellinen hidastuminen ennen virhettä")
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="kirjoita tulokset lähtötasoksi vertailun sijaan")
+    args = ap.parse_args(argv)
+
+    results: Dict[str, dict] = {}
+    for name, make in kernels(tuple(args.depths)).items():
+        if args.filter and args.filter not in name:
+            continue
+        r = results[name] = measure(make, args.repeat)
+        nodes = f"{r['nodes_per_sec']:>14,.0f} solmua/s" if "nodes_per_sec" in r else ""
+        print(f"{name:<32}{r['ops_per_sec']:>14,.0f} ops/s{nodes}", flush=True)
+
+    doc = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f"Lähtötaso tallennettu: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Lähtötasoa ei löydy ({args.baseline}); vertailu ohitetaan.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    slow = compare(results, baseline, args.threshold)
+    for name, base, now in slow:
+        print(f"REGRESSIO {name}: {now:,.0f} ops/s (lähtötaso {base:,.0f}, "
+              f"{100 * (1 - now / base):.0f} % hitaampi)")
+    if slow:
+        return 1
+    print(f"Ei regressioita (raja {100 * args.threshold:.0f} %).")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
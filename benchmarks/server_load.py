@@ -0,0 +1,142 @@
+"""Siirtopalvelimen (src/server.py) kuormitusmittaus: viive p50/p99 ja pyynnöt/s.
+
+Käynnistää palvelimen aliprosessina väliaikaiseen Unix-sokettiin (tai
+käyttää olemassa olevaa, --socket) ja lähettää korpuksen asemia yhden
+yhteyden yli. Korkeintaan --pipeline pyyntöä on kerrallaan matkalla;
+viive mitataan pyynnön lähetyksestä vastauksen saapumiseen, joten
+jonotusaika palvelimella sisältyy siihen.
+
+Käyttö:
+    python -m benchmarks.server_load --requests 2000 --pipeline 8 --depth 2
+    python -m benchmarks.server_load --socket /tmp/2048.sock --time-ms 20
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from benchmarks.corpus import all_positions
+
+
+def percentile(values: List[float], q: float) -> float:
+    """q-kvantiili (0..100) lähimmän sijan menetelmällä."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def start_server(path: str, backend: str = "bitboard", timeout: float = 30.0) -> subprocess.Popen:
+    """Käynnistää palvelimen ja odottaa, että soketti hyväksyy yhteyksiä."""
+    proc = subprocess.Popen([sys.executable, "-m", "src.server", "--socket", path,
+                             "--backend", backend])
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("palvelin päättyi käynnistyessä")
+        try:
+            with socket.socket(socket.AF_UNIX) as s:
+                s.connect(path)
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("palvelin ei käynnistynyt ajoissa")
+
+
+def run_load(path: str, requests: int, pipeline: int = 1, depth: int = 2,
+             time_ms: Optional[float] = None) -> dict:
+    """Lähettää pyynnöt ja palauttaa viiveet (ms) sekä läpäisyn."""
+    positions = all_positions()
+    window = threading.Semaphore(max(1, pipeline))
+    sent = [0.0] * requests
+    latency = [0.0] * requests
+    errors = []
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        reader = sock.makefile("rb")
+
+        def receive() -> None:
+            for _ in range(requests):
+                line = reader.readline()
+                if not line:
+                    errors.append("yhteys katkesi")
+                    window.release(requests)  # lähettäjä ei jää odottamaan
+                    break
+                reply = json.loads(line)
+                latency[reply["id"]] = 1000 * (time.perf_counter() - sent[reply["id"]])
+                if "error" in reply:
+                    errors.append(reply["error"])
+                window.release()
+
+        t = threading.Thread(target=receive, daemon=True)
+        t0 = time.perf_counter()
+        t.start()
+        for i in range(requests):
+            req = {"id": i, "board": positions[i % len(positions)], "score": 0}
+            if time_ms is not None:
+                req["time_ms"] = time_ms
+            else:
+                req["depth"] = depth
+            data = (json.dumps(req) + "\n").encode()
+            window.acquire()
+            sent[i] = time.perf_counter()
+            sock.sendall(data)
+        t.join()
+        wall = time.perf_counter() - t0
+    if errors:
+        raise RuntimeError(f"{len(errors)} virhettä, ensimmäinen: {errors[0]}")
+    return {
+        "p50": percentile(latency, 50),
+        "p99": percentile(latency, 99),
+        "max": max(latency, default=0.0),
+        "rps": requests / wall if wall else 0.0,
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Mittaa siirtopalvelimen viiveet ja läpäisyn.")
+    ap.add_argument("--socket", default=None, help="olemassa olevan palvelimen soketti")
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--pipeline", type=int, default=1, help="pyyntöjä matkalla kerrallaan")
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--time-ms", type=float, default=None)
+    ap.add_argument("--backend", choices=("grid", "bitboard"), default="bitboard",
+                    help="käynnistettävän palvelimen lautatoteutus")
+    args = ap.parse_args(argv)
+
+    proc = None
+    tmp = None
+    path = args.socket
+    if path is None:
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "2048.sock")
+        proc = start_server(path, args.backend)
+    try:
+        r = run_load(path, args.requests, args.pipeline, args.depth, args.time_ms)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            if os.path.exists(path):
+                os.unlink(path)
+            os.rmdir(tmp)
+    budget = f"aika {args.time_ms} ms" if args.time_ms is not None else f"syvyys {args.depth}"
+    print(f"{args.requests} pyyntöä, pipeline {args.pipeline}, {budget}")
+    print(f"viive p50 {r['p50']:.2f} ms | p99 {r['p99']:.2f} ms | max {r['max']:.2f} ms"
+          f" | {r['rps']:.0f} pyyntöä/s")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,127 @@
+"""Jaetun transpositiotaulun osumat ja kilpailun hinta.
+
+Kaksi mittausta, kumpikin --workers rinnakkaisella prosessilla, jotka
+aloittavat yhtä aikaa (Barrier):
+
+- "ops": jokainen prosessi tekee --ops hakua yhteisestä avainjoukosta
+  (--keys avainta, oma siemen) ja tallentaa hudit. Vertaa omaa taulua per
+  prosessi yhteen jaettuun tauluun. Prosessikohtaisen ops/s:n ero kertoo
+  kilpailun (saman muistin välimuistirivien jakamisen) hinnan, ja
+  osumaprosentin ero kertoo jakamisen hyödyn.
+- "search": jokainen prosessi hakee korpuksen (corpus.py) asemat
+  syvyydellä --depth eri järjestyksessä, kuten rinnakkaiset pelit samoista
+  avausasemista. Raportoi osumaprosentin, solmut ja seinäkelloajan.
+
+Käyttö:
+    python -m benchmarks.shared_table --workers 4 --ops 200000 --depth 3
+"""
+
+from __future__ import annotations
+import argparse
+import multiprocessing
+import random
+import time
+from typing import List, Optional
+
+import src.expectiminimax as ex
+from src.board import GameState
+from src.sharedtable import SLOT, SharedTranspositionTable
+
+from .corpus import all_positions
+
+
+def _ops_worker(name: Optional[str], slots: int, i: int, n: int, keys: int,
+                barrier, out) -> None:
+    table = SharedTranspositionTable.attach(name) if name else SharedTranspositionTable(slots=slots)
+    table.new_search()
+    rng = random.Random(i)
+    batch = [rng.randrange(1, keys + 1) << 1 for _ in range(n)]
+    barrier.wait()
+    t0 = time.perf_counter()
+    for k in batch:
+        if table.get(k, 1) is None:
+            table.put(k, 1, 1.0)
+    elapsed = time.perf_counter() - t0
+    out.put((n / elapsed, table.hits, table.misses, elapsed))
+    table.close()
+    if not name:
+        table.unlink()
+
+
+def _search_worker(name: Optional[str], slots: int, i: int, depth: int,
+                   barrier, out) -> None:
+    table = SharedTranspositionTable.attach(name) if name else SharedTranspositionTable(slots=slots)
+    ex.cache = table
+    grids = all_positions()
+    grids = grids[i % len(grids):] + grids[:i % len(grids)]
+    hits = misses = 0
+    barrier.wait()
+    t0 = time.perf_counter()
+    n0 = ex._nodes
+    for g in grids:
+        ex.best_move_expecti(GameState(grid=g), depth=depth, backend="bitboard")
+        hits += table.hits
+        misses += table.misses
+    elapsed = time.perf_counter() - t0
+    out.put((ex._nodes - n0, hits, misses, elapsed))
+    table.close()
+    if not name:
+        table.unlink()
+
+
+def _run(target, workers: int, shared: bool, slots: int, *args) -> List[tuple]:
+    """Ajaa workers prosessia yhtä aikaa ja palauttaa niiden tulokset."""
+    owner = SharedTranspositionTable(slots=slots) if shared else None
+    if owner is not None:
+        owner.new_search()
+    barrier, out = multiprocessing.Barrier(workers), multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=target, args=(
+        owner.name if owner is not None else None, slots, i, *args, barrier, out)) for i in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    if owner is not None:
+        owner.close()
+        owner.unlink()
+    return results
+
+
+def _rate(hits: int, misses: int) -> float:
+    return 100 * hits / (hits + misses) if hits + misses else 0.0
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Mittaa jaetun transpositiotaulun osumat ja kilpailun.")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=200_000, help="hakuja per prosessi (ops)")
+    ap.add_argument("--keys", type=int, default=100_000, help="avainjoukon koko (ops)")
+    ap.add_argument("--depth", type=int, default=3, help="hakusyvyys (search)")
+    ap.add_argument("--size-mb", type=float, default=32.0, help="taulun koko")
+    args = ap.parse_args(argv)
+    slots = int(args.size_mb * 1024 * 1024) // SLOT.size
+
+    print(f"ops: {args.workers} prosessia x {args.ops} hakua, {args.keys} avainta")
+    print(f"{'taulu':<8}{'prosesseja':>11}{'ops/s/prosessi':>16}{'ops/s yht.':>12}{'osumat':>8}")
+    for workers in sorted({1, args.workers}):
+        for shared in (False, True):
+            rs = _run(_ops_worker, workers, shared, slots, args.ops, args.keys)
+            per = sum(r[0] for r in rs) / len(rs)
+            total = workers * args.ops / max(r[3] for r in rs)
+            rate = _rate(sum(r[1] for r in rs), sum(r[2] for r in rs))
+            print(f"{'jaettu' if shared else 'oma':<8}{workers:>11}{per:>16,.0f}{total:>12,.0f}"
+                  f"{rate:>7.1f}%", flush=True)
+
+    print(f"\nsearch: {args.workers} prosessia, korpus syvyydellä {args.depth}")
+    print(f"{'taulu':<8}{'solmuja/prosessi':>17}{'osumat':>8}{'seinäkello s':>14}")
+    for shared in (False, True):
+        rs = _run(_search_worker, args.workers, shared, slots, args.depth)
+        nodes = sum(r[0] for r in rs) / len(rs)
+        rate = _rate(sum(r[1] for r in rs), sum(r[2] for r in rs))
+        print(f"{'jaettu' if shared else 'oma':<8}{nodes:>17,.0f}{rate:>7.1f}%"
+              f"{max(r[3] for r in rs):>14.2f}", flush=True)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
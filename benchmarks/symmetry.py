@@ -0,0 +1,81 @@
+"""Symmetriakanonisoinnin vertailu: välimuistien osumat, koko ja aika.
+
+Jokainen asema haetaan kahdesti tyhjillä välimuisteilla: ilman symmetriaa ja
+symmetriakanonisoinnilla. Asemat tuotetaan vakioidulla siemenellä pelaamalla.
+
+Käyttö:
+    python -m benchmarks.symmetry --depth 3 --positions 12 --backend bitboard
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import time
+
+import src.expectiminimax as ex
+from src.board import GameState, new_game
+
+
+def sample_positions(n: int, seed: int = 0, every: int = 15) -> list[GameState]:
+    """Pelaa vakioidulla siemenellä ja ota talteen joka every:s asema."""
+    random.seed(seed)
+    out = []
+    s = new_game()
+    i = 0
+    while len(out) < n:
+        if s.over:
+            s = new_game()
+        d, _ = ex.best_move_expecti(s, depth=1, backend="bitboard")
+        s.move(d)
+        i += 1
+        if i % every == 0:
+            out.append(s.copy())
+    return out
+
+
+def measure(s: GameState, depth: int, backend: str, symmetry: bool) -> dict:
+    ex.cache.clear()
+    ex._eval_cache.clear()
+    t0 = time.perf_counter()
+    d, _ = ex.best_move_expecti(s, depth=depth, backend=backend, symmetry=symmetry)
+    return {
+        "move": d,
+        "time": time.perf_counter() - t0,
+        "hits": ex.cache.hits,
+        "lookups": ex.cache.hits + ex.cache.misses,
+        "entries": len(ex.cache),
+        "evals": len(ex._eval_cache),
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Vertaa symmetriakanonisoinnin hyötyä välimuisteille.")
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--positions", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--every", type=int, default=15, help="ota joka n:s asema pelistä")
+    ap.add_argument("--backend", choices=("grid", "bitboard"), default="bitboard")
+    args = ap.parse_args(argv)
+
+    totals = {False: dict.fromkeys(("time", "hits", "lookups", "entries", "evals"), 0.0),
+              True: dict.fromkeys(("time", "hits", "lookups", "entries", "evals"), 0.0)}
+    same = 0
+    positions = sample_positions(args.positions, args.seed, args.every)
+    for s in positions:
+        res = {sym: measure(s, args.depth, args.backend, sym) for sym in (False, True)}
+        same += res[False]["move"] == res[True]["move"]
+        for sym, r in res.items():
+            for k in totals[sym]:
+                totals[sym][k] += r[k]
+
+    print(f"{len(positions)} asemaa, syvyys {args.depth}, backend {args.backend}")
+    print(f"{'tila':<10}{'TT-osumat':>12}{'osuma-%':>10}{'TT-koko':>10}{'evalit':>10}{'aika s':>10}")
+    for sym, t in totals.items():
+        rate = 100 * t["hits"] / t["lookups"] if t["lookups"] else 0.0
+        print(f"{'symmetria' if sym else 'perus':<10}{int(t['hits']):>12}{rate:>10.1f}"
+              f"{int(t['entries']):>10}{int(t['evals']):>10}{t['time']:>10.2f}")
+    print(f"sama siirto {same}/{len(positions)} asemassa")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,54 +1,189 @@
 """Automaattinen pelinsimulaattori 2048-tekoälylle.
 
-Tämä moduuli ajaa yhden täyden 2048-pelin Expectiminimax-tekniikalla ja
-tulostaa tilanteen jokaisen siirron jälkeen.
+Tämä moduuli ajaa yhden täyden 2048-pelin Expectiminimax-tekniikalla (tai
+Monte Carlo -moottorilla) ja tulostaa tilanteen jokaisen siirron jälkeen.
 
 Käyttö komentoriviltä:
     python -m src.autoplay --depth 5
 
 Argumentit:
+- --engine: "expecti" (oletus) tai "mc" (satunnaispelit, ks. montecarlo.py).
 - --depth: Haun syvyys (suurempi = vahvempi, mutta hitaampi).
+- --rollouts: Monte Carlo: satunnaispelejä juuren siirtoa kohden.
+- --backend: Lautatoteutus ("grid" tai nopeampi "bitboard").
+- --size: Laudan koko N (NxN, oletus 4; bittilauta vain 4x4).
+- --tt-stats: Tulosta transpositiotaulun osumat jokaisen siirron jälkeen.
+- --time-ms / --max-nodes: Iteratiivinen syvennys siirtokohtaisella aika-
+  tai solmubudjetilla kiinteän syvyyden sijaan (mc: aikabudjetti).
+- --workers: Rinnakkainen juurihaku annetulla määrällä työprosesseja
+  (mc: satunnaispelit jaetaan prosesseille). Rinnakkainen haku on
+  bittilautahakua; muun kuin 4x4-laudan siirrot haetaan sarjassa.
+- --ntuple: N-tuple-verkon painotiedosto (ks. ntuple.py) heuristiikan tilalle.
+- --book: Avauskirja (ks. book.py), josta siirto luetaan ennen hakua.
+- --search-stats: Tulosta hakutilastot (solmut, välimuistit, ajat) jokaisen
+  siirron jälkeen (kiinteän syvyyden sarjahaku).
+- --record: Lisää peli tallennetiedoston loppuun (ks. gamerecord.py).
 """
 
 from __future__ import annotations
 import argparse
-from .board import new_game
-from .expectiminimax import best_move_expecti
-from .gui import render, print_ai_move, print_final
+import random
+from typing import Optional
+from .board import SIZE, Backend, new_game
+from .gamerecord import GameRecordWriter
+from .expectiminimax import best_move_expecti, best_move_iterative, cache, set_book, set_evaluator
+from .montecarlo import best_move_montecarlo
+from .parallel import best_move_parallel
+from .gui import render, print_ai_move, print_final, print_search_stats, print_tt_stats
 
 
-def run(depth: int = 4) -> None:
-    """Suorittaa yhden pelin Expectiminimaxilla.
+def run(depth: int = 4, backend: Backend = "grid", tt_stats: bool = False,
+        time_ms: Optional[float] = None, max_nodes: Optional[int] = None,
+        workers: Optional[int] = None, search_stats: bool = False,
+        engine: str = "expecti", rollouts: Optional[int] = None,
+        size: int = SIZE, record: Optional[str] = None) -> None:
+    """Suorittaa yhden pelin Expectiminimaxilla tai Monte Carlolla.
 
     Args:
         depth: Haun perussyvyys.
+        backend: Lautatoteutus, jota sekä peli että haku käyttävät.
+        tt_stats: Tulostetaanko transpositiotaulun osumat siirroittain.
+        time_ms: Siirtokohtainen aikabudjetti (iteratiivinen syvennys).
+        max_nodes: Siirtokohtainen solmubudjetti (iteratiivinen syvennys).
+        workers: Rinnakkaisen juurihaun työprosessit (None = sarjahaku).
+        search_stats: Tulostetaanko hakutilastot siirroittain (vain
+            kiinteän syvyyden sarjahaussa).
+        engine: "expecti" tai "mc".
+        rollouts: Monte Carlon satunnaispelit juuren siirtoa kohden.
+        size: Laudan koko N (NxN).
+        record: Pelitallenteen polku, johon peli lisätään (None = ei tallenneta).
     """
-    s = new_game()
+    anytime = time_ms is not None or max_nodes is not None
+    rec = None
+    if record:
+        seed = random.randrange(1 << 63)
+        random.seed(seed)
+        rec = GameRecordWriter(record)
+    s = new_game(backend=backend, size=size)
+    if rec is not None:
+        rec.begin_game(seed, s.grid)
     render(s)
     i = 0
     while not s.over:
-        d, _ = best_move_expecti(s, depth=depth)
-        s.move(d)
+        st = None
+        if engine == "mc":
+            d, _ = best_move_montecarlo(s, rollouts=rollouts, time_ms=time_ms, workers=workers)
+        elif workers:
+            d, _ = best_move_parallel(s, depth=depth, workers=workers)
+        elif anytime:
+            d, _ = best_move_iterative(s, time_ms=time_ms, max_nodes=max_nodes)
+        elif search_stats:
+            d, _, st = best_move_expecti(s, depth=depth, stats=True)
+        else:
+            d, _ = best_move_expecti(s, depth=depth)
+        before = [r[:] for r in s.grid] if rec is not None else None
+        if s.move(d) and rec is not None:
+            rec.add_move(before, d, s.grid)
         i += 1
         print_ai_move(i, d)
+        if tt_stats:
+            print_tt_stats(cache)
+        if st is not None:
+            print_search_stats(st)
         render(s)
+    if rec is not None:
+        rec.close()
     print_final(s)
 
 
 def parse_args(argv=None) -> argparse.Namespace:
     ap = argparse.ArgumentParser(description="Suorita yksi tekoälyn pelaama 2048-peli Expectiminimaxilla.")
+    ap.add_argument(
+        "--engine",
+        choices=("expecti", "mc"),
+        default="expecti",
+        help="tekoälymoottori (mc = Monte Carlo -satunnaispelit)",
+    )
+    ap.add_argument(
+        "--rollouts",
+        type=int,
+        default=None,
+        help="Monte Carlo: satunnaispelejä juuren siirtoa kohden",
+    )
     ap.add_argument(
         "--depth",
         type=int,
         default=4,
         help="haun syvyys (suurempi = hitaampi, mutta vahvempi)",
     )
+    ap.add_argument(
+        "--backend",
+        choices=("grid", "bitboard"),
+        default="grid",
+        help="lautatoteutus (bitboard = 64-bittinen bittilauta, nopeampi)",
+    )
+    ap.add_argument(
+        "--size",
+        type=int,
+        default=SIZE,
+        help="laudan koko N (NxN); bittilauta vaatii koon 4",
+    )
+    ap.add_argument(
+        "--tt-stats",
+        action="store_true",
+        help="tulosta transpositiotaulun osumat jokaisen siirron jälkeen",
+    )
+    ap.add_argument(
+        "--time-ms",
+        type=float,
+        default=None,
+        help="siirtokohtainen aikabudjetti millisekunteina (iteratiivinen syvennys)",
+    )
+    ap.add_argument(
+        "--max-nodes",
+        type=int,
+        default=None,
+        help="siirtokohtainen solmubudjetti (iteratiivinen syvennys)",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="rinnakkaisen juurihaun työprosessien määrä",
+    )
+    ap.add_argument(
+        "--ntuple",
+        default=None,
+        help="n-tuple-verkon painotiedosto (python -m src.ntuple train ...)",
+    )
+    ap.add_argument(
+        "--book",
+        default=None,
+        help="avauskirjan tiedosto (python -m src.book build ...)",
+    )
+    ap.add_argument(
+        "--search-stats",
+        action="store_true",
+        help="tulosta hakutilastot jokaisen siirron jälkeen",
+    )
+    ap.add_argument(
+        "--record",
+        default=None,
+        help="lisää peli tallennetiedostoon (python -m src.gamerecord info ...)",
+    )
     return ap.parse_args(argv)
 
 
 def main(argv=None) -> None:
     args = parse_args(argv)
-    run(depth=args.depth)
+    if args.ntuple:
+        set_evaluator(args.ntuple)
+    if args.book:
+        set_book(args.book)
+    run(depth=args.depth, backend=args.backend, tt_stats=args.tt_stats,
+        time_ms=args.time_ms, max_nodes=args.max_nodes, workers=args.workers,
+        search_stats=args.search_stats, engine=args.engine, rollouts=args.rollouts,
+        size=args.size, record=args.record)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,291 @@
+"""64-bittinen bittilauta 2048-pelille.
+
+Koko 4x4-lauta pakataan yhteen kokonaislukuun. Jokainen solu on 4-bittinen
+laattaeksponentti (0 = tyhjä, 1 = 2, 2 = 4, ..., 15 = 32768). Solu (r, c)
+sijaitsee bittien ``4 * (4*r + c)`` kohdalla, eli rivi r on 16-bittinen
+kenttä ``(b >> 16*r) & 0xFFFF``.
+
+Siirrot, pisteet, tyhjien määrä ja game over -tarkistus luetaan kerran
+rakennetuista 65536-alkioisista rivitaulukoista, joten yksi siirto maksaa
+vain muutaman taulukkohaun ja bittioperaation. Taulukot luetaan
+levyvälimuistista (tablecache.py), kun se on saatavilla. Pystysiirrot tehdään
+transponoimalla lauta ja käyttämällä samoja rivitaulukoita.
+
+Rajoitus: 32768 + 32768 -yhdistymistä ei tueta (4 bittiä ei riitä
+laatalle 65536), joten kaksi 32768-laattaa eivät yhdisty bittilaudalla.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Callable, Tuple
+
+from .tablecache import cached
+
+Grid = List[List[int]]
+Board = int
+
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+
+# ---------- rivitaulukot ----------
+
+def _slide_row_left(cells: List[int]) -> Tuple[List[int], int]:
+    """Puristaa eksponenttirivin vasemmalle ja palauttaa (rivi, pisteet)."""
+    tiles = [e for e in cells if e]
+    out: List[int] = []
+    gain = i = 0
+    while i < len(tiles):
+        e = tiles[i]
+        if i + 1 < len(tiles) and e == tiles[i + 1] and e < MAX_EXPONENT:
+            out.append(e + 1)
+            gain += 1 << (e + 1)
+            i += 2
+        else:
+            out.append(e)
+            i += 1
+    out += [0] * (4 - len(out))
+    return out, gain
+
+
+def _reverse_row(x: int) -> int:
+    """Kääntää 16-bittisen rivin nibblejen järjestyksen."""
+    return ((x & 0xF) << 12) | ((x & 0xF0) << 4) | ((x >> 4) & 0xF0) | (x >> 12)
+
+
+def _build_tables() -> Tuple[list, list, list, list, list, list, list, list]:
+    n = 1 << 16
+    left = [0] * n
+    right = [0] * n
+    col_up = [0] * n
+    col_down = [0] * n
+    gain_left = [0] * n
+    gain_right = [0] * n
+    empties = [0] * n
+    stuck = [False] * n
+    for x in range(n):
+        cells = [(x >> s) & 0xF for s in (0, 4, 8, 12)]
+        out, gain = _slide_row_left(cells)
+        y = out[0] | (out[1] << 4) | (out[2] << 8) | (out[3] << 12)
+        left[x] = y
+        gain_left[x] = gain
+        # Sarakemuodossa nibble i siirtyy riville i (bitit 16*i).
+        col_up[x] = out[0] | (out[1] << 16) | (out[2] << 32) | (out[3] << 48)
+        empties[x] = cells.count(0)
+        stuck[x] = y == x and 0 not in cells
+    for x in range(n):
+        rx = _reverse_row(x)
+        y = _reverse_row(left[rx])
+        right[x] = y
+        gain_right[x] = gain_left[rx]
+        col_down[x] = ((y & 0xF) | ((y >> 4) & 0xF) << 16 |
+                       ((y >> 8) & 0xF) << 32 | (y >> 12) << 48)
+    return left, right, col_up, col_down, gain_left, gain_right, empties, stuck
+
+
+_TABLE_NAMES = ("left", "right", "col_up", "col_down",
+                "gain_left", "gain_right", "empties", "stuck")
+
+
+def _load_tables() -> Tuple[list, ...]:
+    """Rivitaulukot levyvälimuistista (ks. tablecache.py) tai rakennettuna."""
+    # Pelin lopun tarkistus ei ole haun kuuma polku: "stuck" on mmap-näkymä.
+    tables = cached("bitboard", lambda: dict(zip(_TABLE_NAMES, _build_tables())),
+                    _slide_row_left, _reverse_row, _build_tables, MAX_EXPONENT,
+                    hot=set(_TABLE_NAMES) - {"stuck"})
+    return tuple(tables[name] for name in _TABLE_NAMES)
+
+
+(_ROW_LEFT, _ROW_RIGHT, _COL_UP, _COL_DOWN,
+ _GAIN_LEFT, _GAIN_RIGHT, _ROW_EMPTY, _ROW_STUCK) = _load_tables()
+
+# ---------- muunnokset ----------
+
+def encode(g: Grid) -> Board:
+    """Pakkaa 4x4-ruudukon bittilaudaksi.
+
+    Raises:
+        ValueError: jos lauta ei ole 4x4 tai laatta ei ole kahden potenssi
+            tai on yli 32768.
+    """
+    if len(g) != 4:
+        raise ValueError(f"bittilauta on 4x4, ei {len(g)}x{len(g)}")
+    b = 0
+    shift = 0
+    for row in g:
+        if len(row) != 4:
+            raise ValueError(f"bittilauta on 4x4, ei {len(g)}x{len(row)}")
+        for v in row:
+            if v:
+                e = v.bit_length() - 1
+                if v != 1 << e or not 0 < e <= MAX_EXPONENT:
+                    raise ValueError(f"laattaa {v} ei voi esittää bittilaudalla")
+                b |= e << shift
+            shift += 4
+    return b
+
+
+def decode(b: Board) -> Grid:
+    """Purkaa bittilaudan 4x4-ruudukoksi (0 = tyhjä)."""
+    g = []
+    for r in range(4):
+        row = []
+        for c in range(4):
+            e = (b >> (16 * r + 4 * c)) & 0xF
+            row.append(1 << e if e else 0)
+        g.append(row)
+    return g
+
+
+def transpose(b: Board) -> Board:
+    """Transponoi bittilaudan (rivit → sarakkeet) bittioperaatioilla."""
+    a1 = b & 0xF0F00F0FF0F00F0F
+    a2 = b & 0x0000F0F00000F0F0
+    a3 = b & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def flip_v(b: Board) -> Board:
+    """Peilaa laudan pystysuunnassa (rivi 0 <-> rivi 3)."""
+    return ((b & ROW_MASK) << 48 | ((b >> 16) & ROW_MASK) << 32 |
+            ((b >> 32) & ROW_MASK) << 16 | b >> 48)
+
+# ---------- symmetriat ----------
+#
+# Diedriryhmän 8 alkiota muodostetaan transpoosista (T) ja pystypeilauksesta
+# (V). Alkio on operaatioiden jono, joka sovelletaan vasemmalta oikealle.
+
+SYMMETRIES: Tuple[Tuple[str, ...], ...] = (
+    (), ("V",), ("T",), ("T", "V"), ("V", "T"),
+    ("V", "T", "V"), ("T", "V", "T"), ("T", "V", "T", "V"),
+)
+
+_OP_BOARD = {"T": transpose, "V": flip_v}
+_OP_MOVE = {
+    "T": {"left": "up", "up": "left", "right": "down", "down": "right"},
+    "V": {"left": "left", "right": "right", "up": "down", "down": "up"},
+}
+
+
+def apply_symmetry(b: Board, i: int) -> Board:
+    """Soveltaa symmetriaa SYMMETRIES[i] lautaan."""
+    for op in SYMMETRIES[i]:
+        b = _OP_BOARD[op](b)
+    return b
+
+
+def map_move(d: str, i: int) -> str:
+    """Alkuperäisen laudan siirto → vastaava siirto symmetrian i laudalla."""
+    for op in SYMMETRIES[i]:
+        d = _OP_MOVE[op][d]
+    return d
+
+
+def unmap_move(d: str, i: int) -> str:
+    """Symmetrian i laudan siirto → vastaava siirto alkuperäisellä laudalla."""
+    for op in reversed(SYMMETRIES[i]):
+        d = _OP_MOVE[op][d]
+    return d
+
+
+def canonical(b: Board) -> Board:
+    """Palauttaa laudan kanonisen muodon: pienin kahdeksasta symmetriasta."""
+    t = transpose(b)
+    v = flip_v(b)
+    vt = flip_v(t)
+    tv = transpose(v)
+    tvt = transpose(vt)
+    vtv = flip_v(tv)
+    return min(b, v, t, vt, tv, vtv, tvt, flip_v(tvt))
+
+
+def canonical_symmetry(b: Board) -> Tuple[Board, int]:
+    """Palauttaa (kanoninen lauta, i) siten, että apply_symmetry(b, i) on kanoninen."""
+    return min((apply_symmetry(b, i), i) for i in range(len(SYMMETRIES)))
+
+# ---------- siirrot ----------
+
+def move_left(b: Board) -> Tuple[Board, int]:
+    """Vasemmalle siirto: palauttaa (uusi lauta, saadut pisteet)."""
+    r0, r1, r2, r3 = b & ROW_MASK, (b >> 16) & ROW_MASK, (b >> 32) & ROW_MASK, b >> 48
+    return (
+        _ROW_LEFT[r0] | _ROW_LEFT[r1] << 16 | _ROW_LEFT[r2] << 32 | _ROW_LEFT[r3] << 48,
+        _GAIN_LEFT[r0] + _GAIN_LEFT[r1] + _GAIN_LEFT[r2] + _GAIN_LEFT[r3],
+    )
+
+
+def move_right(b: Board) -> Tuple[Board, int]:
+    """Oikealle siirto: palauttaa (uusi lauta, saadut pisteet)."""
+    r0, r1, r2, r3 = b & ROW_MASK, (b >> 16) & ROW_MASK, (b >> 32) & ROW_MASK, b >> 48
+    return (
+        _ROW_RIGHT[r0] | _ROW_RIGHT[r1] << 16 | _ROW_RIGHT[r2] << 32 | _ROW_RIGHT[r3] << 48,
+        _GAIN_RIGHT[r0] + _GAIN_RIGHT[r1] + _GAIN_RIGHT[r2] + _GAIN_RIGHT[r3],
+    )
+
+
+def move_up(b: Board) -> Tuple[Board, int]:
+    """Ylöspäin siirto: palauttaa (uusi lauta, saadut pisteet)."""
+    t = transpose(b)
+    c0, c1, c2, c3 = t & ROW_MASK, (t >> 16) & ROW_MASK, (t >> 32) & ROW_MASK, t >> 48
+    return (
+        _COL_UP[c0] | _COL_UP[c1] << 4 | _COL_UP[c2] << 8 | _COL_UP[c3] << 12,
+        _GAIN_LEFT[c0] + _GAIN_LEFT[c1] + _GAIN_LEFT[c2] + _GAIN_LEFT[c3],
+    )
+
+
+def move_down(b: Board) -> Tuple[Board, int]:
+    """Alaspäin siirto: palauttaa (uusi lauta, saadut pisteet)."""
+    t = transpose(b)
+    c0, c1, c2, c3 = t & ROW_MASK, (t >> 16) & ROW_MASK, (t >> 32) & ROW_MASK, t >> 48
+    return (
+        _COL_DOWN[c0] | _COL_DOWN[c1] << 4 | _COL_DOWN[c2] << 8 | _COL_DOWN[c3] << 12,
+        _GAIN_RIGHT[c0] + _GAIN_RIGHT[c1] + _GAIN_RIGHT[c2] + _GAIN_RIGHT[c3],
+    )
+
+
+MOVE_FUN: Dict[str, Callable[[Board], Tuple[Board, int]]] = {
+    "left": move_left,
+    "right": move_right,
+    "up": move_up,
+    "down": move_down,
+}
+"""Bittilaudan vastine ``grid_ops.MOVE_FUN``-sanakirjalle.
+
+Esimerkiksi:
+    new_board, gained = MOVE_FUN["left"](board)
+"""
+
+# ---------- kyselyt ----------
+
+def count_empty(b: Board) -> int:
+    """Laskee tyhjien solujen määrän."""
+    return (_ROW_EMPTY[b & ROW_MASK] + _ROW_EMPTY[(b >> 16) & ROW_MASK] +
+            _ROW_EMPTY[(b >> 32) & ROW_MASK] + _ROW_EMPTY[b >> 48])
+
+
+def empty_shifts(b: Board) -> List[int]:
+    """Palauttaa tyhjien solujen bittisiirrot rivijärjestyksessä."""
+    return [s for s in range(0, 64, 4) if not (b >> s) & 0xF]
+
+
+def max_exponent(b: Board) -> int:
+    """Palauttaa suurimman laattaeksponentin (0 tyhjällä laudalla)."""
+    m = 0
+    while b:
+        e = b & 0xF
+        if e > m:
+            m = e
+        b >>= 4
+    return m
+
+
+def is_game_over(b: Board) -> bool:
+    """Tarkistaa onko peli ohi (ei tyhjiä eikä yhdistettäviä)."""
+    if not (_ROW_STUCK[b & ROW_MASK] and _ROW_STUCK[(b >> 16) & ROW_MASK] and
+            _ROW_STUCK[(b >> 32) & ROW_MASK] and _ROW_STUCK[b >> 48]):
+        return False
+    t = transpose(b)
+    return bool(_ROW_STUCK[t & ROW_MASK] and _ROW_STUCK[(t >> 16) & ROW_MASK] and
+                _ROW_STUCK[(t >> 32) & ROW_MASK] and _ROW_STUCK[t >> 48])
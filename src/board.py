@@ -6,18 +6,29 @@ Tämä moduuli sisältää:
   - move: tekee normaalin siirron ja lisää satunnaislaatan.
   - move_no_spawn: tekee siirron ilman satunnaislaattaa (käytetään AI:ssa).
 - Aputoiminnot: tyhjien solujen haku, game over -tarkistus, kopiointi.
+- Hakutilan (SearchState), jossa siirrot ja laatat tehdään paikallaan ja
+  perutaan peruutuspinosta (make_move/unmake_move, place_tile/remove_tile).
+
+Siirrot ja game over -tarkistus voidaan ajaa myös 64-bittisellä
+bittilaudalla (``backend="bitboard"``, ks. ``bitboard.py``).
+
+Laudan koko on pelikohtainen: ruudukko voi olla mikä tahansa NxN
+(new_game(size=...)); SIZE on oletuskoko. Bittilauta on vain 4x4:lle.
+Rivien siirrot lasketaan kokokohtaisista taulukoista (line_table), jotka
+täyttyvät sitä mukaa kuin uusia rivejä tulee vastaan.
 """
 
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import List, Tuple, Literal
+from typing import List, Literal, Optional, Tuple
 import random
 
-SIZE = 4
+SIZE = 4                                # oletuskoko (bittilauta vaatii tämän)
 PROB_FOUR = 0.1
 
 Grid = List[List[int]]
 Direction = Literal["up", "down", "left", "right"]
+Backend = Literal["grid", "bitboard"]
 
 
 def transpose(g: Grid) -> Grid:
@@ -34,7 +45,7 @@ def compress_row_left(row: List[int]) -> Tuple[List[int], int]:
     """Siirtää ja yhdistää rivin vasemmalle 2048-sääntöjen mukaan.
 
     Args:
-        row: Neljän kokonaisluvun lista (0 = tyhjä).
+        row: Rivin laatat (0 = tyhjä).
 
     Returns:
         (uusi rivi, kierroksella saadut pisteet).
@@ -51,33 +62,67 @@ def compress_row_left(row: List[int]) -> Tuple[List[int], int]:
         else:
             out.append(t[i])
             i += 1
-    out += [0]*(SIZE - len(out))
+    out += [0]*(len(row) - len(out))
     return out, gain
 
 
+# Rivien siirtotaulukot koon mukaan: koko -> {rivi (tuple) -> (uusi rivi,
+# pisteet, yhdistymiset)}; uusi rivi on None, jos siirto ei muuta riviä.
+# Taulukko täytetään laiskasti, koska kaikkia rivejä ei voi luetella
+# suurilla laudoilla (4x4:llä ~17^4 riviä).
+_LINE_TABLES: dict = {}
+
+
+def line_table(n: int) -> dict:
+    """Kokokohtainen rivien siirtotaulukko (ks. slide_line)."""
+    table = _LINE_TABLES.get(n)
+    if table is None:
+        table = _LINE_TABLES[n] = {}
+    return table
+
+
+def slide_line(line: tuple) -> Tuple[Optional[tuple], int, int]:
+    """Rivin siirto vasemmalle taulukosta: (uusi rivi tai None, pisteet, yhdistymiset)."""
+    table = line_table(len(line))
+    hit = table.get(line)
+    if hit is None:
+        new, gain = compress_row_left(list(line))
+        out = tuple(new)
+        hit = table[line] = (None if out == line else out, gain, new.count(0) - line.count(0))
+    return hit
+
+
 @dataclass
 class GameState:
     """Pelilaudan tila ja perustoiminnot.
 
     Attributes:
-        grid: 4x4-ruudukko (0 = tyhjä).
+        grid: NxN-ruudukko (0 = tyhjä), oletuksena SIZE x SIZE.
         score: Pisteet yhteensä.
         won: Onko 2048 saavutettu.
         over: Onko peli ohi.
+        backend: "grid" (listat) tai "bitboard" (64-bittinen bittilauta).
     """
     grid: Grid = field(default_factory=lambda: [[0]*SIZE for _ in range(SIZE)])
     score: int = 0
     won: bool = False
     over: bool = False
+    backend: Backend = "grid"
+
+    @property
+    def size(self) -> int:
+        """Laudan koko N."""
+        return len(self.grid)
 
     def copy(self) -> "GameState":
         """Palauttaa kopion nykyisestä tilasta."""
-        return GameState([r[:] for r in self.grid], self.score, self.won, self.over)
+        return GameState([r[:] for r in self.grid], self.score, self.won, self.over, self.backend)
 
     def empty_cells(self) -> List[Tuple[int, int]]:
         """Palauttaa listan tyhjistä soluista (koordinaatit)."""
         g = self.grid
-        return [(r, c) for r in range(SIZE) for c in range(SIZE) if not g[r][c]]
+        n = len(g)
+        return [(r, c) for r in range(n) for c in range(n) if not g[r][c]]
 
     def spawn_tile(self) -> None:
         """Lisää satunnaisen laatan (2 tai 4) tyhjään ruutuun."""
@@ -110,6 +155,8 @@ class GameState:
         Returns:
             True jos lauta muuttui, muuten False.
         """
+        if self.backend == "bitboard":
+            return self._apply_move_bitboard(d)
         original = [r[:] for r in self.grid]
         if d == "left":
             self.slide_left()
@@ -129,6 +176,17 @@ class GameState:
             self.grid = transpose(self.grid)
         return self.grid != original
 
+    def _apply_move_bitboard(self, d: Direction) -> bool:
+        """apply_move bittilaudan rivitaulukoilla."""
+        from . import bitboard  # tuodaan vasta tarvittaessa (taulukot, ks. tablecache.py)
+        b = bitboard.encode(self.grid)
+        nb, gain = bitboard.MOVE_FUN[d](b)
+        if nb == b:
+            return False
+        self.grid = bitboard.decode(nb)
+        self.score += gain
+        return True
+
     def move(self, d: Direction, spawn: bool = True, check_over: bool = True) -> bool:
         """Tekee pelaajan siirron ja lisää satunnaislaatan jos tarvitaan.
 
@@ -155,21 +213,151 @@ class GameState:
 
     def is_game_over(self) -> bool:
         """Tarkistaa onko peli ohi (ei tyhjiä eikä yhdistettäviä)."""
+        if self.backend == "bitboard":
+            from . import bitboard
+            return bitboard.is_game_over(bitboard.encode(self.grid))
         g = self.grid
-        for r in range(SIZE):
-            for c in range(SIZE):
+        n = len(g)
+        for r in range(n):
+            for c in range(n):
                 if not g[r][c]:
                     return False
-                if c < SIZE-1 and g[r][c] == g[r][c+1]:
+                if c < n-1 and g[r][c] == g[r][c+1]:
                     return False
-                if r < SIZE-1 and g[r][c] == g[r+1][c]:
+                if r < n-1 and g[r][c] == g[r+1][c]:
                     return False
         return True
 
 
-def new_game() -> GameState:
-    """Luo uuden pelin ja lisää kaksi satunnaislaattaa."""
-    gs = GameState()
+class SearchState:
+    """Hakua varten optimoitu pelitila: muutokset paikallaan ja peruutuspino.
+
+    Haku käy lapset läpi tekemällä muutoksen tähän samaan olioon ja
+    perumalla sen, joten solmua kohden ei kopioida lautaa eikä luoda uutta
+    tilaa. make_move ja place_tile lisäävät pinoon peruutustiedon, jonka
+    unmake_move ja remove_tile poistavat; peruutukset tehdään käänteisessä
+    järjestyksessä. Tyhjien ja suurimman laatan laskurit päivitetään
+    muutosten mukana.
+
+    Attributes:
+        grid: Ruudukko (muuttuu paikallaan).
+        score: Pisteet.
+        empties: Tyhjien solujen määrä.
+        max_tile: Suurin laatta.
+    """
+    __slots__ = ("grid", "score", "empties", "max_tile", "_undo")
+
+    def __init__(self, grid: Grid, score: int = 0) -> None:
+        self.grid = [r[:] for r in grid]
+        self.score = score
+        self.empties = sum(r.count(0) for r in self.grid)
+        self.max_tile = max(max(r) for r in self.grid)
+        self._undo: list = []
+
+    @classmethod
+    def from_state(cls, s) -> "SearchState":
+        """Hakutila pelitilasta (grid ja score kopioidaan)."""
+        return cls(s.grid, s.score)
+
+    def copy(self) -> "SearchState":
+        """Palauttaa kopion (tyhjällä peruutuspinolla)."""
+        return SearchState(self.grid, self.score)
+
+    def empty_cells(self) -> List[Tuple[int, int]]:
+        """Palauttaa listan tyhjistä soluista (koordinaatit)."""
+        g = self.grid
+        n = len(g)
+        return [(r, c) for r in range(n) for c in range(n) if not g[r][c]]
+
+    def place_tile(self, r: int, c: int, v: int) -> None:
+        """Asettaa laatan v tyhjään soluun (r, c); peru remove_tilella."""
+        self._undo.append(self.max_tile)
+        self.grid[r][c] = v
+        self.empties -= 1
+        if v > self.max_tile:
+            self.max_tile = v
+
+    def remove_tile(self, r: int, c: int) -> None:
+        """Peruu viimeisimmän place_tilen soluun (r, c)."""
+        self.max_tile = self._undo.pop()
+        self.grid[r][c] = 0
+        self.empties += 1
+
+    def make_move(self, d: Direction) -> bool:
+        """Tekee siirron paikallaan.
+
+        Vain muuttuneet rivit (tai sarakkeet) tallennetaan peruutusta varten.
+
+        Returns:
+            True jos lauta muuttui (peru unmake_movella), muuten False
+            (pinoon ei lisätä mitään).
+        """
+        g = self.grid
+        saved = []
+        gain = merges = 0
+        top = self.max_tile
+        table = line_table(len(g))
+        horizontal = d in ("left", "right")
+        lines = [tuple(r) for r in g] if horizontal else list(zip(*g))
+        for i, line in enumerate(lines):
+            if d in ("right", "down"):
+                line = line[::-1]
+            hit = table.get(line)
+            if hit is None:
+                hit = slide_line(line)
+            new, gained, merged = hit
+            if new is None:
+                continue
+            if gained:
+                gain += gained
+                merges += merged
+                top = max(top, max(new))
+            if d in ("right", "down"):
+                new, line = new[::-1], line[::-1]
+            saved.append((i, line))
+            if horizontal:
+                g[i][:] = new
+            else:
+                for row, v in zip(g, new):
+                    row[i] = v
+        if not saved:
+            return False
+        self._undo.append((horizontal, saved, self.score, self.empties, self.max_tile))
+        self.score += gain
+        self.empties += merges
+        self.max_tile = top
+        return True
+
+    def unmake_move(self) -> None:
+        """Peruu viimeisimmän onnistuneen make_moven."""
+        horizontal, saved, self.score, self.empties, self.max_tile = self._undo.pop()
+        g = self.grid
+        if horizontal:
+            for i, line in saved:
+                g[i][:] = line
+        else:
+            for i, line in saved:
+                for row, v in zip(g, line):
+                    row[i] = v
+
+    def to_state(self) -> GameState:
+        """Tavallinen GameState nykyisestä tilasta."""
+        return GameState([r[:] for r in self.grid], self.score)
+
+
+def new_game(backend: Backend = "grid", size: int = SIZE) -> GameState:
+    """Luo uuden pelin ja lisää kaksi satunnaislaattaa.
+
+    Args:
+        backend: Siirtologiikan toteutus ("grid" tai "bitboard").
+        size: Laudan koko N (NxN); bittilauta vaatii koon 4.
+
+    Raises:
+        ValueError: jos koko on alle 2 tai bittilaudan koko ei ole 4.
+    """
+    if size < 2 or (backend == "bitboard" and size != SIZE):
+        raise ValueError(f"lautaa {size}x{size} ei tueta (backend {backend})")
+    gs = GameState([[0]*size for _ in range(size)], backend=backend)
     for _ in range(2):
         gs.spawn_tile()
     return gs
@@ -0,0 +1,236 @@
+"""Avauskirja: levylle tallennetut valmiiksi haetut siirrot.
+
+Samat alkupelin asemat toistuvat pelistä toiseen. Kirja tallentaa niille
+(asema -> paras siirto, arvo, syvyys) syvistä offline-hauista, ja
+best_move_expecti katsoo kirjasta ennen hakua (ks. expectiminimax.set_book).
+
+Tiedostomuoto (little-endian, versio 1):
+
+    otsake  32 tavua: taika b"2048BOOK", versio u32, merkinnän koko u32,
+                      paikkojen määrä u64 (kahden potenssi), merkintöjä u64
+    paikat  16 tavua/paikka: lauta u64, arvo f32, syvyys u8, siirto u8, 0 u16
+
+Lauta on kanoninen bittilauta (bitboard.canonical), siirto on indeksi
+MOVE_ORDER-tupleen kanonisessa suunnassa ja arvo on suhteessa pisteisiin
+(kuten transpositiotaulussa). Tyhjän paikan lauta on 0 (todellisessa
+asemassa on aina laattoja). Paikat muodostavat avoimen hajautustaulun
+lineaarisella kokeilulla ja täyttöasteella enintään 1/2, joten haku on
+keskimäärin O(1).
+
+Tiedosto avataan vain luku -tilassa mmapilla: avaaminen lukee vain otsakkeen,
+ja käyttöjärjestelmä lataa sivut tarpeen mukaan. Miljoona asemaa vie noin
+32 MB.
+
+Käyttö:
+    python -m src.book build --out kirja.bin --games 50 --plies 30 --depth 5
+    python -m src.book info kirja.bin
+    python -m src.autoplay --book kirja.bin
+"""
+
+from __future__ import annotations
+import argparse
+import mmap
+import os
+import random
+import struct
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import bitboard
+from .board import Direction
+
+MAGIC = b"2048BOOK"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+ENTRY = struct.Struct("<QfBBH")
+MOVE_ORDER: Tuple[Direction, ...] = ("left", "up", "right", "down")
+
+_MASK64 = (1 << 64) - 1
+_HASH_MUL = 0x9E3779B97F4A7C15
+
+BookEntry = Tuple[Direction, float, int]  # (siirto, arvo - pisteet, syvyys)
+
+
+def _slot(key: int, bits: int) -> int:
+    """Fibonacci-hajautus: ylimmät bits bittiä tulosta."""
+    return ((key * _HASH_MUL) & _MASK64) >> (64 - bits) if bits else 0
+
+
+class PositionBook:
+    """Vain luku -avauskirja mmapin päällä.
+
+    Attributes:
+        path: Tiedoston polku.
+        slots: Hajautustaulun paikkojen määrä.
+        count: Merkintöjen määrä.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{path}: ei avauskirja (liian lyhyt)")
+        magic, version, entry_size, self.slots, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: ei avauskirja")
+        if version != VERSION or entry_size != ENTRY.size:
+            raise ValueError(f"{path}: tukematon kirjaversio {version}")
+        if self.slots & (self.slots - 1) or len(self._mm) != HEADER.size + self.slots * ENTRY.size:
+            raise ValueError(f"{path}: vioittunut avauskirja")
+        self._bits = self.slots.bit_length() - 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, b: int) -> bool:
+        return self._find(bitboard.canonical(b)) is not None
+
+    def __enter__(self) -> "PositionBook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _find(self, key: int) -> Optional[Tuple[float, int, int]]:
+        mm, mask = self._mm, self.slots - 1
+        i = _slot(key, self._bits)
+        while True:
+            k, value, depth, move, _ = ENTRY.unpack_from(mm, HEADER.size + i * ENTRY.size)
+            if k == key:
+                return value, depth, move
+            if k == 0:
+                return None
+            i = (i + 1) & mask
+
+    def get(self, b: int) -> Optional[BookEntry]:
+        """Hakee bittilaudan b merkinnän.
+
+        Returns:
+            (siirto laudalla b, arvo suhteessa pisteisiin, syvyys) tai None.
+        """
+        key, sym = bitboard.canonical_symmetry(b)
+        hit = self._find(key)
+        if hit is None:
+            return None
+        value, depth, move = hit
+        return bitboard.unmap_move(MOVE_ORDER[move], sym), value, depth
+
+
+def write_book(path: str, entries: Iterable[Tuple[int, Direction, float, int]]) -> int:
+    """Kirjoittaa avauskirjan.
+
+    Args:
+        path: Kohdetiedosto (korvataan atomisesti).
+        entries: (bittilauta, siirto, arvo suhteessa pisteisiin, syvyys).
+            Saman aseman symmetriset muodot yhdistetään; syvin jää voimaan.
+
+    Returns:
+        Kirjoitettujen merkintöjen määrä.
+    """
+    best: Dict[int, Tuple[int, float, int]] = {}
+    for b, move, value, depth in entries:
+        key, sym = bitboard.canonical_symmetry(b)
+        if key == 0:
+            continue
+        old = best.get(key)
+        if old is None or depth >= old[2]:
+            best[key] = (MOVE_ORDER.index(bitboard.map_move(move, sym)), value, depth)
+
+    bits = max(1, (2 * len(best) - 1).bit_length())
+    slots = 1 << bits
+    buf = bytearray(HEADER.size + slots * ENTRY.size)
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, ENTRY.size, slots, len(best))
+    mask = slots - 1
+    for key in sorted(best):
+        move, value, depth = best[key]
+        i = _slot(key, bits)
+        while struct.unpack_from("<Q", buf, HEADER.size + i * ENTRY.size)[0]:
+            i = (i + 1) & mask
+        ENTRY.pack_into(buf, HEADER.size + i * ENTRY.size, key, value, depth, move, 0)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buf)
+    os.replace(tmp, path)
+    return len(best)
+
+
+def collect_positions(games: int, plies: int, seed: int = 0,
+                      play_depth: int = 2) -> Dict[int, int]:
+    """Kerää alkupelin asemat itsepelistä.
+
+    Pelaa games siemennettyä peliä plies siirtoa bittilautahaulla
+    syvyydellä play_depth.
+
+    Returns:
+        {kanoninen lauta: esiintymiskerrat}.
+    """
+    from . import expectiminimax as ex
+    from .board import new_game
+
+    seen: Dict[int, int] = {}
+    for i in range(games):
+        random.seed(seed + i)
+        s = new_game(backend="bitboard")
+        for _ in range(plies):
+            if s.over:
+                break
+            key = bitboard.canonical(bitboard.encode(s.grid))
+            seen[key] = seen.get(key, 0) + 1
+            d, _ = ex.best_move_expecti(s, depth=play_depth)
+            s.move(d)
+    return seen
+
+
+def build_book(path: str, games: int, plies: int, depth: int, seed: int = 0,
+               play_depth: int = 2, min_count: int = 1) -> int:
+    """Rakentaa kirjan: itsepelin asemat haetaan syvyydellä depth.
+
+    Vain asemat, jotka esiintyivät vähintään min_count kertaa, haetaan.
+    """
+    from . import expectiminimax as ex
+    from .board import GameState
+
+    positions = [b for b, n in collect_positions(games, plies, seed, play_depth).items()
+                 if n >= min_count]
+
+    def entries():
+        for b in positions:
+            s = GameState(grid=bitboard.decode(b), backend="bitboard")
+            d, v = ex.best_move_expecti(s, depth=depth, use_book=False)
+            yield b, d, v, depth
+
+    return write_book(path, entries())
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Rakenna tai tarkastele 2048-avauskirjaa.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="rakenna kirja itsepelin asemista")
+    b.add_argument("--out", required=True, help="kohdetiedosto")
+    b.add_argument("--games", type=int, default=50, help="itsepelien määrä")
+    b.add_argument("--plies", type=int, default=30, help="siirtoja per peli")
+    b.add_argument("--depth", type=int, default=5, help="kirjan hakusyvyys")
+    b.add_argument("--play-depth", type=int, default=2, help="itsepelin hakusyvyys")
+    b.add_argument("--min-count", type=int, default=1, help="aseman vähimmäisesiintymät")
+    b.add_argument("--seed", type=int, default=0, help="ensimmäisen pelin siemen")
+    i = sub.add_parser("info", help="tulosta kirjan tiedot")
+    i.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        n = build_book(args.out, args.games, args.plies, args.depth, args.seed,
+                       args.play_depth, args.min_count)
+        print(f"Kirjoitettu {n} asemaa: {args.out}")
+    else:
+        with PositionBook(args.path) as book:
+            size = os.path.getsize(args.path)
+            print(f"{args.path}: {book.count} asemaa, {book.slots} paikkaa,"
+                  f" {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -5,16 +5,28 @@ Tämä moduuli käynnistää tekstipohjaisen pelin, jossa käyttäjä voi:
 - pyytää tekoälyä tekemään siirron ("ai"),
 - lopettaa pelin ("q").
 
+Tekoälymoottori valitaan lipulla --engine ("expecti" tai "mc").
+
 Moduuli huolehtii pelin alustuksesta, syötteiden lukemisesta ja
 pelilaudan tulostamisesta jokaisen siirron jälkeen.
 """
 
 from __future__ import annotations
-from .board import new_game
+import argparse
+from .board import SIZE, new_game
 from .gui import render, read_command, ai_step
 
 
-def main() -> None:
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Pelaa 2048:aa tekstikäyttöliittymässä.")
+    ap.add_argument("--engine", choices=("expecti", "mc"), default="expecti",
+                    help="tekoälymoottori 'ai'-komennolle (mc = Monte Carlo)")
+    ap.add_argument("--depth", type=int, default=4, help="Expectiminimaxin hakusyvyys")
+    ap.add_argument("--size", type=int, default=SIZE, help="laudan koko N (NxN)")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> None:
     """Käynnistää tekstikäyttöliittymän ja hallitsee pelin kulkua.
 
     - Luo uuden pelin.
@@ -22,9 +34,10 @@ def main() -> None:
     - Lukee käyttäjän komennot (WASD, ai, q).
     - Tukee keskeytystä Ctrl+C:llä.
     """
+    args = parse_args(argv)
     print("2048 - tekstikäyttöliittymä")
     print("Ohje: WASD liikkumiseen, 'ai' tekoälyn siirtoon, 'q' lopetukseen.")
-    s = new_game()
+    s = new_game(size=args.size)
     render(s)
     try:
         while not s.over:
@@ -35,7 +48,7 @@ def main() -> None:
             if cmd == "q":
                 break
             if cmd == "ai":
-                ch, d = ai_step(s, depth=4)
+                ch, d = ai_step(s, depth=args.depth, engine=args.engine)
                 print("Tekoälysiirto ei muuttanut lautaa." if not ch else f"AI-siirto: {d}")
             else:
                 if not s.move(cmd):
@@ -0,0 +1,351 @@
+"""Opetusdata itsepelistä: kiinteän levyiset .npy-osatiedostot (memmap).
+
+Jokainen pelattu asema on yksi rivi (rakenteinen dtype ROW, 19 tavua):
+
+    board        u8   4x4-bittilauta ennen siirtoa (ks. bitboard.py)
+    move         u1   pelattu siirto, indeksi gamerecord.MOVE_ORDER-tupleen
+    value        f4   best_move_expecti-haun arvo asemalle
+    final_score  u4   pelin loppupisteet
+    moves_left   u2   siirtoja jäljellä pelin loppuun (viimeisellä 1)
+
+Loppupisteet ja jäljellä olevat siirrot tiedetään vasta pelin lopussa,
+joten yhden pelin rivit kootaan muistiin ja lisätään osatiedostoon pelin
+päätyttyä. ShardWriter kirjoittaa rivit suoraan tiedoston loppuun ja
+päivittää .npy-otsakkeen rivimäärän jokaisen pelin jälkeen (otsakkeessa on
+varattu tila), joten osatiedosto on aina luettavissa np.loadilla eikä
+koko taulukkoa pidetä muistissa. Osatiedosto vaihtuu, kun rows_per_shard
+täyttyy. Olemassa olevia tiedostoja ei korvata: kirjoittaja ohittaa
+hakemistossa jo varatut numerot.
+
+Rinnakkaisajossa jokaisella työprosessilla on oma kirjoittajansa ja omat
+osatiedostonsa (PREFIX-<pid>-<n>.npy), joten prosessit eivät koordinoi
+kirjoituksia. Dataset avaa kaikki osat np.load(mmap_mode="r"):lla ja
+hakee rivit globaaleilla indekseillä; vain kosketut sivut luetaan levyltä.
+
+Lähteenä on joko itsepeli (arvo saadaan pelatun siirron haulta) tai
+pelitallenteet (ks. gamerecord.py), joiden asemat haetaan uudelleen.
+Tallenteista otetaan vain valmiit 4x4-pelit, koska rivin lauta on
+bittilauta.
+
+Käyttö:
+    python -m src.dataset selfplay --out data/ --games 1000 --workers 8 --depth 2
+    python -m src.dataset records --out data/ pelit.rec-* --depth 2
+    python -m src.dataset info data/
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import time
+from typing import Iterable, List, Optional, Sequence
+
+from . import bitboard
+from . import expectiminimax as ex
+from .board import Backend, new_game
+from .gamerecord import MOVE_ORDER, GameRecord, read_games
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy on valinnainen
+    np = None
+
+if np is not None:
+    ROW = np.dtype([("board", "<u8"), ("move", "u1"), ("value", "<f4"),
+                    ("final_score", "<u4"), ("moves_left", "<u2")])
+else:  # pragma: no cover
+    ROW = None
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+HEADER_LEN = 256  # koko .npy-otsake tavuina (64:n monikerta); rivimäärälle jää tilaa
+MOVE_INDEX = {d: i for i, d in enumerate(MOVE_ORDER)}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("opetusdata vaatii NumPyn (pip install numpy)")
+
+
+def _npy_header(rows: int) -> bytes:
+    """.npy 1.0 -otsake rivimäärälle rows, täytetty HEADER_LEN tavuun."""
+    text = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(ROW), rows)
+    pad = HEADER_LEN - len(NPY_MAGIC) - 2 - len(text) - 1
+    if pad < 0:  # pragma: no cover - ROW on kiinteä
+        raise ValueError("npy-otsake ei mahdu varattuun tilaan")
+    body = (text + " " * pad + "\n").encode("latin1")
+    return NPY_MAGIC + len(body).to_bytes(2, "little") + body
+
+
+class ShardWriter:
+    """Lisää pelien rivejä osatiedostoihin directory/PREFIX-<n>.npy."""
+
+    def __init__(self, directory: str, prefix: str = "shard",
+                 rows_per_shard: int = 1 << 20) -> None:
+        _require_numpy()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.rows_per_shard = rows_per_shard
+        self.paths: List[str] = []
+        self._f = None
+        self._rows = 0
+        self._index = 0  # seuraavaksi kokeiltava osatiedoston numero
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _open_next(self) -> None:
+        self.close()
+        while True:
+            path = os.path.join(self.directory, f"{self.prefix}-{self._index:05d}.npy")
+            self._index += 1
+            try:
+                self._f = open(path, "xb")  # ei koskaan korvaa olemassa olevaa
+                break
+            except FileExistsError:
+                continue
+        self._f.write(_npy_header(0))
+        self._rows = 0
+        self.paths.append(path)
+
+    def add_game(self, rows: "np.ndarray") -> None:
+        """Lisää pelin rivit (ROW-taulukko) ja päivittää otsakkeen."""
+        start = 0
+        while start < len(rows):
+            if self._f is None or self._rows >= self.rows_per_shard:
+                self._open_next()
+            part = rows[start:start + self.rows_per_shard - self._rows]
+            self._f.write(np.ascontiguousarray(part, dtype=ROW).tobytes())
+            self._rows += len(part)
+            start += len(part)
+        self._sync_header()
+
+    def _sync_header(self) -> None:
+        if self._f is None:
+            return
+        self._f.seek(0)
+        self._f.write(_npy_header(self._rows))
+        self._f.seek(0, os.SEEK_END)
+        self._f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._sync_header()
+            self._f.close()
+            self._f = None
+
+
+def game_rows(boards: Sequence[int], moves: Sequence[int], values: Sequence[float],
+              final_score: int) -> "np.ndarray":
+    """Yhden pelin rivit: laudat, siirrot ja arvot vuoroittain sekä loppupisteet."""
+    _require_numpy()
+    n = len(boards)
+    rows = np.empty(n, dtype=ROW)
+    rows["board"] = np.array(boards, dtype=np.uint64)
+    rows["move"] = moves
+    rows["value"] = values
+    rows["final_score"] = final_score
+    rows["moves_left"] = np.minimum(np.arange(n, 0, -1), 0xFFFF)
+    return rows
+
+
+def selfplay_rows(seed: int, depth: int = 2, backend: Backend = "bitboard") -> "np.ndarray":
+    """Pelaa siemennetyn pelin ja palauttaa sen rivit (arvo pelatun siirron haulta)."""
+    random.seed(seed)
+    ex.cache.clear()
+    s = new_game(backend=backend)
+    boards: List[int] = []
+    moves: List[int] = []
+    values: List[float] = []
+    while not s.over:
+        d, v = ex.best_move_expecti(s, depth=depth, backend=backend)
+        b = bitboard.encode(s.grid)
+        if not s.move(d):
+            break
+        boards.append(b)
+        moves.append(MOVE_INDEX[d])
+        values.append(v)
+    return game_rows(boards, moves, values, s.score)
+
+
+def record_rows(game: GameRecord, depth: int = 2, backend: Backend = "bitboard") -> "np.ndarray":
+    """Tallennetun pelin rivit; jokainen asema haetaan syvyydellä depth."""
+    if game.size != 4:
+        raise ValueError("opetusdata tukee vain 4x4-pelejä (pakattu bittilauta)")
+    ex.cache.clear()
+    boards: List[int] = []
+    moves: List[int] = []
+    values: List[float] = []
+    states = list(game.states())
+    for s, (d, _r, _c, _v) in zip(states, game.moves()):
+        s.backend = backend
+        _, v = ex.best_move_expecti(s, depth=depth, backend=backend)
+        boards.append(bitboard.encode(s.grid))
+        moves.append(MOVE_INDEX[d])
+        values.append(v)
+    return game_rows(boards, moves, values, states[-1].score)
+
+
+_writer: Optional[ShardWriter] = None
+
+
+def _init_worker(directory: str, prefix: str, rows_per_shard: int) -> None:
+    """Työprosessin oma kirjoittaja (osatiedostot PREFIX-<pid>-<n>.npy)."""
+    global _writer
+    _writer = ShardWriter(directory, f"{prefix}-{os.getpid()}", rows_per_shard)
+
+
+def _selfplay_task(args) -> int:
+    seed, depth, backend = args
+    rows = selfplay_rows(seed, depth, backend)
+    _writer.add_game(rows)
+    return len(rows)
+
+
+def _record_task(args) -> int:
+    game, depth, backend = args
+    rows = record_rows(game, depth, backend)
+    _writer.add_game(rows)
+    return len(rows)
+
+
+def _run(task, tasks: Iterable, directory: str, workers: int, prefix: str,
+         rows_per_shard: int) -> Iterable[int]:
+    """Ajaa tehtävät ja tuottaa kunkin pelin rivimäärän valmistumisjärjestyksessä."""
+    global _writer
+    if workers <= 1:
+        _writer = ShardWriter(directory, f"{prefix}-{os.getpid()}", rows_per_shard)
+        try:
+            yield from map(task, tasks)
+        finally:
+            _writer.close()
+            _writer = None
+        return
+    with multiprocessing.Pool(workers, _init_worker, (directory, prefix, rows_per_shard)) as pool:
+        yield from pool.imap_unordered(task, tasks)
+        # Työprosessit päivittävät otsakkeen jokaisen pelin jälkeen, joten
+        # osatiedostot ovat valmiita ilman erillistä sulkemista.
+
+
+def export_selfplay(directory: str, games: int, depth: int = 2, workers: int = 1,
+                    seed: int = 0, backend: Backend = "bitboard", prefix: str = "shard",
+                    rows_per_shard: int = 1 << 20) -> Iterable[int]:
+    """Pelaa pelit siemenillä seed..seed+games-1 osatiedostoihin; tuottaa rivimäärät."""
+    _require_numpy()
+    tasks = ((seed + i, depth, backend) for i in range(games))
+    return _run(_selfplay_task, tasks, directory, workers, prefix, rows_per_shard)
+
+
+def export_records(directory: str, paths: Sequence[str], depth: int = 2, workers: int = 1,
+                   backend: Backend = "bitboard", prefix: str = "shard",
+                   rows_per_shard: int = 1 << 20) -> Iterable[int]:
+    """Muuntaa tallennetut valmiit 4x4-pelit osatiedostoihin; tuottaa rivimäärät."""
+    _require_numpy()
+    tasks = ((g, depth, backend) for g in read_games(*paths) if g.complete and g.size == 4)
+    return _run(_record_task, tasks, directory, workers, prefix, rows_per_shard)
+
+
+class Dataset:
+    """Osatiedostojen rivit yhtenä taulukkona ilman lataamista muistiin.
+
+    Käyttö:
+        data = Dataset("data/")
+        rows = data[np.random.randint(len(data), size=256)]
+    """
+
+    def __init__(self, source) -> None:
+        """source: hakemisto tai lista .npy-tiedostoja."""
+        _require_numpy()
+        if isinstance(source, str):
+            source = sorted(glob.glob(os.path.join(source, "*.npy")))
+        self.paths = list(source)
+        self.shards = [np.load(p, mmap_mode="r") for p in self.paths]
+        for p, shard in zip(self.paths, self.shards):
+            if shard.dtype != ROW:
+                raise ValueError(f"{p}: väärä rivityyppi {shard.dtype}")
+        self.offsets = np.cumsum([0] + [len(s) for s in self.shards])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index):
+        """Rivi kokonaislukuindeksillä tai rivit indeksitaulukolla (kopio)."""
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            k = int(np.searchsorted(self.offsets, index, side="right")) - 1
+            return self.shards[k][index - self.offsets[k]]
+        index = np.asarray(index, dtype=np.int64)
+        index = np.where(index < 0, index + len(self), index)
+        if index.size and (index.min() < 0 or index.max() >= len(self)):
+            raise IndexError("indeksi rajojen ulkopuolella")
+        out = np.empty(index.shape, dtype=ROW)
+        shard_of = np.searchsorted(self.offsets, index, side="right") - 1
+        for k in np.unique(shard_of):
+            mask = shard_of == k
+            out[mask] = self.shards[k][index[mask] - self.offsets[k]]
+        return out
+
+
+def exponents(boards: "np.ndarray") -> "np.ndarray":
+    """Pakatut laudat (N,) -> (N,4,4) laattaeksponentit (uint8)."""
+    _require_numpy()
+    boards = np.asarray(boards, dtype=np.uint64)
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    cells = (boards[:, None] >> shifts) & np.uint64(15)
+    return cells.astype(np.uint8).reshape(-1, 4, 4)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Opetusdatan vienti .npy-osatiedostoihin.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, help_ in (("selfplay", "pelaa pelejä ja vie asemat"),
+                        ("records", "vie pelitallenteiden asemat")):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--out", required=True, help="osatiedostojen hakemisto")
+        p.add_argument("--depth", type=int, default=2, help="haun syvyys (arvo)")
+        p.add_argument("--workers", type=int, default=1, help="työprosessien määrä")
+        p.add_argument("--backend", choices=("grid", "bitboard"), default="bitboard")
+        p.add_argument("--prefix", default="shard", help="osatiedostojen nimen alku")
+        p.add_argument("--rows-per-shard", type=int, default=1 << 20)
+    sub.choices["selfplay"].add_argument("--games", type=int, default=100)
+    sub.choices["selfplay"].add_argument("--seed", type=int, default=0)
+    sub.choices["records"].add_argument("paths", nargs="+", help="pelitallenteet")
+    info = sub.add_parser("info", help="osatiedostojen koko ja sisältö")
+    info.add_argument("directory")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "info":
+        data = Dataset(args.directory)
+        print(f"{len(data.paths)} osaa, {len(data)} riviä ({len(data) * ROW.itemsize / 1e6:.1f} MB)")
+        if len(data):
+            sample = data[np.random.default_rng(0).integers(len(data), size=min(len(data), 10000))]
+            print(f"otos: arvo ka {sample['value'].mean():.1f},"
+                  f" loppupisteet ka {sample['final_score'].mean():.0f}")
+        return
+    common = dict(depth=args.depth, workers=args.workers, backend=args.backend,
+                  prefix=args.prefix, rows_per_shard=args.rows_per_shard)
+    if args.cmd == "selfplay":
+        counts = export_selfplay(args.out, args.games, seed=args.seed, **common)
+    else:
+        counts = export_records(args.out, args.paths, **common)
+    t0 = time.perf_counter()
+    games = rows = 0
+    for n in counts:
+        games += 1
+        rows += n
+    elapsed = time.perf_counter() - t0
+    print(f"{games} peliä, {rows} riviä, {elapsed:.1f} s"
+          f" ({rows / elapsed if elapsed else 0.0:.0f} riviä/s)")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,52 +1,210 @@
 """Expectiminimax-haku 2048-tekoälylle – optimoitu.
 
 - Dynaaminen syvyys huomioi sekä tyhjät että suurimman laatan.
+- Transpositiotaulu (cache) säilyy siirtojen yli: arvot tallennetaan
+  suhteessa solmun pisteisiin, syvempi tulos kelpaa matalampaan kyselyyn
+  ja vanhat merkinnät ikääntyvät pois (ks. ttable.py).
 - Evaluoinnin välimuisti (eval_cache) vähentää heuristiikkakutsuja.
+- Symmetria (symmetry=True): välimuistien avaimet kanonisoidaan laudan
+  kahdeksan kierron/peilauksen yli. Heuristiikka on symmetrinen, joten arvo
+  ei riipu suunnasta; juuren siirrot arvioidaan aina todellisessa suunnassa.
 - Siirtojen järjestys: käytä nopeaa proxy-arviota (score+evaluate) ennen exp_valuea.
 - CHANCE-solmun ohennus: kun tyhjiä on paljon, arvioi deterministisesti
   vain parhaat 6 syntypaikkaa (kulmat/ reunat ensin) - säilyy determinismi.
+  Tasapelit ratkaistaan laudan kanonisessa suunnassa (pienin bittilauta),
+  joten valinta ei riipu laudan suunnasta: symmetry=True ei muuta arvoja,
+  ja ruudukko- ja bittilautahaku ohentavat samat solut.
+- Todennäköisyysraja (prob_cutoff): CHANCE-solmu, jonka polun todennäköisyys
+  (syntypaikan ja laatan todennäköisyyksien tulo juuresta) on alle rajan,
+  arvioidaan lehtenä. Epätodennäköiset 4-laattojen ketjut eivät siis vie
+  yhtä paljon työtä kuin todennäköiset linjat. Syntypaikan todennäköisyys
+  on 1 / kaikki tyhjät, vaikka ohennus laskisi vain osan. Alipuun arvo,
+  jossa karsittiin, riippuu polun todennäköisyydestä, joten sitä ei
+  tallenneta transpositiotauluun (_cuts laskee karsinnat).
+- Eräarvio (batch=True): bittilautahaun CHANCE-solmu, jolta on kaksi tasoa
+  lehtiin, kerää kaikkien lehtiensä laudat ja arvioi puuttuvat yhdellä
+  NumPy-kutsulla (heuristics.evaluate_bitboard_batch). Välimuistit ja
+  laskujärjestys ovat samat kuin tavallisessa haussa.
+- Arviofunktion vaihto (set_evaluator): lehtien arvio voidaan korvata
+  esim. opitulla n-tuple-verkolla (ntuple.py) tai omilla painoillaan
+  (heuristics.Heuristic); oletus on heuristics.evaluate. using_evaluator
+  vaihtaa arvion vain lohkon ajaksi ja palauttaa edellisen.
+- Inkrementaalinen arvio: lehtien vanhemmissa (syvyys 1) sekä siirtojen
+  järjestyksessä lasten arviot lasketaan vanhemman pakatusta summasta
+  (heuristics.eval_acc_spawn / eval_acc_move) ja talletetaan
+  eval-välimuistiin ennen kuin lapsia käydään läpi. Arvot ovat täsmälleen
+  samat kuin evaluatella; ruudukkohaussa tämä korvaa koko laudan arvion.
+- Hakutila (board.SearchState): ruudukkohaku tekee siirrot ja syntyvät
+  laatat paikallaan yhteen tilaan ja peruu ne (make_move/unmake_move,
+  place_tile/remove_tile), joten lapsille ei kopioida lautaa. Solmufunktiot
+  toimivat myös tavallisella pelitilalla (kopioiden).
+- Avauskirja (set_book): jos kirjassa on asema vähintään pyydetyllä
+  syvyydellä, best_move_expecti palauttaa kirjan siirron hakematta.
+- Bittilautahaku (backend="bitboard"): sama algoritmi 64-bittisillä laudoilla
+  ja rivitaulukoilla; arvot lasketaan suhteessa solmun pisteisiin.
+- Laudan koko: ruudukkohaku toimii millä tahansa NxN-laudalla (siirrot ja
+  käärmepainot kokokohtaisista taulukoista); bittilautahaku, eräarvio,
+  inkrementaalinen arvio ja avauskirja ovat 4x4:n nopeita polkuja.
+- Iteratiivinen syvennys (best_move_iterative): syvyydet 1, 2, 3, ... kunnes
+  aika- tai solmubudjetti loppuu; palauttaa viimeisen valmiin kierroksen
+  parhaan siirron ja järjestää juuren siirrot edellisen kierroksen mukaan.
+- Hakutilastot (stats=True): solmut kirjataan samassa hitaassa polussa kuin
+  budjetin tarkistus (_check_budget), ja välimuistit, ohennus ja syvyys
+  omissa kirjauspisteissään, kun _stats on asetettu (ks. searchstats.py).
+  Moduulin funktioita ei vaihdeta, ja ilman tilastoja hinta on sama
+  solmulaskurin vertailu kuin budjetilla.
 """
 
 from __future__ import annotations
-from typing import Tuple, List
-from .board import GameState, Direction, PROB_FOUR
-from .heuristics import evaluate
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple, List
+import sys
+import time
+from .board import Backend, GameState, Direction, PROB_FOUR, SearchState
+from .heuristics import evaluate, evaluate_bitboard, evaluate_bitboard_batch
+from .heuristics import eval_acc, eval_acc_move, eval_acc_spawn, evaluate_acc
 from .grid_ops import MOVE_FUN
+from . import bitboard
+from . import heuristics
+from .ttable import TranspositionTable
+from .searchstats import SearchStats
 
 MOVE_ORDER = ("left", "up", "right", "down")
+_BB_MOVE_FUN = bitboard.MOVE_FUN
+_THIN_CELLS = 6                         # CHANCE-solmun ohennuksen solumäärä
 
 # Välimuistit
-cache: dict[tuple, float] = {}          # (grid, depth, node) -> value
-_eval_cache: dict[tuple, float] = {}    # grid -> evaluate(grid)
+cache = TranspositionTable()            # (grid, node) -> {depth: value - score}
+_eval_cache: dict = {}                  # grid -> evaluate(grid)
+_EVAL_CACHE_LIMIT = 1_000_000
+_symmetry = False                       # kanonisoidaanko avaimet (best_move_expecti asettaa)
+_prob_cutoff = 0.0                      # polun todennäköisyysraja (0 = ei karsintaa)
+_cuts = 0                               # todennäköisyysrajan karsinnat (kasvaa vain)
+_batch = False                          # arvioidaanko lehdet erissä (bittilautahaku)
+_book = None                            # avauskirja (book.PositionBook) tai None
+_incremental = True                     # inkrementaalinen arvio (vain heuristiikalla)
+_evaluator = None                       # set_evaluatorin arvioija (None = heuristics)
+_stats: Optional[SearchStats] = None    # kerättävät tilastot (best_move_expecti(stats=True))
+
+# Budjetti (best_move_iterative): solmulaskuri tarkistetaan vain kun se
+# ylittää _check_at-rajan, joten ilman budjettia hinta on yksi vertailu.
+# Tilastoja kerättäessä raja on aina ylitetty, jolloin jokainen solmu kirjataan.
+_BUDGET_CHECK_INTERVAL = 32
+_nodes = 0
+_check_at = sys.maxsize
+_deadline: Optional[float] = None
+_node_limit: Optional[int] = None
+
+
+class _SearchAborted(Exception):
+    """Budjetti loppui kesken hakukierroksen."""
 
 # ---------- Apufunktiot ----------
 
 def _grid_key(g: List[List[int]]) -> tuple:
     """Yhtenäinen avain ruudukolle (käytetään sekä eval- että haku-välimuisteissa)."""
-    return tuple(map(tuple, g))
+    t = tuple(map(tuple, g))
+    return canonical_grid_key(t) if _symmetry else t
+
+def canonical_grid_key(t: tuple) -> tuple:
+    """Pienin ruudukkoavain laudan kahdeksasta kierrosta ja peilauksesta."""
+    variants = []
+    for base in (t, tuple(r[::-1] for r in t)):
+        for _ in range(4):
+            variants.append(base)
+            base = tuple(zip(*base[::-1]))
+    return min(variants)
 
-def make_key(g: List[List[int]], d: int, node: str) -> tuple:
-    """Luo hajautusavaimen välimuistia varten."""
-    return (_grid_key(g), d, node)
+def make_key(g: List[List[int]], node: str) -> tuple:
+    """Luo hajautusavaimen välimuistia varten (syvyys on merkinnässä, ei avaimessa)."""
+    return (_grid_key(g), node)
 
 def eval_cached(g: List[List[int]]) -> float:
     """Heuristiikka välimuistista (tai laske ja talleta)."""
     k = _grid_key(g)
     v = _eval_cache.get(k)
     if v is None:
-        v = evaluate(g)
+        v = evaluate(g) if _stats is None else _timed_eval(evaluate, g)
         _eval_cache[k] = v
+    elif _stats is not None:
+        _stats.eval_hits += 1
     return v
 
+def _timed_eval(fn, *args) -> float:
+    """Arvio tilastoineen (eval-huti ja heuristiikan aika)."""
+    t0 = time.perf_counter()
+    v = fn(*args)
+    _stats.eval_time += time.perf_counter() - t0
+    _stats.eval_misses += 1
+    return v
+
+def _encode(g: List[List[int]]) -> Optional[int]:
+    """Ruudukko bittilaudaksi, tai None jos laattaa ei voi esittää."""
+    try:
+        return bitboard.encode(g)
+    except ValueError:
+        return None
+
+def _prime_spawn_evals(g: List[List[int]], cells: List[tuple[int, int]]) -> None:
+    """Laskee CHANCE-solmun lasten arviot eval-välimuistiin.
+
+    Lapsi eroaa ruudukosta g yhdellä laatalla, joten sen arvio saadaan g:n
+    pakatusta summasta päivittämällä yksi rivi ja sarake.
+    """
+    b = _encode(g)
+    if b is None:
+        return
+    acc = None
+    g = [r[:] for r in g]
+    for r, c in cells:
+        sh = 16 * r + 4 * c
+        for val, e in ((2, 1), (4, 2)):
+            g[r][c] = val
+            k = _grid_key(g)
+            if k not in _eval_cache:
+                if acc is None:
+                    acc = eval_acc(b)
+                a, cb = eval_acc_spawn(acc, b, sh, e), b | (e << sh)
+                _eval_cache[k] = evaluate_acc(a, cb) if _stats is None else _timed_eval(evaluate_acc, a, cb)
+        g[r][c] = 0
+
+def _prime_move_evals(g: List[List[int]], children: List[tuple[str, List[List[int]], int]]) -> None:
+    """Laskee MAX-solmun lasten (siirtojen) arviot eval-välimuistiin.
+
+    Vain siirrossa muuttuneiden rivien ja sarakkeiden osuudet lasketaan.
+    """
+    b = _encode(g)
+    if b is None:
+        return
+    acc = None
+    for m, new_grid, _gained in children:
+        acc = _prime_move_eval(_grid_key(new_grid), b, acc, m)
+
+def _prime_move_eval(k: tuple, b: int, acc: Optional[int], m: str) -> Optional[int]:
+    """Laskee siirron m lapsen (avain k) arvion, ellei se ole välimuistissa.
+
+    acc on laudan b pakattu summa tai None (lasketaan tarvittaessa);
+    palauttaa summan seuraavalle siirrolle.
+    """
+    if k not in _eval_cache:
+        if acc is None:
+            acc = eval_acc(b)
+        nb = _BB_MOVE_FUN[m](b)[0]
+        a = eval_acc_move(acc, b, nb)
+        _eval_cache[k] = evaluate_acc(a, nb) if _stats is None else _timed_eval(evaluate_acc, a, nb)
+    return acc
+
 def leaf_value(s: GameState) -> float:
     """Laskee lehtisolmun arvon (pisteet + heuristiikka)."""
     return float(s.score) + eval_cached(s.grid)
 
-def _largest_tile(g: List[List[int]]) -> int:
-    return max(max(row) for row in g)
+def dynamic_depth(b: int, empties: int, largest: int, cells: int = 16) -> int:
+    """Säädä hakusyvyyttä sekä tyhjien että suurimman laatan mukaan.
 
-def dynamic_depth(b: int, empties: int, largest: int) -> int:
-    """Säädä hakusyvyyttä sekä tyhjien että suurimman laatan mukaan."""
+    Rajat on asetettu 4x4-laudalle (16 solua); muilla koilla tyhjien
+    määrä suhteutetaan solujen määrään cells.
+    """
+    empties = empties * 16 / cells
     d = b
     if empties >= 12:
         d += 2
@@ -58,107 +216,698 @@ def dynamic_depth(b: int, empties: int, largest: int) -> int:
         d += 1
     return max(1, d)
 
+_SYM_PERMS: Dict[int, List[List[int]]] = {}
+
+def _symmetry_perms(n: int) -> List[List[int]]:
+    """NxN-laudan kahdeksan symmetriaa indeksipermutaatioina (uusi[j] = vanha[p[j]])."""
+    perms = _SYM_PERMS.get(n)
+    if perms is None:
+        perms = []
+        idx = [[r * n + c for c in range(n)] for r in range(n)]
+        for base in (idx, [r[::-1] for r in idx]):
+            for _ in range(4):
+                perms.append([i for r in base for i in r])
+                base = [list(r) for r in zip(*base[::-1])]
+        perms = _SYM_PERMS[n] = perms
+    return perms
+
 def _order_cells(g: List[List[int]], cells: List[tuple[int, int]]) -> List[tuple[int, int]]:
-    """Deterministinen järjestys: kulmat > reunat > keskusta."""
+    """Deterministinen järjestys: kulmat > reunat > keskusta.
+
+    Saman luokan solut ovat laudan kanonisen suunnan rivijärjestyksessä.
+    Kanoninen suunta on sama kuin bitboard.canonical: eksponentit
+    viimeisestä solusta alkaen vertailtuina pienin. Jos ohennuksen raja ei
+    osu luokan sisään, valinta ei riipu suunnasta eikä sitä lasketa.
+    """
     n = len(g)
     corners = {(0, 0), (0, n - 1), (n - 1, 0), (n - 1, n - 1)}
-    def score(cell):
+    def rank(cell):
         r, c = cell
         return 0 if cell in corners else 1 if (r in (0, n - 1) or c in (0, n - 1)) else 2
-    return sorted(cells, key=score)
+    ranked = sorted(cells, key=rank)
+    if len(ranked) <= _THIN_CELLS or rank(ranked[_THIN_CELLS - 1]) != rank(ranked[_THIN_CELLS]):
+        return ranked
+    e = [v.bit_length() - 1 if v else 0 for r in g for v in r]
+    last = range(n * n - 1, -1, -1)
+    perm = min(_symmetry_perms(n), key=lambda p: [e[p[j]] for j in last])
+    pos = [0] * (n * n)
+    for j, i in enumerate(perm):
+        pos[i] = j
+    return sorted(cells, key=lambda cell: (rank(cell), pos[cell[0] * n + cell[1]]))
 
 def _proxy_child_score(new_grid: List[List[int]], gained: int, base_score: float) -> float:
     """Nopea ennakkoarvio siirtojärjestystä varten (ei käy CHANCE-haaraa)."""
     empties = sum(v == 0 for r in new_grid for v in r)
     return base_score + gained + eval_cached(new_grid) + 0.05 * empties
 
+def _check_budget(node: Optional[str] = None, d: int = 0, p: float = 1.0) -> None:
+    """Solmulaskurin hidas polku: kirjaa solmun tilastoihin ja tarkistaa budjetin.
+
+    Args:
+        node: "max" tai "chance" (None = ei kirjata solmua).
+        d, p: Solmun jäljellä oleva syvyys ja polun todennäköisyys.
+
+    Raises:
+        _SearchAborted: Aika- tai solmubudjetti on käytetty.
+    """
+    global _check_at
+    st = _stats
+    if st is not None and node is not None:
+        st.nodes[node][d] += 1
+        if node == "chance" and d and p < _prob_cutoff:
+            st.prob_cut += 1
+    if _node_limit is not None and _nodes >= _node_limit:
+        raise _SearchAborted
+    if _deadline is not None and time.perf_counter() >= _deadline:
+        raise _SearchAborted
+    if st is not None:
+        _check_at = _nodes  # seuraavakin solmu kirjataan
+        return
+    _check_at = _nodes + _BUDGET_CHECK_INTERVAL
+    if _node_limit is not None:
+        _check_at = min(_check_at, _node_limit)
+
+def _set_budget(deadline: Optional[float], node_limit: Optional[int]) -> None:
+    """Asettaa (tai None-arvoilla poistaa) haun budjetin."""
+    global _deadline, _node_limit, _check_at
+    _deadline, _node_limit = deadline, node_limit
+    if deadline is None and node_limit is None and _stats is None:
+        _check_at = sys.maxsize
+    else:
+        _check_at = _nodes
+
+def _time_moves(x) -> None:
+    """Tilastot: MAX-solmun siirtojen generointiaika.
+
+    Haku generoi siirrot lomittain alipuiden kanssa, joten aika mitataan
+    generoimalla solmun siirrot kerran erikseen (bittilauta tai ruudukko).
+    """
+    t0 = time.perf_counter()
+    if type(x) is int:
+        for f in _BB_MOVE_FUN.values():
+            f(x)
+    else:
+        g = x.grid
+        for f in MOVE_FUN.values():
+            f(g)
+    _stats.movegen_time += time.perf_counter() - t0
+
+def set_evaluator(net=None) -> None:
+    """Vaihtaa lehtien arviofunktion (None = heuristics).
+
+    net tarjoaa evaluate(grid), evaluate_bitboard(b) ja
+    evaluate_bitboard_batch(boards), esim. ntuple.NTupleNetwork tai polku
+    sen painotiedostoon, tai heuristics.Heuristic (jolla inkrementaalinen
+    arvio säilyy). Välimuistit tyhjennetään, koska arvot muuttuvat.
+    """
+    global evaluate, evaluate_bitboard, evaluate_bitboard_batch, evaluate_acc
+    global _incremental, _evaluator
+    if isinstance(net, str):
+        from .ntuple import NTupleNetwork
+        net = NTupleNetwork.load(net)
+    src = heuristics if net is None else net
+    evaluate = src.evaluate
+    evaluate_bitboard = src.evaluate_bitboard
+    evaluate_bitboard_batch = src.evaluate_bitboard_batch
+    _incremental = net is None or isinstance(net, heuristics.Heuristic)
+    if _incremental:
+        evaluate_acc = src.evaluate_acc
+    _evaluator = net
+    cache.clear()
+    _eval_cache.clear()
+
+@contextmanager
+def using_evaluator(net):
+    """Käyttää arvioijaa net (ks. set_evaluator) lohkon ajan ja palauttaa edellisen."""
+    outer = _evaluator
+    set_evaluator(net)
+    try:
+        yield
+    finally:
+        set_evaluator(outer)
+
+def set_book(book) -> None:
+    """Ottaa käyttöön avauskirjan (book.PositionBook, polku tai None = pois)."""
+    global _book
+    if isinstance(book, str):
+        from .book import PositionBook
+        book = PositionBook(book)
+    _book = book
+
+def _book_move(s: GameState, depth: int) -> Optional[Tuple[Direction, float]]:
+    """Kirjan siirto, jos asema on kirjassa vähintään syvyydellä depth."""
+    try:
+        hit = _book.get(bitboard.encode(s.grid))
+    except ValueError:
+        return None  # laattaa ei voi esittää bittilaudalla
+    if hit is None or hit[2] < depth:
+        return None
+    return hit[0], float(s.score) + hit[1]
+
+def _begin_search(symmetry: bool, prob_cutoff: float = 0.0, batch: bool = False) -> None:
+    """Yhteinen alustus jokaiselle juurihaulle."""
+    global _symmetry, _prob_cutoff, _batch
+    _symmetry = symmetry
+    _prob_cutoff = prob_cutoff
+    _batch = batch
+    cache.new_search()
+    if len(_eval_cache) > _EVAL_CACHE_LIMIT:
+        _eval_cache.clear()
+
 def _ordered_moves(s: GameState) -> List[tuple[str, List[List[int]], int, float]]:
     """Palauta kaikki toteutettavat siirrot järjestettynä proxy-arvolla."""
+    if type(s) is SearchState:
+        return _ordered_moves_inplace(s)
     base = float(s.score)
-    moves = []
+    children = []
     for m in MOVE_ORDER:
         new_grid, gained = MOVE_FUN[m](s.grid)
         if new_grid != s.grid:
-            moves.append((m, new_grid, gained, _proxy_child_score(new_grid, gained, base)))
+            children.append((m, new_grid, gained))
+    if children and _incremental:
+        _prime_move_evals(s.grid, children)
+    moves = [(m, new_grid, gained, _proxy_child_score(new_grid, gained, base))
+             for m, new_grid, gained in children]
+    moves.sort(key=lambda t: t[3], reverse=True)
+    return moves
+
+def _ordered_moves_inplace(s: SearchState) -> List[tuple[str, None, int, float]]:
+    """_ordered_moves hakutilalle: siirrot tehdään ja perutaan paikallaan.
+
+    Lapsen ruudukkoa ei palauteta (None); max_value tekee siirron uudelleen.
+    """
+    score = s.score
+    base = float(score)
+    b = _encode(s.grid) if _incremental else None
+    acc = None
+    moves = []
+    for m in MOVE_ORDER:
+        if not s.make_move(m):
+            continue
+        gained = s.score - score
+        if b is not None:
+            acc = _prime_move_eval(_grid_key(s.grid), b, acc, m)
+        moves.append((m, None, gained, base + gained + eval_cached(s.grid) + 0.05 * s.empties))
+        s.unmake_move()
     moves.sort(key=lambda t: t[3], reverse=True)
     return moves
 
 # ---------- Pääfunktiot ----------
 
-def best_move_expecti(s: GameState, depth: int = 4) -> Tuple[Direction, float]:
-    cache.clear()
-    _eval_cache.clear()
+def best_move_expecti(s: GameState, depth: int = 4,
+                      backend: Optional[Backend] = None,
+                      symmetry: bool = False, stats: bool = False,
+                      prob_cutoff: float = 0.0, batch: bool = False,
+                      use_book: bool = True):
+    """Valitsee parhaan siirron Expectiminimax-haulla.
 
-    empties = sum(v == 0 for r in s.grid for v in r)
-    d = dynamic_depth(depth, empties, _largest_tile(s.grid))
+    Args:
+        s: Pelitila.
+        depth: Haun perussyvyys (dynamic_depth säätää tätä).
+        backend: "grid" tai "bitboard"; oletuksena tilan oma backend.
+        symmetry: Kanonisoi välimuistiavaimet symmetrioiden yli.
+        stats: Kerää ja palauta hakutilastot (ks. searchstats.py).
+        prob_cutoff: Polun todennäköisyys, jonka alittava CHANCE-solmu
+            arvioidaan lehtenä (0 = ei karsintaa).
+        batch: Arvioi lehdet NumPy-erinä bittilautahaulla. Lauta, jota
+            bittilauta ei esitä (muu kuin 4x4), haetaan ruudukkohaulla.
+        use_book: Katso ensin avauskirjasta (jos set_book on asetettu).
+
+    Returns:
+        (suunta, odotusarvo), tai stats=True: (suunta, odotusarvo, SearchStats).
+    """
+    if stats:
+        return _best_move_with_stats(s, depth, backend, symmetry, prob_cutoff, batch, use_book)
+    if _book is not None and use_book:
+        hit = _book_move(s, depth)
+        if hit is not None:
+            if _stats is not None:
+                _stats.book_hit = True
+            return hit
+    _begin_search(symmetry, prob_cutoff, batch)
+    if (backend or getattr(s, "backend", "grid")) == "bitboard":
+        return _bb_best_move(s, depth, bitboard.encode(s.grid))
+    if batch:
+        b = _encode(s.grid)
+        if b is not None:
+            return _bb_best_move(s, depth, b)
+        # Eräarvio on bittilaudan polku; muu lauta haetaan ruudukkohaulla.
+
+    s = SearchState.from_state(s)
+    d = dynamic_depth(depth, s.empties, s.max_tile, len(s.grid) ** 2)
+    if _stats is not None:
+        _stats.depth = d
 
     moves = _ordered_moves(s)
     if not moves:
         return "left", leaf_value(s)  # ei laillista siirtoa
 
     best_dir, best_val = moves[0][0], float("-inf")
-    for m, new_grid, gained, _proxy in moves:
-        child = s.copy()
-        child.grid = new_grid
-        child.score = s.score + gained
-        val = exp_value(child, d - 1)
+    for m, _new_grid, _gained, _proxy in moves:
+        s.make_move(m)
+        val = exp_value(s, d - 1)
+        s.unmake_move()
         if val > best_val:
             best_val, best_dir = val, m
     return best_dir, best_val
 
-def exp_value(s: GameState, d: int) -> float:
-    if d == 0:
+def _best_move_with_stats(s: GameState, depth: int, backend: Optional[Backend],
+                          symmetry: bool, prob_cutoff: float, batch: bool,
+                          use_book: bool) -> Tuple[Direction, float, SearchStats]:
+    """best_move_expecti(stats=True): sama haku, jonka aikana _stats kirjaa."""
+    global _stats
+    st = SearchStats()
+    outer, _stats = _stats, st
+    _set_budget(_deadline, _node_limit)
+    t0 = time.perf_counter()
+    try:
+        d, v = best_move_expecti(s, depth, backend, symmetry,
+                                 prob_cutoff=prob_cutoff, batch=batch, use_book=use_book)
+    finally:
+        st.total_time = time.perf_counter() - t0
+        _stats = outer
+        _set_budget(_deadline, _node_limit)
+    if not st.book_hit:  # muuten laskurit olisivat edellisen haun
+        st.tt_hits, st.tt_misses = cache.hits, cache.misses
+    st.tt_size, st.eval_cache_size = len(cache), len(_eval_cache)
+    return d, v, st
+
+def best_move_iterative(s: GameState, time_ms: Optional[float] = None,
+                        max_nodes: Optional[int] = None, max_depth: int = 12,
+                        backend: Optional[Backend] = None,
+                        symmetry: bool = False,
+                        prob_cutoff: float = 0.0) -> Tuple[Direction, float]:
+    """Anytime-haku: syvennä 1, 2, 3, ... kunnes budjetti loppuu.
+
+    Ensimmäinen kierros ajetaan aina loppuun, joten siirto löytyy aina.
+    Keskeytetyn kierroksen tulos hylätään; sen valmiit alipuut jäävät
+    transpositiotauluun. dynamic_depth ei ole käytössä, syvyys on kierroksen.
+
+    Args:
+        s: Pelitila.
+        time_ms: Aikabudjetti millisekunteina (None = ei rajaa).
+        max_nodes: Solmubudjetti (None = ei rajaa).
+        max_depth: Suurin syvyys.
+        backend: "grid" tai "bitboard"; oletuksena tilan oma backend.
+        symmetry: Kanonisoi välimuistiavaimet symmetrioiden yli.
+        prob_cutoff: Polun todennäköisyysraja (ks. best_move_expecti).
+
+    Returns:
+        (suunta, odotusarvo) viimeisimmältä valmiilta kierrokselta.
+    """
+    global _nodes
+    start = time.perf_counter()
+    _begin_search(symmetry, prob_cutoff)
+    _nodes = 0
+    bb = (backend or getattr(s, "backend", "grid")) == "bitboard"
+
+    if bb:
+        b = bitboard.encode(s.grid)
+        children = [(m, nb, gained) for m, nb, gained, _proxy in _bb_ordered_moves(b)]
+        if not children:
+            return "left", float(s.score) + _bb_eval(b)
+    else:
+        children = []
+        for m, new_grid, gained, _proxy in _ordered_moves(s):
+            child = s.copy()
+            child.grid = new_grid
+            child.score = s.score + gained
+            children.append((m, child, gained))
+        if not children:
+            return "left", leaf_value(s)
+
+    best: Tuple[Direction, float] = (children[0][0], float("-inf"))
+    try:
+        for d in range(1, max_depth + 1):
+            scored = []
+            for m, child, gained in children:
+                if bb:
+                    val = float(s.score) + gained + _bb_exp_value(child, d - 1)
+                else:
+                    val = exp_value(SearchState.from_state(child), d - 1)
+                scored.append((val, m, child, gained))
+            best_val, best_dir = float("-inf"), scored[0][1]
+            for val, m, _child, _gained in scored:
+                if val > best_val:
+                    best_val, best_dir = val, m
+            best = (best_dir, best_val)
+            # Seuraava kierros aloittaa parhaasta (vakaa lajittelu säilyttää tasapelit).
+            scored.sort(key=lambda t: t[0], reverse=True)
+            children = [(m, child, gained) for _val, m, child, gained in scored]
+            if d == 1:
+                _set_budget(None if time_ms is None else start + time_ms / 1000.0, max_nodes)
+    except _SearchAborted:
+        pass
+    finally:
+        _set_budget(None, None)
+    return best
+
+def exp_value(s: GameState, d: int, p: float = 1.0) -> float:
+    global _nodes, _cuts
+    _nodes += 1
+    if _nodes >= _check_at:
+        _check_budget("chance", d, p)
+    if d == 0 or p < _prob_cutoff:
+        if d:
+            _cuts += 1
         return leaf_value(s)
 
-    k = make_key(s.grid, d, "chance")
-    if k in cache:
-        return cache[k]
+    k = make_key(s.grid, "chance")
+    v = cache.get(k, d)
+    if v is not None:
+        return v + s.score
 
     cells = s.empty_cells()
     if not cells:
         v = leaf_value(s)
-        cache[k] = v
+        cache.put(k, d, v - s.score)
         return v
 
+    # Syntypaikan todennäköisyys lasketaan kaikista tyhjistä, ei ohennetuista.
+    p /= len(cells)
     # Kun tyhjiä on paljon, ohennetaan deterministisesti 6 soluun (kulmat/reunat ensin)
-    if len(cells) > 6 and d >= 3:
-        cells = _order_cells(s.grid, cells)[:6]
+    if len(cells) > _THIN_CELLS and d >= 3:
+        if _symmetry:
+            # Lasketaan kanonisessa suunnassa, jotta talletettu arvo (summan
+            # järjestys) ei riipu siitä, mistä suunnasta asemaan tultiin.
+            s = s.copy()
+            s.grid = [list(r) for r in k[0]]
+            cells = s.empty_cells()
+        if _stats is not None:
+            _stats.thinned += 1
+            _stats.thinned_cells += len(cells) - _THIN_CELLS
+        cells = _order_cells(s.grid, cells)[:_THIN_CELLS]
+    if d == 1 and _incremental:
+        _prime_spawn_evals(s.grid, cells)  # lapset ovat lehtiä
 
     probs = ((2, 1.0 - PROB_FOUR), (4, PROB_FOUR))
+    cuts = _cuts
     total = 0.0
-    for r, c in cells:
-        child = s.copy()
-        for val, p in probs:
-            child.grid[r][c] = val
-            total += p * max_value(child, d - 1)
-        child.grid[r][c] = 0  # palautus
+    if type(s) is SearchState:
+        for r, c in cells:
+            for val, pv in probs:
+                s.place_tile(r, c, val)
+                total += pv * max_value(s, d - 1, p * pv)
+                s.remove_tile(r, c)
+    else:
+        for r, c in cells:
+            child = s.copy()
+            for val, pv in probs:
+                child.grid[r][c] = val
+                total += pv * max_value(child, d - 1, p * pv)
+            child.grid[r][c] = 0  # palautus
 
     res = total / len(cells)
-    cache[k] = res
+    if _cuts == cuts:  # karsittu arvo riippuu polusta, ei talleteta
+        cache.put(k, d, res - s.score)
     return res
 
-def max_value(s: GameState, d: int) -> float:
+def max_value(s: GameState, d: int, p: float = 1.0) -> float:
+    global _nodes
+    _nodes += 1
+    if _nodes >= _check_at:
+        _check_budget("max", d, p)
     if d == 0:
         return leaf_value(s)
 
-    k = make_key(s.grid, d, "max")
-    if k in cache:
-        return cache[k]
+    k = make_key(s.grid, "max")
+    v = cache.get(k, d)
+    if v is not None:
+        return v + s.score
+    if _stats is not None:
+        _time_moves(s)
 
     moves = _ordered_moves(s)
     if not moves:
         res = leaf_value(s)
-        cache[k] = res
+        cache.put(k, d, res - s.score)
         return res
 
     best = float("-inf")
-    for _m, new_grid, gained, _proxy in moves:
-        child = s.copy()
-        child.grid = new_grid
-        child.score = s.score + gained
-        v = exp_value(child, d - 1)
+    inplace = type(s) is SearchState
+    cuts = _cuts
+    for m, new_grid, gained, _proxy in moves:
+        if inplace:
+            s.make_move(m)
+            v = exp_value(s, d - 1, p)
+            s.unmake_move()
+        else:
+            child = s.copy()
+            child.grid = new_grid
+            child.score = s.score + gained
+            v = exp_value(child, d - 1, p)
         if v > best:
             best = v
 
-    cache[k] = best
+    if _cuts == cuts:
+        cache.put(k, d, best - s.score)
+    return best
+
+
+# ---------- Bittilautahaku ----------
+#
+# Samat solmut kuin yllä, mutta tila on pelkkä 64-bittinen lauta. Arvot ovat
+# suhteessa solmun pisteisiin (tulevat yhdistymispisteet + heuristiikka),
+# joten pisteitä ei tarvitse kuljettaa mukana; juuri lisää s.score:n.
+# Transpositiotaulun avain on (lauta << 1) | solmutyyppi (1 = CHANCE), missä
+# lauta on symmetriatilassa kanoninen muoto.
+
+def _bb_cell_rank(shift: int) -> int:
+    """Kulmat > reunat > keskusta, kuten _order_cells."""
+    r, c = divmod(shift >> 2, 4)
+    if r in (0, 3) and c in (0, 3):
+        return 0
+    return 1 if (r in (0, 3) or c in (0, 3)) else 2
+
+_BB_CELL_RANK = {s: _bb_cell_rank(s) for s in range(0, 64, 4)}
+
+def _bb_thin_keys(i: int) -> Dict[int, int]:
+    """Solun järjestysavain, kun lauta viedään kanoniseksi symmetrialla i."""
+    keys = {}
+    for sh in range(0, 64, 4):
+        pos = bitboard.apply_symmetry(0xF << sh, i).bit_length() - 4
+        keys[sh] = _BB_CELL_RANK[sh] * 64 + pos
+    return keys
+
+_BB_THIN_KEYS = [_bb_thin_keys(i) for i in range(len(bitboard.SYMMETRIES))]
+
+def _bb_thin(b: int, shifts: List[int]) -> List[int]:
+    """CHANCE-solmun ohennus: _THIN_CELLS parasta syntypaikkaa.
+
+    Sama valinta kuin _order_cells: tasapelit kanonisen suunnan mukaan.
+    """
+    rank = _BB_CELL_RANK.__getitem__
+    ranked = sorted(shifts, key=rank)
+    if rank(ranked[_THIN_CELLS - 1]) != rank(ranked[_THIN_CELLS]):
+        return ranked[:_THIN_CELLS]
+    _cb, i = bitboard.canonical_symmetry(b)
+    return sorted(shifts, key=_BB_THIN_KEYS[i].__getitem__)[:_THIN_CELLS]
+
+def _bb_eval(b: int) -> float:
+    k = bitboard.canonical(b) if _symmetry else b
+    v = _eval_cache.get(k)
+    if v is None:
+        v = evaluate_bitboard(b) if _stats is None else _timed_eval(evaluate_bitboard, b)
+        _eval_cache[k] = v
+    elif _stats is not None:
+        _stats.eval_hits += 1
+    return v
+
+def _bb_prime_spawn_evals(b: int, shifts: List[int]) -> None:
+    """Laskee CHANCE-solmun lasten arviot eval-välimuistiin (ks. _prime_spawn_evals)."""
+    acc = None
+    for sh in shifts:
+        for e in (1, 2):
+            cb = b | (e << sh)
+            k = bitboard.canonical(cb) if _symmetry else cb
+            if k not in _eval_cache:
+                if acc is None:
+                    acc = eval_acc(b)
+                a = eval_acc_spawn(acc, b, sh, e)
+                _eval_cache[k] = evaluate_acc(a, cb) if _stats is None else _timed_eval(evaluate_acc, a, cb)
+
+def _bb_ordered_moves(b: int) -> List[tuple[str, int, int, float]]:
+    """Juuren lailliset siirrot proxy-arvon mukaan järjestettynä."""
+    moves = []
+    for m in MOVE_ORDER:
+        nb, gained = _BB_MOVE_FUN[m](b)
+        if nb != b:
+            proxy = gained + _bb_eval(nb) + 0.05 * bitboard.count_empty(nb)
+            moves.append((m, nb, gained, proxy))
+    moves.sort(key=lambda t: t[3], reverse=True)
+    return moves
+
+def _bb_best_move(s: GameState, depth: int, b: int) -> Tuple[Direction, float]:
+    d = dynamic_depth(depth, bitboard.count_empty(b), 1 << bitboard.max_exponent(b))
+    if _stats is not None:
+        _stats.depth = d
+
+    moves = _bb_ordered_moves(b)
+    if not moves:
+        return "left", float(s.score) + _bb_eval(b)
+
+    best_dir, best_val = moves[0][0], float("-inf")
+    for m, nb, gained, _proxy in moves:
+        val = gained + _bb_exp_value(nb, d - 1)
+        if val > best_val:
+            best_val, best_dir = val, m
+    return best_dir, float(s.score) + best_val
+
+def _bb_exp_value(b: int, d: int, p: float = 1.0) -> float:
+    global _nodes, _cuts
+    _nodes += 1
+    if _nodes >= _check_at:
+        _check_budget("chance", d, p)
+    if d == 0 or p < _prob_cutoff:
+        if d:
+            _cuts += 1
+        return _bb_eval(b)
+
+    if _symmetry:
+        # Kanoninen muoto myös laskentaan, jotta talletettu arvo (summan
+        # järjestys) ei riipu siitä, mistä suunnasta asemaan tultiin.
+        b = bitboard.canonical(b)
+    k = (b << 1) | 1
+    v = cache.get(k, d)
+    if v is not None:
+        return v
+
+    shifts = bitboard.empty_shifts(b)
+    if not shifts:
+        v = _bb_eval(b)
+        cache.put(k, d, v)
+        return v
+
+    p /= len(shifts)  # syntypaikan todennäköisyys kaikista tyhjistä
+    if len(shifts) > _THIN_CELLS and d >= 3:
+        if _stats is not None:
+            _stats.thinned += 1
+            _stats.thinned_cells += len(shifts) - _THIN_CELLS
+        shifts = _bb_thin(b, shifts)
+    if d == 2 and _batch:
+        res = _bb_frontier(b, shifts)
+        cache.put(k, d, res)
+        return res
+    if d == 1 and _incremental and not _symmetry:
+        # Lapset ovat lehtiä. Symmetriatilassa kanoninen avain maksaa
+        # enemmän kuin inkrementaalinen arvio säästää.
+        _bb_prime_spawn_evals(b, shifts)
+
+    p2, p4 = 1.0 - PROB_FOUR, PROB_FOUR
+    c2, c4 = p * p2, p * p4
+    cuts = _cuts
+    total = 0.0
+    for sh in shifts:
+        total += p2 * _bb_max_value(b | (1 << sh), d - 1, c2)
+        total += p4 * _bb_max_value(b | (2 << sh), d - 1, c4)
+
+    res = total / len(shifts)
+    if _cuts == cuts:  # karsittu arvo riippuu polusta, ei talleteta
+        cache.put(k, d, res)
+    return res
+
+def _bb_max_value(b: int, d: int, p: float = 1.0) -> float:
+    global _nodes
+    _nodes += 1
+    if _nodes >= _check_at:
+        _check_budget("max", d, p)
+    if d == 0:
+        return _bb_eval(b)
+
+    k = (bitboard.canonical(b) if _symmetry else b) << 1
+    v = cache.get(k, d)
+    if v is not None:
+        return v
+    if _stats is not None:
+        _time_moves(b)
+
+    best = float("-inf")
+    cuts = _cuts
+    for m in MOVE_ORDER:
+        nb, gained = _BB_MOVE_FUN[m](b)
+        if nb != b:
+            v = gained + _bb_exp_value(nb, d - 1, p)
+            if v > best:
+                best = v
+    if best == float("-inf"):
+        best = _bb_eval(b)
+
+    if _cuts == cuts:
+        cache.put(k, d, best)
     return best
+
+def _bb_frontier(b: int, shifts: List[int]) -> float:
+    """CHANCE-solmu syvyydellä 2: lehdet arvioidaan yhtenä eränä.
+
+    Vastaa _bb_exp_value(b, 2):n silmukkaa: MAX-lapset (syvyys 1) luetaan
+    ja tallennetaan transpositiotauluun kuten _bb_max_value (sama arvo,
+    samat osumat, hudit ja tallennukset myös lapsille, joilla ei ole
+    siirtoja), ja niiden siirtojen tulokset ovat syvyyden 0 lehtiä. Lehdet,
+    joita ei ole eval-välimuistissa, arvioidaan ensin kaikki kerralla, joten
+    laajennettujen lasten tallennus tehdään vasta erän jälkeen. Toistuva
+    lapsi luetaan silloin taulusta, kuten skalaarihaku sen lukisi.
+    """
+    global _nodes
+    n0 = _nodes
+    children = []   # (avain, arvo tai None, [(gained, eval-avain)] tai None = toisto)
+    seen = set()
+    missing = {}
+    for sh in shifts:
+        for tile in (1, 2):
+            cb = b | (tile << sh)
+            _nodes += 1
+            if _nodes >= _check_at:
+                _check_budget("max", 1)
+            k = (bitboard.canonical(cb) if _symmetry else cb) << 1
+            if k in seen:
+                children.append((k, None, None))
+                continue
+            seen.add(k)
+            v = cache.get(k, 1)
+            moves = []
+            if v is None:
+                if _stats is not None:
+                    _time_moves(cb)
+                for m in MOVE_ORDER:
+                    nb, gained = _BB_MOVE_FUN[m](cb)
+                    if nb != cb:
+                        _nodes += 1
+                        ek = bitboard.canonical(nb) if _symmetry else nb
+                        moves.append((gained, ek))
+                        if ek not in _eval_cache:
+                            missing[ek] = nb
+                if not moves:
+                    v = _bb_eval(cb)
+                    cache.put(k, 1, v)
+            children.append((k, v, moves))
+    if _nodes >= _check_at:
+        _check_budget()
+    if _stats is not None:
+        _stats.nodes["chance"][0] += _nodes - n0 - 2 * len(shifts)  # lehdet
+
+    if missing:
+        t0 = time.perf_counter()
+        for ek, v in zip(missing, evaluate_bitboard_batch(list(missing.values())).tolist()):
+            _eval_cache[ek] = v
+        if _stats is not None:
+            _stats.eval_time += time.perf_counter() - t0
+            _stats.eval_misses += len(missing)
+
+    p2, p4 = 1.0 - PROB_FOUR, PROB_FOUR
+    total = 0.0
+    values = {}
+    for i, (k, v, moves) in enumerate(children):
+        if moves is None:
+            v = cache.get(k, 1)
+            if v is None:  # jaettu taulu voi korvata merkinnän välissä
+                v = values[k]
+        elif v is None:
+            v = float("-inf")
+            for gained, ek in moves:
+                lv = gained + _eval_cache[ek]
+                if lv > v:
+                    v = lv
+            cache.put(k, 1, v)
+        values[k] = v
+        total += (p2 if i % 2 == 0 else p4) * v
+    return total / len(shifts)
@@ -0,0 +1,353 @@
+"""Pelitallenteet: tiivis binäärimuoto, virtaava kirjoittaja ja lukija.
+
+Tallenne sisältää jokaisesta pelistä siemenen, alkulaatat ja jokaisesta
+vuorosta yhden pakatun tietueen: siirto sekä syntyneen laatan solu ja arvo.
+Lauta ja pisteet saadaan toistamalla siirrot (grid_ops tai 4x4:llä
+bittilauta), joten niitä ei tallenneta.
+
+Tiedostomuoto (little-endian, versio 1):
+
+    otsake  9 tavua: taika b"2048GREC", versio u8
+    peli    otsake 10 tavua: siemen i64, koko N u8, alkulaattojen määrä u8
+            alkulaatat, vuorot ja lopetin, kukin w tavua
+
+Tietueen leveys w on 1 tavu, kun N <= 4, ja 2 tavua, kun N <= 8. Tietue on
+solu | (laatta on 4) << b | siirto << (b + 1), missä solu = r * N + c, b on
+4 (w = 1) tai 6 (w = 2) ja siirto on indeksi MOVE_ORDER-tupleen. Alkulaatoilla
+siirto on 0. Lopetin on w tavua 0xFF; tietueessa ylin bitti on aina 0.
+
+4x4-peli vie siis 1 tavun vuorolta ja 12 tavua otsakkeineen: miljoona
+300 siirron peliä on noin 300 MB.
+
+Kirjoittaja lisää tietueen heti jokaisen vuoron jälkeen (puskuroitu
+tiedosto, flush pelin lopussa), joten pelejä ei pidetä muistissa. Jos
+tiedoston lopussa on keskeytynyt peli, se katkaistaan ennen jatkamista.
+Lukija avaa tiedoston mmapilla ja etsii pelien rajat lopettimista (C-tason
+find), joten pelien läpikäynti on I/O:n rajoittama; laudat toistetaan vasta
+pyydettäessä (GameRecord.states / boards).
+
+Käyttö:
+    python -m src.autoplay --record pelit.rec
+    python -m src.tournament --games 1000 --record pelit.rec
+    python -m src.gamerecord info pelit.rec
+"""
+
+from __future__ import annotations
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from . import bitboard
+from .board import Direction, GameState, Grid
+from .grid_ops import MOVE_FUN
+
+MAGIC = b"2048GREC"
+VERSION = 1
+HEADER = struct.Struct("<8sB")
+GAME = struct.Struct("<qBB")
+MOVE_ORDER: Tuple[Direction, ...] = ("left", "up", "right", "down")
+MAX_SIZE = 8
+
+Tile = Tuple[int, int, int]  # (rivi, sarake, arvo)
+
+
+def _width(size: int) -> int:
+    """Tietueen leveys tavuina laudan koolle size."""
+    if not 2 <= size <= MAX_SIZE:
+        raise ValueError(f"tallenne tukee kokoja 2..{MAX_SIZE}, ei {size}")
+    return 1 if size * size <= 16 else 2
+
+
+def _cell_bits(width: int) -> int:
+    return 4 if width == 1 else 6
+
+
+def encode_turn(size: int, move: Optional[Direction], r: int, c: int, value: int) -> int:
+    """Pakkaa vuoron (tai alkulaatan, move=None) tietueeksi."""
+    if value not in (2, 4):
+        raise ValueError(f"syntyvä laatta on 2 tai 4, ei {value}")
+    b = _cell_bits(_width(size))
+    m = 0 if move is None else MOVE_ORDER.index(move)
+    return (r * size + c) | (value == 4) << b | m << (b + 1)
+
+
+_DECODE: dict = {}
+
+
+def _decode_table(size: int) -> List[Tuple[Direction, int, int, int]]:
+    """Tietue -> (siirto, rivi, sarake, arvo) kaikille tietueille (välimuistissa)."""
+    table = _DECODE.get(size)
+    if table is None:
+        b = _cell_bits(_width(size))
+        table = []
+        for code in range(4 << (b + 1)):
+            cell = code & ((1 << b) - 1)
+            r, c = divmod(cell, size)
+            value = 4 if code >> b & 1 else 2
+            table.append((MOVE_ORDER[code >> (b + 1)], r, c, value))
+        _DECODE[size] = table
+    return table
+
+
+def _codes(data, width: int):
+    """Tietueet kokonaislukuina (bytes-olio tai muistinäkymä)."""
+    if width == 1:
+        return data
+    codes = array("H", bytes(data))
+    if sys.byteorder == "big":  # pragma: no cover - muoto on little-endian
+        codes.byteswap()
+    return codes
+
+
+@dataclass(frozen=True)
+class GameRecord:
+    """Yksi luettu peli.
+
+    Attributes:
+        seed: Pelin siemen.
+        size: Laudan koko N.
+        initial: Alkulaatat (rivi, sarake, arvo).
+        turns: Vuorojen tietueet raakatavuina.
+        complete: Päättyikö peli lopettimeen (False = keskeytynyt tallenne).
+    """
+    seed: int
+    size: int
+    initial: Tuple[Tile, ...]
+    turns: bytes
+    complete: bool = True
+
+    def __len__(self) -> int:
+        return len(self.turns) // _width(self.size)
+
+    def moves(self) -> Iterator[Tuple[Direction, int, int, int]]:
+        """Vuorot muodossa (siirto, rivi, sarake, arvo)."""
+        table = _decode_table(self.size)
+        for code in _codes(self.turns, _width(self.size)):
+            yield table[code]
+
+    def states(self) -> Iterator[GameState]:
+        """Toistaa pelin grid_opsilla: alkutila ja tila jokaisen vuoron jälkeen."""
+        n = self.size
+        g = [[0] * n for _ in range(n)]
+        for r, c, v in self.initial:
+            g[r][c] = v
+        score = 0
+        yield GameState([row[:] for row in g], score)
+        table = _decode_table(n)
+        for code in _codes(self.turns, _width(n)):
+            m, r, c, v = table[code]
+            g, gained = MOVE_FUN[m](g)  # uusi ruudukko, joten tilaa ei kopioida
+            g[r][c] = v
+            score += gained
+            yield GameState(g, score)
+
+    def boards(self) -> Iterator[int]:
+        """Toistaa 4x4-pelin bittilaudoilla (nopein polku): alkulauta ja jokainen vuoro."""
+        if self.size != 4:
+            raise ValueError("bittilauta vaatii 4x4-pelin")
+        b = 0
+        for r, c, v in self.initial:
+            b |= v.bit_length() - 1 << (16 * r + 4 * c)
+        yield b
+        move_fun = bitboard.MOVE_FUN
+        for code in self.turns:
+            cell = code & 15
+            b = move_fun[MOVE_ORDER[code >> 5]](b)[0] | (2 if code & 16 else 1) << (4 * cell)
+            yield b
+
+    def final(self) -> GameState:
+        """Pelin viimeinen tila."""
+        for s in self.states():
+            pass
+        return s
+
+
+class GameRecordWriter:
+    """Lisää pelejä tallennetiedoston loppuun vuoro kerrallaan.
+
+    Käyttö:
+        with GameRecordWriter(path) as w:
+            w.begin_game(seed, s.grid)
+            ...
+            w.add_move(before, d, s.grid)   # tai add_turn(d, r, c, arvo)
+            ...
+            w.end_game()
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, "a+b")
+        self._f.seek(0)
+        head = self._f.read(HEADER.size)
+        if not head:
+            self._f.write(HEADER.pack(MAGIC, VERSION))
+        else:
+            _check_header(head, path)
+            end = _last_complete_end(path)
+            if end < os.path.getsize(path):
+                self._f.truncate(end)  # keskeytynyt peli pois
+        self._size: Optional[int] = None
+        self._width = 0
+        self._end = b""
+
+    def __enter__(self) -> "GameRecordWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def begin_game(self, seed: int, grid: Grid) -> None:
+        """Aloittaa pelin; grid on alkutila (vain laatat 2 ja 4)."""
+        if self._size is not None:
+            self.end_game()
+        n = len(grid)
+        w = _width(n)
+        tiles = [(r, c, v) for r in range(n) for c in range(n) if (v := grid[r][c])]
+        self._f.write(GAME.pack(seed, n, len(tiles)))
+        for r, c, v in tiles:
+            self._f.write(encode_turn(n, None, r, c, v).to_bytes(w, "little"))
+        self._size, self._width, self._end = n, w, b"\xff" * w
+
+    def add_turn(self, move: Direction, r: int, c: int, value: int) -> None:
+        """Lisää vuoron: siirto ja sen jälkeen soluun (r, c) syntynyt laatta."""
+        self._f.write(encode_turn(self._size, move, r, c, value).to_bytes(self._width, "little"))
+
+    def add_move(self, before: Grid, move: Direction, after: Grid) -> None:
+        """Lisää vuoron laudoista: before ennen siirtoa, after syntyneen laatan jälkeen."""
+        moved, _gained = MOVE_FUN[move](before)
+        for r, (row, new) in enumerate(zip(moved, after)):
+            if row != new:
+                c = next(c for c, (a, b) in enumerate(zip(row, new)) if a != b)
+                self.add_turn(move, r, c, new[c])
+                return
+        raise ValueError("siirron jälkeen ei syntynyt laattaa")
+
+    def end_game(self) -> None:
+        """Päättää pelin (lopetin) ja tyhjentää puskurin levylle."""
+        if self._size is None:
+            return
+        self._f.write(self._end)
+        self._f.flush()
+        self._size = None
+
+    def close(self) -> None:
+        """Päättää mahdollisen kesken olevan pelin ja sulkee tiedoston."""
+        self.end_game()
+        self._f.close()
+
+
+def _check_header(head: bytes, path: str) -> None:
+    if len(head) < HEADER.size:
+        raise ValueError(f"{path}: ei pelitallenne (liian lyhyt)")
+    magic, version = HEADER.unpack(head)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: ei pelitallenne")
+    if version != VERSION:
+        raise ValueError(f"{path}: tukematon tallenneversio {version}")
+
+
+def _scan(buf) -> Iterator[Tuple[int, int, int, int, int, bool]]:
+    """Pelien rajat: (otsakkeen alku, vuorojen alku, vuorojen loppu, seuraava, koko, valmis)."""
+    pos, size = HEADER.size, len(buf)
+    while pos + GAME.size <= size:
+        _seed, n, k = GAME.unpack_from(buf, pos)
+        w = _width(n)
+        start = pos + GAME.size + k * w
+        # 2-tavuisen tietueen ylempi tavu on <= 1, joten ff ff osuu aina tasattuun kohtaan.
+        i = buf.find(w * b"\xff", start)
+        if i == -1:
+            yield pos, start, start + (size - start) // w * w, size, n, False
+            return
+        yield pos, start, i, i + w, n, True
+        pos = i + w
+
+
+def _last_complete_end(path: str) -> int:
+    """Viimeisen valmiin pelin loppu (tai otsakkeen loppu)."""
+    end = HEADER.size
+    with GameRecordReader(path) as reader:
+        for _pos, _start, _stop, nxt, _n, complete in _scan(reader._mm or b""):
+            if complete:
+                end = nxt
+    return end
+
+
+class GameRecordReader:
+    """Lukee tallennetiedoston pelit mmapin päällä.
+
+    Iterointi tuottaa GameRecord-oliot järjestyksessä; keskeytynyt viimeinen
+    peli tuotetaan complete=False.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        with open(path, "rb") as f:
+            _check_header(f.read(HEADER.size), path)
+            if os.fstat(f.fileno()).st_size > HEADER.size:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> "GameRecordReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        mm = self._mm
+        if mm is None:
+            return
+        for pos, start, stop, _nxt, n, complete in _scan(mm):
+            seed, _n, k = GAME.unpack_from(mm, pos)
+            table = _decode_table(n)
+            w = _width(n)
+            initial = tuple(table[code][1:] for code in _codes(mm[pos + GAME.size:start], w))
+            yield GameRecord(seed, n, initial, mm[start:stop], complete)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def read_games(*paths: str) -> Iterator[GameRecord]:
+    """Kaikkien annettujen tiedostojen pelit peräkkäin."""
+    for path in paths:
+        with GameRecordReader(path) as reader:
+            yield from reader
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Pelitallenteiden tiedot.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    info = sub.add_parser("info", help="pelit, vuorot ja toistonopeus")
+    info.add_argument("paths", nargs="+")
+    info.add_argument("--replay", action="store_true", help="toista laudat ja laske pisteet")
+    args = ap.parse_args(argv)
+
+    games = turns = incomplete = 0
+    scores: List[int] = []
+    t0 = time.perf_counter()
+    for g in read_games(*args.paths):
+        games += 1
+        turns += len(g)
+        incomplete += not g.complete
+        if args.replay:
+            scores.append(g.final().score)
+    elapsed = time.perf_counter() - t0
+    size = sum(os.path.getsize(p) for p in args.paths)
+    print(f"{games} peliä ({incomplete} keskeytynyttä), {turns} vuoroa, {size / 1e6:.1f} MB"
+          f" ({size / turns if turns else 0.0:.2f} tavua/vuoro)")
+    print(f"luku {elapsed:.2f} s ({turns / elapsed if elapsed else 0.0:,.0f} vuoroa/s)")
+    if scores:
+        print(f"pisteet: ka {sum(scores) / len(scores):.0f}, max {max(scores)}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -7,11 +7,26 @@ vaan palauttavat uuden ruudukon ja saadut pisteet (gain).
 
 Näitä funktioita voidaan käyttää hakualgoritmissa nopeuttamaan 
 laskentaa, koska ne eivät tee ylimääräisiä kopioita tai 
-pelitilan päivityksiä.
+pelitilan päivityksiä. Ne toimivat minkä kokoisella NxN-laudalla tahansa.
+
+Monen laudan rinnakkaiseen askellukseen (rollouts, itsepeli, datan
+tuotanto) on NumPy-versiot MOVE_FUN_BATCH ja spawn_batch (vain 4x4). Ne käsittelevät
+(N,4,4)- tai (N,16)-taulukkoa laattojen eksponentteja (0 = tyhjä, 1 = 2,
+2 = 4, ...) ja käyttävät bitboard-moduulin 65536-alkioisia rivitaulukoita:
+jokainen rivi pakataan 16-bittiseksi indeksiksi ja siirretään yhdellä
+taulukkohaulla. NumPy on valinnainen riippuvuus.
 """
 
 from typing import List, Tuple
 
+from . import bitboard
+from .board import PROB_FOUR, line_table, slide_line
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy on valinnainen
+    np = None
+
 Grid = List[List[int]]
 
 
@@ -49,38 +64,38 @@ def _compress_line_left(line: List[int]) -> Tuple[List[int], int]:
 def _move_generic(g: Grid, reverse: bool = False, transpose: bool = False) -> Tuple[Grid, int]:
     """Yleinen siirto-operaatio: käännä/transpose lauta ja käytä samaa puristuslogiikkaa.
 
+    Rivit siirretään laudan koon mukaisesta siirtotaulukosta
+    (board.line_table), joten toistuva rivi maksaa yhden hakukerran.
+
     Args:
-        g: 2D-lista (pelilauta).
+        g: 2D-lista (pelilauta), mikä tahansa NxN.
         reverse: jos True, siirto tehdään oikealle tai alas.
         transpose: jos True, siirto tehdään ylös tai alas.
 
     Returns:
         (uusi_ruudukko, saadut_pisteet)
     """
-    n = len(g)
-    new_board = [[0] * n for _ in range(n)]
+    table = line_table(len(g))
     gained_total = 0
+    new_lines = []
 
     # Jos siirto on pysty-, vaihdetaan rivit ja sarakkeet (transpose)
-    source = list(zip(*g)) if transpose else g
-
-    for i, line in enumerate(source):
-        line = list(line)
+    for line in (zip(*g) if transpose else map(tuple, g)):
         if reverse:
-            line.reverse()
-        new_line, gained = _compress_line_left(line)
-        if reverse:
-            new_line.reverse()
+            line = line[::-1]
+        hit = table.get(line)
+        if hit is None:
+            hit = slide_line(line)
+        new_line, gained, _merges = hit
+        if new_line is None:
+            new_line = line
         gained_total += gained
+        new_lines.append(new_line[::-1] if reverse else new_line)
 
-        # Palautetaan joko suoraan tai transposoituna
-        for j, val in enumerate(new_line):
-            if transpose:
-                new_board[j][i] = val
-            else:
-                new_board[i][j] = val
-
-    return new_board, gained_total
+    # Palautetaan joko suoraan tai transposoituna
+    if transpose:
+        new_lines = zip(*new_lines)
+    return [list(r) for r in new_lines], gained_total
 
 
 # ---------- Siirrot ----------
@@ -118,3 +133,125 @@ MOVE_FUN = {
 Esimerkiksi:
     new_grid, gained = MOVE_FUN["left"](grid)
 """
+
+
+# ---------- Vektorisoidut siirrot (NumPy) ----------
+
+_BATCH_TABLES = None
+
+
+def _batch_tables():
+    """Rivitaulukot NumPy-muodossa (luodaan ensimmäisellä kutsulla)."""
+    global _BATCH_TABLES
+    if np is None:
+        raise ImportError("vektorisoidut siirrot vaativat NumPyn (pip install numpy)")
+    if _BATCH_TABLES is None:
+        _BATCH_TABLES = (
+            np.array(bitboard._ROW_LEFT, dtype=np.uint16),
+            np.array(bitboard._ROW_RIGHT, dtype=np.uint16),
+            np.array(bitboard._GAIN_LEFT, dtype=np.int64),
+            np.array(bitboard._GAIN_RIGHT, dtype=np.int64),
+        )
+    return _BATCH_TABLES
+
+
+def _move_batch(boards, reverse: bool, transpose: bool):
+    """Yleinen eräsiirto; ks. move_left_batch."""
+    row_left, row_right, gain_left, gain_right = _batch_tables()
+    a = np.asarray(boards, dtype=np.uint8)
+    e = a.reshape(-1, 4, 4)
+    if transpose:
+        e = e.transpose(0, 2, 1)
+    # Rivi -> 16-bittinen indeksi (solu c bitteihin 4c), kuten bittilaudalla.
+    idx = e.astype(np.uint16)
+    idx = idx[..., 0] | (idx[..., 1] << 4) | (idx[..., 2] << 8) | (idx[..., 3] << 12)
+    rows = (row_right if reverse else row_left)[idx]
+    gains = (gain_right if reverse else gain_left)[idx].sum(axis=1)
+    changed = (rows != idx).any(axis=1)
+    new = np.empty(e.shape, dtype=np.uint8)
+    for c in range(4):
+        new[..., c] = (rows >> (4 * c)) & 0xF
+    if transpose:
+        new = new.transpose(0, 2, 1)
+    return new.reshape(a.shape), gains, changed
+
+
+def move_left_batch(boards):
+    """Siirtää kaikkia lautoja vasemmalle.
+
+    Args:
+        boards: (N,4,4)- tai (N,16)-taulukko laattojen eksponentteja.
+
+    Returns:
+        (uudet laudat samassa muodossa, pisteet (N,), muuttuiko lauta (N,))
+    """
+    return _move_batch(boards, reverse=False, transpose=False)
+
+
+def move_right_batch(boards):
+    """Siirtää kaikkia lautoja oikealle (ks. move_left_batch)."""
+    return _move_batch(boards, reverse=True, transpose=False)
+
+
+def move_up_batch(boards):
+    """Siirtää kaikkia lautoja ylös (ks. move_left_batch)."""
+    return _move_batch(boards, reverse=False, transpose=True)
+
+
+def move_down_batch(boards):
+    """Siirtää kaikkia lautoja alas (ks. move_left_batch)."""
+    return _move_batch(boards, reverse=True, transpose=True)
+
+
+MOVE_FUN_BATCH = {
+    "left": move_left_batch,
+    "right": move_right_batch,
+    "up": move_up_batch,
+    "down": move_down_batch,
+}
+
+
+def spawn_batch(boards, rng, prob_four: float = PROB_FOUR):
+    """Lisää jokaiselle laudalle satunnaisen laatan tasaisesti tyhjään soluun.
+
+    Args:
+        boards: (N,4,4)- tai (N,16)-taulukko eksponentteja (ei muuteta).
+        rng: numpy.random.Generator tai siemen (int).
+        prob_four: Todennäköisyys, että uusi laatta on 4 (muuten 2).
+
+    Returns:
+        (uudet laudat, lisättiinkö laatta (N,)); täysille laudoille ei lisätä.
+    """
+    if np is None:
+        raise ImportError("vektorisoidut siirrot vaativat NumPyn (pip install numpy)")
+    rng = np.random.default_rng(rng)
+    a = np.asarray(boards, dtype=np.uint8)
+    flat = a.reshape(-1, 16).copy()
+    n = flat.shape[0]
+    empty = flat == 0
+    # Satunnainen avain jokaiselle tyhjälle solulle; suurin avain valitaan.
+    keys = np.where(empty, rng.random((n, 16)), -1.0)
+    cell = keys.argmax(axis=1)
+    spawned = empty.any(axis=1)
+    tile = np.where(rng.random(n) < prob_four, 2, 1).astype(np.uint8)
+    rows = np.nonzero(spawned)[0]
+    flat[rows, cell[rows]] = tile[rows]
+    return flat.reshape(a.shape), spawned
+
+
+def to_exponents(grids):
+    """(N,4,4)-laattataulukko -> eksponentit (uint8)."""
+    if np is None:
+        raise ImportError("vektorisoidut siirrot vaativat NumPyn (pip install numpy)")
+    g = np.asarray(grids)
+    e = np.zeros(g.shape, dtype=np.float64)
+    np.log2(g, out=e, where=g > 0)
+    return e.astype(np.uint8)
+
+
+def from_exponents(e):
+    """Eksponentit -> laattojen arvot (int64, 0 = tyhjä)."""
+    if np is None:
+        raise ImportError("vektorisoidut siirrot vaativat NumPyn (pip install numpy)")
+    e = np.asarray(e, dtype=np.int64)
+    return np.where(e > 0, np.left_shift(1, e), 0)
@@ -6,18 +6,32 @@ että automaattisessa pelissä.
 """
 
 from __future__ import annotations
+import sys
 from typing import Optional
 from .board import GameState, Direction
-from .expectiminimax import best_move_expecti
+
+_LAZY = {"best_move_expecti": ".expectiminimax", "best_move_montecarlo": ".montecarlo"}
+
+
+def __getattr__(name: str):
+    """Hakumoottorit tuodaan vasta ensimmäisellä tekoälysiirrolla (nopea käynnistys)."""
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    fn = getattr(import_module(_LAZY[name], __package__), name)
+    globals()[name] = fn
+    return fn
 
 
 def render(s: GameState) -> None:
     """Tulostaa pelilaudan nykyisen tilan."""
     print("\nPisteet:", s.score, "| Voitto:", s.won, "| Loppu:", s.over)
-    print("+----+----+----+----+")
+    w = max(4, len(str(max(max(r) for r in s.grid))))
+    border = "+" + "+".join("-" * w for _ in s.grid) + "+"
+    print(border)
     for r in s.grid:
-        print("|" + "|".join(f"{v:>4}" if v else "    " for v in r) + "|")
-        print("+----+----+----+----+")
+        print("|" + "|".join(f"{v:>{w}}" if v else " " * w for v in r) + "|")
+        print(border)
 
 
 def read_command() -> Optional[Direction | str]:
@@ -37,13 +51,20 @@ def read_command() -> Optional[Direction | str]:
     return {"w": "up", "a": "left", "s": "down", "d": "right"}.get(raw)
 
 
-def ai_step(s: GameState, depth: int) -> tuple[bool, Direction]:
+def ai_step(s: GameState, depth: int, engine: str = "expecti") -> tuple[bool, Direction]:
     """Suorittaa yhden tekoälyn siirron annetulla syvyydellä.
 
+    Args:
+        engine: "expecti" (syvyys depth) tai "mc" (Monte Carlo, oletusbudjetti).
+
     Returns:
         (onnistuiko siirto, suunta).
     """
-    d, _ = best_move_expecti(s, depth=depth)
+    this = sys.modules[__name__]  # moduulin __getattr__ tuo moottorin tarvittaessa
+    if engine == "mc":
+        d, _ = this.best_move_montecarlo(s)
+    else:
+        d, _ = this.best_move_expecti(s, depth=depth)
     return s.move(d), d
 
 
@@ -52,6 +73,31 @@ def print_ai_move(i: int, d: Direction) -> None:
     print(f"\nAI:n siirto {i}: {d}")
 
 
+def print_tt_stats(tt) -> None:
+    """Tulostaa transpositiotaulun osumat viimeisimmässä haussa."""
+    print(f"TT-osumat: {tt.hits}/{tt.hits + tt.misses} ({100 * tt.hit_rate():.1f} %),"
+          f" merkintöjä {len(tt)}")
+
+
+def print_search_stats(st) -> None:
+    """Tulostaa yhden haun tilastot (ks. searchstats.SearchStats)."""
+    if st.book_hit:
+        print("Haku: siirto avauskirjasta")
+        return
+    per_depth = " ".join(
+        f"{d}:{st.nodes['max'][d]}/{st.nodes['chance'][d]}"
+        for d in sorted(set(st.nodes["max"]) | set(st.nodes["chance"]), reverse=True))
+    tt = st.tt_hits + st.tt_misses
+    ev = st.eval_hits + st.eval_misses
+    print(f"Haku: syvyys {st.depth}, solmuja {st.total_nodes} ({st.nodes_per_sec:.0f}/s),"
+          f" max/chance syvyyksittäin {per_depth}")
+    print(f"  TT {st.tt_hits}/{tt} ({100 * st.tt_hits / tt if tt else 0.0:.1f} %), koko {st.tt_size}"
+          f" | eval {st.eval_hits}/{ev} ({100 * st.eval_hits / ev if ev else 0.0:.1f} %),"
+          f" koko {st.eval_cache_size} | ohennettu {st.thinned} (-{st.thinned_cells} solua)")
+    print(f"  aika {1000 * st.total_time:.1f} ms: siirrot {1000 * st.movegen_time:.1f} ms,"
+          f" heuristiikka {1000 * st.eval_time:.1f} ms")
+
+
 def print_final(s: GameState) -> None:
     """Tulostaa lopputuloksen (pisteet ja suurin laatta)."""
     print("\nLOPPU - Pisteet:", s.score, "Suurin laatta:",
@@ -2,33 +2,76 @@
 
 Heuristiikat:
 - Tyhjien ruutujen määrä (enemmän tyhjiä -> parempi).
-- "Käärme/monotonicity": pisteytä neljään suuntaan ja valitse paras
-  (automaattisesti suosii kulmaa, jossa isot laatat pysyvät).
+- "Käärme/monotonicity": pisteytä kahdeksaan suuntaan (rotaatiot ja
+  peilaukset) ja valitse paras (automaattisesti suosii kulmaa, jossa isot
+  laatat pysyvät). Näin koko arvio on symmetrinen laudan kierroille ja
+  peilauksille.
 - Tasaisuus: pienemmät log-arvoerot vierekkäin -> parempi (negatiivinen summa).
 - Yhdistymispotentiaali: saman arvoiset vierekkäin -> parempi.
 - Kulmabonus: jos maksimiarvo on kulmassa, pieni lisä.
 
 Painot on valittu niin, että tyhjät + monotonicity ohjaavat strategiaa,
 merge ja smoothness hienosäätävät, kulmabonus on kevyt tuki.
+
+evaluate toimii minkä kokoisella NxN-laudalla tahansa: käärmepainot
+luodaan koon mukaan (snake_weights) ja tallennetaan välimuistiin.
+
+Bittilaudalle (ks. bitboard.py) on taulukkopohjainen evaluate_bitboard:
+jokaisen komponentin osuus on laskettu valmiiksi jokaiselle 16-bittiselle
+rivi- ja sarakekuviolle, joten arvio maksaa kahdeksan taulukkohakua ja
+muutaman yhteenlaskun. Tulos on täsmälleen sama kuin evaluate-funktiolla.
+Taulukot luetaan levyvälimuistista (tablecache.py), kun se on saatavilla.
+
+Inkrementaalinen arvio: taulukko-osuuksien pakattu summa (eval_acc) on
+rivien ja sarakkeiden summa, joten lapsen summa saadaan vanhemman summasta
+päivittämällä vain muuttuneet rivit ja sarakkeet (eval_acc_move) tai
+syntyneen laatan rivi ja sarake (eval_acc_spawn). evaluate_acc viimeistelee
+summasta arvon; evaluate_bitboard on eval_acc + evaluate_acc.
+
+Painot: moduulin oletuspainot (_W_*, get_weights/set_weights) tai
+arviokohtainen painovektori w (järjestys _WEIGHT_NAMES), jonka evaluate,
+evaluate_acc, evaluate_bitboard ja eräarviot ottavat valinnaisena
+argumenttina. Heuristic sitoo painot olioon, joka kelpaa
+expectiminimax.set_evaluatorille; näin eri painoilla voi hakea samassa
+prosessissa muuttamatta moduulin oletuksia (ks. tournament.py).
+
+Monelle laudalle kerralla on NumPy-versio evaluate_batch ((N,4,4)-taulukko
+laattoja) ja evaluate_bitboard_batch (lista bittilautoja). Tulos vastaa
+evaluate-funktiota liukulukutarkkuuden rajoissa. NumPy on valinnainen:
+muu moduuli toimii ilman sitä.
 """
 
 from __future__ import annotations
-from typing import List, Iterable, Tuple
+from functools import lru_cache
+from itertools import product
+from typing import List, Iterable, Optional, Tuple
 import math
+from .bitboard import transpose
+from .tablecache import cached
 
-Grid = List[List[int]]
-N = 4  # ruudukon koko
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy on valinnainen
+    np = None
 
-# Perus "käärme" -painotus (max-kulma = vasen ylä). Muut suunnat saadaan rotaatioilla.
-_BASE_SNAKE: List[List[int]] = [
-    [15, 14, 13, 12],
-    [8,   9, 10, 11],
-    [7,   6,  5,  4],
-    [0,   1,  2,  3],
-]
+Grid = List[List[int]]
+Weights = Tuple[float, float, float, float, float]  # (empty, snake, smooth, merge, corner)
+N = 4  # bittilaudan ja taulukoiden ruudukon koko
 
 # ---------- apurit ----------
 
+def _base_snake(n: int) -> List[List[int]]:
+    """Perus "käärme" -painotus NxN-laudalle (max-kulma = vasen ylä).
+
+    Painot kulkevat siksakkia alarivin vasemmasta kulmasta (0) ylöspäin;
+    4x4:llä rivit ovat [15,14,13,12], [8,9,10,11], [7,6,5,4], [0,1,2,3].
+    """
+    rows = []
+    for r in range(n):
+        k = n - 1 - r
+        rows.append([k * n + (c if k % 2 == 0 else n - 1 - c) for c in range(n)])
+    return rows
+
 def log_value(v: int) -> float:
     """Palauttaa log2(v) jos v > 0, muuten 0.0."""
     return math.log2(v) if v > 0 else 0.0
@@ -37,25 +80,41 @@ def _rotate(w: List[List[int]]) -> List[List[int]]:
     """90° kierto myötäpäivään."""
     return [list(col) for col in zip(*w[::-1])]
 
-# Luodaan kaikki neljä käärmevarianttia kerran.
-_SNAKES: Tuple[List[List[int]], ...] = (
-    _BASE_SNAKE,
-    _rotate(_BASE_SNAKE),
-    _rotate(_rotate(_BASE_SNAKE)),
-    _rotate(_rotate(_rotate(_BASE_SNAKE))),
-)
+def _mirror(w: List[List[int]]) -> List[List[int]]:
+    """Peilaus vasen-oikea."""
+    return [row[::-1] for row in w]
+
+def _rotations(w: List[List[int]]) -> List[List[List[int]]]:
+    out = [w]
+    for _ in range(3):
+        out.append(_rotate(out[-1]))
+    return out
+
+@lru_cache(maxsize=None)
+def snake_weights(n: int) -> Tuple[List[List[int]], ...]:
+    """Kaikki kahdeksan käärmevarianttia NxN-laudalle (diedriryhmä).
+
+    Muut suunnat saadaan perusmuodon rotaatioilla ja peilauksilla; tulos
+    luodaan kerran kokoa kohden.
+    """
+    base = _base_snake(n)
+    return (*_rotations(base), *_rotations(_mirror(base)))
+
+_BASE_SNAKE = _base_snake(N)
+_SNAKES = snake_weights(N)
 
 def count_empties(g: Grid) -> int:
     """Laskee tyhjien ruutujen määrän laudalla."""
     return sum(v == 0 for row in g for v in row)
 
 def snake_score(g: Grid) -> float:
-    """Pisteytä neljään suuntaan ja palauta maksimi."""
+    """Pisteytä kahdeksaan suuntaan ja palauta maksimi."""
     best = float("-inf")
-    for W in _SNAKES:
+    n = len(g)
+    for W in snake_weights(n):
         s = 0.0
-        for r in range(N):
-            for c in range(N):
+        for r in range(n):
+            for c in range(n):
                 v = g[r][c]
                 if v:
                     s += log_value(v) * W[r][c]
@@ -65,13 +124,14 @@ def snake_score(g: Grid) -> float:
 
 def _adjacent_pairs(g: Grid) -> Iterable[Tuple[int, int]]:
     """Tuottaa vierekkäiset laatat (vain kun molemmat != 0), vaaka ja pysty."""
-    for r in range(N):
-        for c in range(N - 1):
+    n = len(g)
+    for r in range(n):
+        for c in range(n - 1):
             a, b = g[r][c], g[r][c + 1]
             if a and b:
                 yield a, b
-    for c in range(N):
-        for r in range(N - 1):
+    for c in range(n):
+        for r in range(n - 1):
             a, b = g[r][c], g[r + 1][c]
             if a and b:
                 yield a, b
@@ -91,7 +151,7 @@ def merge_potential(g: Grid) -> float:
 def corner_bonus(g: Grid) -> float:
     """Pieni bonus, jos maksimi on kulmassa (log-painotettuna)."""
     m = max(max(row) for row in g)
-    corners = (g[0][0], g[0][N-1], g[N-1][0], g[N-1][N-1])
+    corners = (g[0][0], g[0][-1], g[-1][0], g[-1][-1])
     return log_value(m) if (m > 0 and m in corners) else 0.0
 
 # ---------- pääarvio ----------
@@ -103,12 +163,288 @@ _W_SMOOTH  = 0.4
 _W_MERGE   = 2.5
 _W_CORNER  = 0.8
 
-def evaluate(g: Grid) -> float:
-    """Yhdistetty arvio laudan laadusta."""
+_WEIGHT_NAMES = ("empty", "snake", "smooth", "merge", "corner")
+
+def get_weights() -> dict:
+    """Palauttaa nykyiset painokertoimet nimillä (empty, snake, ...)."""
+    return {name: globals()["_W_" + name.upper()] for name in _WEIGHT_NAMES}
+
+def set_weights(weights: dict) -> None:
+    """Asettaa painokertoimet nimillä; tuntematon nimi -> ValueError.
+
+    Huom: välimuistit (esim. expectiminimaxin) on tyhjennettävä erikseen.
+    """
+    for name, value in weights.items():
+        if name not in _WEIGHT_NAMES:
+            raise ValueError(f"tuntematon paino: {name}")
+        globals()["_W_" + name.upper()] = float(value)
+
+def weight_vector(weights: Optional[dict] = None) -> Weights:
+    """Painovektori nimetyistä painoista (puuttuvat oletuksista); tuntematon nimi -> ValueError."""
+    w = get_weights()
+    for name, value in (weights or {}).items():
+        if name not in _WEIGHT_NAMES:
+            raise ValueError(f"tuntematon paino: {name}")
+        w[name] = float(value)
+    return tuple(w[name] for name in _WEIGHT_NAMES)
+
+def evaluate(g: Grid, w: Optional[Weights] = None) -> float:
+    """Yhdistetty arvio laudan laadusta (w = painovektori, None = oletuspainot)."""
+    if w is None:
+        w = (_W_EMPTY, _W_SNAKE, _W_SMOOTH, _W_MERGE, _W_CORNER)
+    return (
+        w[0] * count_empties(g) +
+        w[1] * snake_score(g)   +
+        w[2] * smoothness(g)    +
+        w[3] * merge_potential(g) +
+        w[4] * corner_bonus(g)
+    )
+
+
+# ---------- taulukkopohjainen arvio bittilaudalle ----------
+#
+# Kaikki komponentit ovat kokonaislukuja (log2-arvot ovat eksponentteja),
+# joten ne voidaan pakata yhteen kokonaislukuun 16-bittisiksi kentiksi ja
+# laskea yhteen riveittäin: kenttä ei koskaan ylivuoda (snake <= 120*15).
+# Rivitaulukot sisältävät tyhjät, vaakasuuntaisen smoothness/merge-osuuden
+# sekä jokaisen käärmeen painotetun summan kyseiselle riville; saraketaulukko
+# sisältää pystysuuntaisen smoothness/merge-osuuden.
+
+_FIELD_BITS = 16
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+_F_EMPTY, _F_SMOOTH, _F_MERGE = 0, 16, 32
+_SNAKE_SHIFTS = tuple(48 + _FIELD_BITS * k for k in range(len(_SNAKES)))
+
+
+def _line_pairs_table() -> List[int]:
+    """Tyhjät sekä vierekkäisten parien smoothness- ja merge-osuus riville."""
+    out = []
+    for e3, e2, e1, e0 in product(range(16), repeat=4):
+        cells = (e0, e1, e2, e3)
+        smooth = merge = 0
+        for a, b in zip(cells, cells[1:]):
+            if a and b:
+                smooth += abs(a - b)
+                if a == b:
+                    merge += a
+        out.append((cells.count(0) << _F_EMPTY) | (smooth << _F_SMOOTH) | (merge << _F_MERGE))
+    return out
+
+
+def _cell_sum_table(weights: List[int]) -> List[int]:
+    """Taulukko x -> sum(weights[c] * e_c) rivin eksponenteille e_c."""
+    tbl = [0]
+    for w in weights:
+        tbl = [t + w * e for e in range(16) for t in tbl]
+    return tbl
+
+
+def _build_eval_tables() -> Tuple[List[List[int]], List[int], List[int]]:
+    pairs = _line_pairs_table()
+    rows = []
+    for r in range(N):
+        # Pakattu paino: käärmeen k paino omassa kentässään.
+        packed = [sum(W[r][c] << sh for W, sh in zip(_SNAKES, _SNAKE_SHIFTS)) for c in range(N)]
+        snake = _cell_sum_table(packed)
+        rows.append([p + s for p, s in zip(pairs, snake)])
+    # Sarakkeissa tyhjiä ei lasketa uudelleen (ne on jo riveissä).
+    cols = [p & ~_FIELD_MASK for p in pairs]
+    row_max = [max(x & 0xF, (x >> 4) & 0xF, (x >> 8) & 0xF, x >> 12) for x in range(1 << 16)]
+    return rows, cols, row_max
+
+
+def _load_eval_tables() -> Tuple[List[List[int]], List[int], List[int]]:
+    """Arviotaulukot levyvälimuistista (ks. tablecache.py) tai rakennettuna."""
+    def build() -> dict:
+        rows, cols, row_max = _build_eval_tables()
+        return {**{f"row{r}": rows[r] for r in range(N)}, "col": cols, "row_max": row_max}
+
+    tables = cached("heuristics", build, _line_pairs_table, _cell_sum_table, _build_eval_tables,
+                    N, _SNAKES, _SNAKE_SHIFTS, (_F_EMPTY, _F_SMOOTH, _F_MERGE, _FIELD_BITS))
+    return [tables[f"row{r}"] for r in range(N)], tables["col"], tables["row_max"]
+
+
+_EVAL_ROWS, _EVAL_COL, _ROW_MAX = _load_eval_tables()
+_EVAL_ROW0, _EVAL_ROW1, _EVAL_ROW2, _EVAL_ROW3 = _EVAL_ROWS
+
+
+def eval_acc(b: int) -> int:
+    """Laudan b pakattu summa: rivien ja sarakkeiden taulukko-osuudet yhteensä."""
+    t = transpose(b)
+    return (_EVAL_ROW0[b & 0xFFFF] + _EVAL_ROW1[(b >> 16) & 0xFFFF] +
+            _EVAL_ROW2[(b >> 32) & 0xFFFF] + _EVAL_ROW3[b >> 48] +
+            _EVAL_COL[t & 0xFFFF] + _EVAL_COL[(t >> 16) & 0xFFFF] +
+            _EVAL_COL[(t >> 32) & 0xFFFF] + _EVAL_COL[t >> 48])
+
+
+def _column(b: int, c: int) -> int:
+    """Sarake c 16-bittisenä kuviona (rivi r nibblessä r), kuten transpose."""
+    v = (b >> (4 * c)) & 0x000F000F000F000F
+    return (v & 0xF) | ((v >> 12) & 0xF0) | ((v >> 24) & 0xF00) | ((v >> 36) & 0xF000)
+
+
+def eval_acc_spawn(acc: int, b: int, shift: int, e: int) -> int:
+    """Pakattu summa laudalle b | (e << shift), kun acc on laudan b summa.
+
+    Syntyvä laatta muuttaa vain yhden rivin ja yhden sarakkeen osuuden.
+    """
+    r, s = shift >> 4, shift & 15
+    row = (b >> (shift - s)) & 0xFFFF
+    col = _column(b, s >> 2)
+    table = _EVAL_ROWS[r]
+    return (acc - table[row] + table[row | (e << s)]
+            - _EVAL_COL[col] + _EVAL_COL[col | (e << (4 * r))])
+
+
+def eval_acc_move(acc: int, b: int, nb: int) -> int:
+    """Pakattu summa siirron jälkeiselle laudalle nb, kun acc on laudan b summa.
+
+    Vain muuttuneiden rivien ja sarakkeiden osuudet päivitetään.
+    """
+    diff = b ^ nb
+    if diff & 0xFFFF:
+        acc += _EVAL_ROW0[nb & 0xFFFF] - _EVAL_ROW0[b & 0xFFFF]
+    if diff & 0xFFFF0000:
+        acc += _EVAL_ROW1[(nb >> 16) & 0xFFFF] - _EVAL_ROW1[(b >> 16) & 0xFFFF]
+    if diff & 0xFFFF00000000:
+        acc += _EVAL_ROW2[(nb >> 32) & 0xFFFF] - _EVAL_ROW2[(b >> 32) & 0xFFFF]
+    if diff >> 48:
+        acc += _EVAL_ROW3[nb >> 48] - _EVAL_ROW3[b >> 48]
+    t, nt = transpose(b), transpose(nb)
+    diff = t ^ nt
+    if diff & 0xFFFF:
+        acc += _EVAL_COL[nt & 0xFFFF] - _EVAL_COL[t & 0xFFFF]
+    if diff & 0xFFFF0000:
+        acc += _EVAL_COL[(nt >> 16) & 0xFFFF] - _EVAL_COL[(t >> 16) & 0xFFFF]
+    if diff & 0xFFFF00000000:
+        acc += _EVAL_COL[(nt >> 32) & 0xFFFF] - _EVAL_COL[(t >> 32) & 0xFFFF]
+    if diff >> 48:
+        acc += _EVAL_COL[nt >> 48] - _EVAL_COL[t >> 48]
+    return acc
+
+
+def evaluate_acc(acc: int, b: int, w: Optional[Weights] = None) -> float:
+    """Arvio laudalle b sen pakatusta summasta (eval_acc tai inkrementaalinen).
+
+    Tulos on täsmälleen sama kuin evaluate_bitboard(b): lopputyö on yhteinen.
+    """
+    snake = (acc >> 48) & _FIELD_MASK
+    for sh in _SNAKE_SHIFTS[1:]:
+        v = (acc >> sh) & _FIELD_MASK
+        if v > snake:
+            snake = v
+    r0, r3 = b & 0xFFFF, b >> 48
+    m = max(_ROW_MAX[r0], _ROW_MAX[(b >> 16) & 0xFFFF], _ROW_MAX[(b >> 32) & 0xFFFF], _ROW_MAX[r3])
+    corner = m if m and m in (r0 & 0xF, r0 >> 12, r3 & 0xF, r3 >> 12) else 0
+    if w is None:
+        w = (_W_EMPTY, _W_SNAKE, _W_SMOOTH, _W_MERGE, _W_CORNER)
+    return (
+        w[0] * ((acc >> _F_EMPTY) & _FIELD_MASK) +
+        w[1] * snake +
+        w[2] * -((acc >> _F_SMOOTH) & _FIELD_MASK) +
+        w[3] * ((acc >> _F_MERGE) & _FIELD_MASK) +
+        w[4] * corner
+    )
+
+
+def evaluate_bitboard(b: int, w: Optional[Weights] = None) -> float:
+    """Sama arvio kuin evaluate, mutta bittilaudalle taulukoista luettuna."""
+    return evaluate_acc(eval_acc(b), b, w)
+
+
+# ---------- NumPy-eräarvio ----------
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("eräarvio vaatii NumPyn (pip install numpy)")
+
+
+_BATCH_SNAKES: dict = {}  # koko n -> (8, n*n) käärmepainot, luodaan ensimmäisellä kutsulla
+
+
+def _evaluate_exponents(e, w: Optional[Weights] = None) -> "np.ndarray":
+    """Arvio (M,n,n)-eksponenttitaulukolle (0 = tyhjä)."""
+    e = np.asarray(e, dtype=np.float64)
+    n, size = e.shape[0], e.shape[1]
+    snakes = _BATCH_SNAKES.get(size)
+    if snakes is None:
+        W = snake_weights(size)
+        snakes = _BATCH_SNAKES[size] = np.array(W, dtype=np.float64).reshape(len(W), size * size)
+    empties = (e == 0).sum(axis=(1, 2))
+    snake = (e.reshape(n, size * size) @ snakes.T).max(axis=1)
+
+    smooth = np.zeros(n)
+    merge = np.zeros(n)
+    for a, b in ((e[:, :, :-1], e[:, :, 1:]), (e[:, :-1, :], e[:, 1:, :])):
+        both = (a > 0) & (b > 0)
+        smooth += (np.abs(a - b) * both).sum(axis=(1, 2))
+        merge += (a * (both & (a == b))).sum(axis=(1, 2))
+
+    m = e.max(axis=(1, 2))
+    corners = e[:, [0, 0, -1, -1], [0, -1, 0, -1]]
+    corner = np.where((m > 0) & (corners == m[:, None]).any(axis=1), m, 0.0)
+    if w is None:
+        w = (_W_EMPTY, _W_SNAKE, _W_SMOOTH, _W_MERGE, _W_CORNER)
     return (
-        _W_EMPTY  * count_empties(g) +
-        _W_SNAKE  * snake_score(g)   +
-        _W_SMOOTH * smoothness(g)    +
-        _W_MERGE  * merge_potential(g) +
-        _W_CORNER * corner_bonus(g)
+        w[0] * empties +
+        w[1] * snake +
+        w[2] * -smooth +
+        w[3] * merge +
+        w[4] * corner
     )
+
+
+def evaluate_batch(grids, w: Optional[Weights] = None) -> "np.ndarray":
+    """Sama arvio kuin evaluate, mutta (M,n,n)-taulukolle laattoja kerralla.
+
+    Returns:
+        (N,)-taulukko arvioita.
+    """
+    _require_numpy()
+    g = np.asarray(grids)
+    e = np.zeros(g.shape, dtype=np.float64)
+    np.log2(g, out=e, where=g > 0)
+    return _evaluate_exponents(e, w)
+
+
+_BB_SHIFTS = None  # solujen bittisiirrot rivijärjestyksessä
+
+
+def evaluate_bitboard_batch(boards: List[int], w: Optional[Weights] = None) -> "np.ndarray":
+    """Arvio listalle bittilautoja (ks. bitboard.py) yhdellä vektorisoidulla ajolla."""
+    global _BB_SHIFTS
+    _require_numpy()
+    if _BB_SHIFTS is None:
+        _BB_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+    b = np.array(boards, dtype=np.uint64)
+    e = (b[:, None] >> _BB_SHIFTS) & np.uint64(0xF)
+    return _evaluate_exponents(e.reshape(len(boards), N, N), w)
+
+
+# ---------- kiinnitetyt painot ----------
+
+class Heuristic:
+    """Heuristiikka omilla painoillaan (ks. expectiminimax.set_evaluator).
+
+    Tarjoaa samat arviot kuin moduuli, mutta painovektorilla
+    weight_vector(weights); moduulin oletuspainoja ei muuteta.
+    """
+
+    def __init__(self, weights: Optional[dict] = None) -> None:
+        self.w = weight_vector(weights)
+
+    @property
+    def weights(self) -> dict:
+        return dict(zip(_WEIGHT_NAMES, self.w))
+
+    def evaluate(self, g: Grid) -> float:
+        return evaluate(g, self.w)
+
+    def evaluate_acc(self, acc: int, b: int) -> float:
+        return evaluate_acc(acc, b, self.w)
+
+    def evaluate_bitboard(self, b: int) -> float:
+        return evaluate_acc(eval_acc(b), b, self.w)
+
+    def evaluate_bitboard_batch(self, boards: List[int]) -> "np.ndarray":
+        return evaluate_bitboard_batch(boards, self.w)
@@ -0,0 +1,155 @@
+"""Monte Carlo -moottori: siirto satunnaispelien (rollout) keskiarvolla.
+
+Expectiminimaxin vaihtoehto, jonka hinta ei kasva eksponentiaalisesti
+syvyyden mukana. Jokaiselle juuren lailliselle siirrolle pelataan joukko
+satunnaispelejä:
+
+1. tehdään juuren siirto ja lisätään laatta (board.PROB_FOUR),
+2. pelataan satunnaisia laillisia siirtoja (grid_ops.MOVE_FUN) enintään
+   rollout_depth siirtoa tai kunnes peli päättyy,
+3. arvo = kertyneet pisteet + heuristiikka loppuasemasta (0, jos peli
+   päättyi).
+
+Paras siirto on suurimman keskiarvon siirto. Budjetti annetaan
+satunnaispelien määränä siirtoa kohden (rollouts) tai aikana (time_ms).
+
+Satunnaispelit ovat toisistaan riippumattomia, joten ne jaetaan
+työprosesseille (parallel.get_pool) suoraan: jokainen prosessi pelaa oman
+osuutensa omalla siemenellään, ja vanhempi laskee summat yhteen. Samalla
+siemenellä ja prosessimäärällä tulos on toistettava (aikabudjetilla
+satunnaispelien määrä riippuu koneen nopeudesta).
+
+Käyttö:
+    d, value = best_move_montecarlo(s, rollouts=200, workers=4, seed=1)
+"""
+
+from __future__ import annotations
+import random
+import time
+from typing import List, Optional, Tuple
+
+from .board import Direction, GameState, PROB_FOUR
+from .grid_ops import MOVE_FUN
+from .heuristics import evaluate
+from .parallel import get_pool
+
+Grid = List[List[int]]
+
+MOVE_ORDER = ("left", "up", "right", "down")
+DEFAULT_ROLLOUTS = 100
+DEFAULT_ROLLOUT_DEPTH = 20
+
+
+def _spawn(g: Grid, rng: random.Random) -> None:
+    """Lisää laatan satunnaiseen tyhjään soluun (paikallaan)."""
+    n = len(g)
+    cells = [(r, c) for r in range(n) for c in range(n) if not g[r][c]]
+    if cells:
+        r, c = cells[int(rng.random() * len(cells))]
+        g[r][c] = 4 if rng.random() < PROB_FOUR else 2
+
+
+def rollout(g: Grid, rng: random.Random, depth: int = DEFAULT_ROLLOUT_DEPTH) -> float:
+    """Pelaa satunnaisia siirtoja laudasta g ja palauttaa arvon.
+
+    Args:
+        g: Lähtölauta (lisätty laatta mukana); sitä ei muuteta.
+        rng: Satunnaislukugeneraattori.
+        depth: Suurin siirtojen määrä.
+
+    Returns:
+        Kertyneet pisteet + evaluate(loppulauta), tai pelkät pisteet,
+        jos peli päättyi.
+    """
+    total = 0
+    funs = [MOVE_FUN[m] for m in MOVE_ORDER]
+    for _ in range(depth):
+        order = rng.sample(funs, 4)
+        for f in order:
+            ng, gained = f(g)
+            if ng != g:
+                break
+        else:
+            return float(total)  # ei laillisia siirtoja: peli ohi
+        g = ng
+        total += gained
+        _spawn(g, rng)
+    return total + evaluate(g)
+
+
+def _simulate(grid: Grid, moves: List[Direction], rollouts: Optional[int],
+              deadline: Optional[float], seed: int, depth: int) -> List[Tuple[float, int]]:
+    """Pelaa satunnaispelejä juuren siirroille vuorotellen.
+
+    Lopettaa, kun jokaiselle siirrolle on pelattu rollouts peliä tai kun
+    deadline (time.time()) on ohitettu; vähintään yksi kierros pelataan aina.
+    Käytetään sekä samassa prosessissa että työprosesseissa.
+
+    Returns:
+        Jokaiselle siirrolle (arvojen summa, pelien määrä).
+    """
+    rng = random.Random(seed)
+    children = []
+    for m in moves:
+        ng, gained = MOVE_FUN[m](grid)
+        children.append((ng, gained))
+    sums = [0.0] * len(moves)
+    done = 0
+    while rollouts is None or done < rollouts:
+        for i, (ng, gained) in enumerate(children):
+            g = [r[:] for r in ng]
+            _spawn(g, rng)
+            sums[i] += gained + rollout(g, rng, depth)
+        done += 1
+        if deadline is not None and time.time() >= deadline:
+            break
+    return [(total, done) for total in sums]
+
+
+def best_move_montecarlo(s: GameState, rollouts: Optional[int] = None,
+                         time_ms: Optional[float] = None, workers: Optional[int] = None,
+                         seed: Optional[int] = None,
+                         rollout_depth: int = DEFAULT_ROLLOUT_DEPTH) -> Tuple[Direction, float]:
+    """Valitsee siirron satunnaispelien keskiarvolla.
+
+    Args:
+        s: Pelitila.
+        rollouts: Satunnaispelejä juuren siirtoa kohden (oletus 100, jos
+            myöskään time_ms ei ole annettu).
+        time_ms: Aikabudjetti millisekunteina (rollouts toimii silloin ylärajana).
+        workers: Työprosessien määrä (None tai 1 = tässä prosessissa).
+        seed: Siemen (None = satunnainen).
+        rollout_depth: Satunnaispelin enimmäispituus siirtoina.
+
+    Returns:
+        (suunta, odotusarvo pisteinä).
+    """
+    moves = [m for m in MOVE_ORDER if MOVE_FUN[m](s.grid)[0] != s.grid]
+    if not moves:
+        return "left", float(s.score)
+    if rollouts is None and time_ms is None:
+        rollouts = DEFAULT_ROLLOUTS
+    deadline = None if time_ms is None else time.time() + time_ms / 1000.0
+    if seed is None:
+        seed = random.randrange(1 << 30)
+
+    if not workers or workers <= 1:
+        results = [_simulate(s.grid, moves, rollouts, deadline, seed, rollout_depth)]
+    else:
+        pool = get_pool(workers)
+        # Jaetaan satunnaispelit tasan; jokaisella prosessilla oma siemen.
+        shares = [None] * workers if rollouts is None else \
+            [rollouts // workers + (i < rollouts % workers) for i in range(workers)]
+        futures = [pool.submit(_simulate, s.grid, moves, n, deadline, seed * workers + i,
+                               rollout_depth)
+                   for i, n in enumerate(shares) if n is None or n > 0]
+        results = [f.result() for f in futures]
+
+    best_dir, best_val = moves[0], float("-inf")
+    for i, m in enumerate(moves):
+        total = sum(r[i][0] for r in results)
+        count = sum(r[i][1] for r in results)
+        val = total / count
+        if val > best_val:
+            best_val, best_dir = val, m
+    return best_dir, float(s.score) + best_val
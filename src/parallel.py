@@ -0,0 +1,256 @@
+"""Rinnakkainen juurihaku pysyvällä prosessipoolilla.
+
+Juuren siirrot (ja valinnaisesti ensimmäinen CHANCE-kerros) jaetaan
+lämpimälle ``ProcessPoolExecutor``-poolille, joka säilyy siirtojen välillä.
+Työprosessit rakentavat taulukkonsa ja välimuistinsa kerran ja pitävät
+oman transpositiotaulunsa hausta toiseen, kuten sarjahakukin.
+
+Rinnakkaishaku käyttää aina bittilautaa: tehtävät ovat pelkkiä
+kokonaislukuja, ja bittilautahaun arvot ovat pisteistä riippumattomia.
+Vanhemmassa prosessissa CHANCE-kerros yhdistetään samassa järjestyksessä
+kuin ``_bb_exp_value``. Työprosessien transpositiotaulut ovat
+exact_depth-tilassa (merkintä vastaa vain saman syvyyden kyselyyn), joten
+välimuistien sisältö ei vaikuta arvoihin. Tulos on bitilleen sama kuin
+sarjahaussa, jonka taulu on exact_depth-tilassa (oletuksena sarjahaku
+käyttää myös syvempiä tuloksia, ks. ttable.py, ja voi poiketa hieman).
+
+Arvioija ja haun asetukset: pooli sidotaan luontihetken arvioijaan
+(ex.set_evaluator), joka välitetään työprosesseille alustuksessa, joten
+haarukointia ei tarvita. Jos vanhemman arvioija vaihtuu, pooli luodaan
+uudelleen seuraavassa haussa. symmetry, prob_cutoff ja batch kulkevat
+jokaisen tehtävän mukana.
+
+Jaettu transpositiotaulu (shared_table, ks. sharedtable.py): työprosessit
+käyttävät omien taulujensa sijaan yhtä jaetun muistin taulua, joten
+sisarprosessin jo laskemia alipuita ei lasketa uudelleen. Tulos on sama
+kuin sarjahaussa.
+
+Käyttö:
+    d, value = best_move_parallel(s, depth=5, workers=8, split_chance=True)
+
+    with SharedTranspositionTable(size_mb=256) as table:
+        d, value = best_move_parallel(s, depth=5, workers=8, shared_table=table)
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+import os
+
+from . import bitboard
+from . import expectiminimax as ex
+from .board import Direction, GameState, PROB_FOUR
+from .sharedtable import SharedTranspositionTable
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_evaluator = None
+_search_ids = count(1)
+_epoch = 0
+
+# Työprosessin tila: viimeisin haku, välimuistien aikakausi, oma
+# transpositiotaulu ja liitetyt jaetut taulut nimen mukaan.
+_worker_search = 0
+_worker_epoch = 0
+_private_cache = ex.cache
+_worker_table: Optional[str] = None
+_worker_tables: Dict[str, SharedTranspositionTable] = {}
+
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Palauttaa pysyvän poolin.
+
+    Pooli luodaan ensimmäisellä kerralla sekä koon tai arvioijan
+    (ex.set_evaluator) muuttuessa.
+    """
+    global _pool, _pool_workers, _pool_evaluator
+    n = workers or os.cpu_count() or 1
+    if _pool is None or n != _pool_workers or ex._evaluator is not _pool_evaluator:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=n, initializer=_init_worker,
+                                    initargs=(ex._evaluator,))
+        _pool_workers = n
+        _pool_evaluator = ex._evaluator
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """Sammuttaa poolin (seuraava haku luo uuden)."""
+    global _pool, _pool_workers, _pool_evaluator
+    if _pool is not None:
+        _pool.shutdown()
+    _pool, _pool_workers, _pool_evaluator = None, 0, None
+
+
+def clear_caches() -> None:
+    """Tyhjentää välimuistit sekä tässä prosessissa että työprosesseissa.
+
+    Työprosessit tyhjentävät omansa seuraavan tehtävän alussa.
+    """
+    global _epoch
+    _epoch += 1
+    ex.cache.clear()
+    ex._eval_cache.clear()
+
+
+def _init_worker(evaluator) -> None:
+    """Työprosessin alustus: vanhemman arvioija ja exact_depth-taulu."""
+    ex.set_evaluator(evaluator)
+    _private_cache.exact_depth = True
+
+
+def _use_table(name: Optional[str]) -> None:
+    """Vaihtaa työprosessin ex.cachen jaettuun tauluun name (None = oma taulu)."""
+    global _worker_table, _worker_search
+    _worker_table = name
+    _worker_search = 0  # sukupolvi luetaan uudelleen _begin_searchissa
+    if name is None:
+        ex.cache = _private_cache
+        return
+    table = _worker_tables.get(name)
+    if table is None:
+        table = _worker_tables[name] = SharedTranspositionTable.attach(name)
+    ex.cache = table
+
+
+Settings = Tuple[bool, float, bool]  # (symmetry, prob_cutoff, batch)
+
+
+def _subtree_value(node: str, b: int, d: int, p: float, settings: Settings, search_id: int,
+                   epoch: int, table: Optional[str] = None) -> float:
+    """Työprosessin tehtävä: yhden alipuun arvo (suhteessa pisteisiin).
+
+    p on solmun polun todennäköisyys ja settings haun asetukset
+    (ks. ex._begin_search).
+    """
+    global _worker_search, _worker_epoch
+    if epoch != _worker_epoch:
+        _worker_epoch = epoch
+        _private_cache.clear()  # jaetun taulun tyhjentää sen omistaja
+        ex._eval_cache.clear()
+    if table != _worker_table:
+        _use_table(table)
+    if search_id != _worker_search:
+        _worker_search = search_id
+        ex._begin_search(*settings)
+    if node == "chance":
+        return ex._bb_exp_value(b, d, p)
+    return ex._bb_max_value(b, d, p)
+
+
+class _Done:
+    """Valmiiksi laskettu arvo samalla rajapinnalla kuin Future."""
+
+    def __init__(self, value: float) -> None:
+        self.value = value
+
+    def result(self) -> float:
+        return self.value
+
+
+class _ChanceSplit:
+    """Juuren lapsen CHANCE-solmu, jonka MAX-lapset lasketaan poolissa."""
+
+    def __init__(self, shifts: List[int], futures: List[Tuple[Future, Future]]) -> None:
+        self.shifts = shifts
+        self.futures = futures
+
+    def result(self) -> float:
+        # Sama laskujärjestys kuin _bb_exp_value:ssa.
+        p2, p4 = 1.0 - PROB_FOUR, PROB_FOUR
+        total = 0.0
+        for f2, f4 in self.futures:
+            total += p2 * f2.result()
+            total += p4 * f4.result()
+        return total / len(self.shifts)
+
+
+def _submit_chance(pool: ProcessPoolExecutor, b: int, d: int, settings: Settings,
+                   search_id: int, table: Optional[str] = None):
+    """Jakaa CHANCE-solmun MAX-lapset poolille; lehdet lasketaan paikallisesti."""
+    symmetry, _prob_cutoff, batch = settings
+    if d == 0:
+        return _Done(ex._bb_eval(b))
+    if d == 2 and batch:
+        # Eräarvio kattaa koko solmun, joten se lasketaan yhtenä tehtävänä.
+        return pool.submit(_subtree_value, "chance", b, d, 1.0, settings, search_id, _epoch,
+                           table)
+    if symmetry:
+        b = bitboard.canonical(b)
+    shifts = bitboard.empty_shifts(b)
+    if not shifts:
+        return _Done(ex._bb_eval(b))
+    p = 1.0 / len(shifts)  # syntypaikan todennäköisyys kaikista tyhjistä
+    if len(shifts) > ex._THIN_CELLS and d >= 3:
+        shifts = ex._bb_thin(b, shifts)
+    c2, c4 = p * (1.0 - PROB_FOUR), p * PROB_FOUR
+    futures = [
+        (pool.submit(_subtree_value, "max", b | (1 << sh), d - 1, c2, settings, search_id,
+                     _epoch, table),
+         pool.submit(_subtree_value, "max", b | (2 << sh), d - 1, c4, settings, search_id,
+                     _epoch, table))
+        for sh in shifts
+    ]
+    return _ChanceSplit(shifts, futures)
+
+
+def best_move_parallel(s: GameState, depth: int = 4, workers: Optional[int] = None,
+                       symmetry: bool = False,
+                       split_chance: bool = False,
+                       shared_table: Optional[SharedTranspositionTable] = None,
+                       prob_cutoff: float = 0.0, batch: bool = False
+                       ) -> Tuple[Direction, float]:
+    """Valitsee parhaan siirron jakamalla juuren alipuut prosessipoolille.
+
+    Args:
+        s: Pelitila.
+        depth: Haun perussyvyys (dynamic_depth säätää tätä kuten sarjahaussa).
+        workers: Työprosessien määrä (oletus: prosessorien määrä).
+        symmetry: Kanonisoi välimuistiavaimet symmetrioiden yli.
+        split_chance: Jaa myös ensimmäinen CHANCE-kerros (enemmän pienempiä
+            tehtäviä, parempi kuorman tasaus monella ytimellä).
+        shared_table: Työprosessien yhteinen transpositiotaulu (tämän
+            prosessin luoma); None = jokaisella prosessilla oma taulu.
+        prob_cutoff, batch: Kuten best_move_expecti:ssä.
+
+    Lauta, jota bittilauta ei esitä (muu kuin 4x4 tai laatta yli 32768),
+    haetaan tässä prosessissa ruudukkohaulla (best_move_expecti).
+
+    Returns:
+        (suunta, odotusarvo), sama kuin best_move_expecti(backend="bitboard")
+        (ks. moduulin kuvaus välimuisteista).
+    """
+    b = ex._encode(s.grid)
+    if b is None:
+        return ex.best_move_expecti(s, depth, backend="grid", symmetry=symmetry,
+                                    prob_cutoff=prob_cutoff)
+    settings = (symmetry, prob_cutoff, batch)
+    ex._begin_search(*settings)
+    table = None
+    if shared_table is not None:
+        shared_table.new_search()
+        table = shared_table.name
+    d = ex.dynamic_depth(depth, bitboard.count_empty(b), 1 << bitboard.max_exponent(b))
+
+    moves = ex._bb_ordered_moves(b)
+    if not moves:
+        return "left", float(s.score) + ex._bb_eval(b)
+
+    pool = get_pool(workers)
+    search_id = next(_search_ids)
+    pending = []
+    for m, nb, gained, _proxy in moves:
+        if split_chance:
+            job = _submit_chance(pool, nb, d - 1, settings, search_id, table)
+        else:
+            job = pool.submit(_subtree_value, "chance", nb, d - 1, 1.0, settings, search_id,
+                              _epoch, table)
+        pending.append((m, gained, job))
+
+    best_dir, best_val = moves[0][0], float("-inf")
+    for m, gained, job in pending:
+        val = gained + job.result()
+        if val > best_val:
+            best_val, best_dir = val, m
+    return best_dir, float(s.score) + best_val
@@ -0,0 +1,78 @@
+"""Hakutilastot (SearchStats) Expectiminimaxille.
+
+best_move_expecti(stats=True) antaa haulle SearchStats-olion
+(expectiminimax._stats), johon haku kirjaa omissa kohdissaan. Solmut
+kirjataan solmulaskurin hitaassa polussa (sama kuin aikabudjetin
+tarkistus), joten ilman tilastoja hakuun ei tule uusia tarkistuksia
+solmua kohden; välimuistien ja ohennuksen kirjauspisteet ovat yksi
+vertailu. Hakumoduulin funktioita ei vaihdeta, joten tilastohaku ei
+vaikuta muihin hakuihin, ja sisäkkäinen tilastohaku palauttaa ulomman
+olion lopuksi. Haku itse (kuten sen välimuistitkin) on prosessikohtainen
+eikä säieturvallinen; rinnakkaiset haut ajetaan lukon alla tai omissa
+prosesseissaan.
+
+Kerättävät tiedot:
+- solmut solmutyypeittäin (max/chance) ja jäljellä olevan syvyyden mukaan,
+- transpositiotaulun ja eval-välimuistin osumat ja hudit,
+- dynamic_depthin valitsema syvyys,
+- ohennetut CHANCE-solmut (kuuden solun rajaus) ja pois jätetyt solut,
+- todennäköisyysrajan (prob_cutoff) takia lehtinä arvioidut CHANCE-solmut,
+- välimuistien koot haun lopussa (haun aikainen huippu, sillä haku vain
+  lisää merkintöjä),
+- siirtojen generointiin ja heuristiikkaan (myös inkrementaaliseen
+  evaluate_acciin ja eräarvioon) kulunut aika. Siirtojen aika mitataan
+  laajennetuissa MAX-solmuissa generoimalla solmun siirrot kerran erikseen.
+
+Ajanotto ja kirjaus kasvattavat haun kestoa, joten total_time on
+tilastoiden kanssa suurempi kuin ilman.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict
+
+
+@dataclass
+class SearchStats:
+    """Yhden haun tilastot.
+
+    Attributes:
+        depth: dynamic_depthin valitsema syvyys (0, jos sitä ei kutsuttu).
+        nodes: {"max"/"chance": Counter(jäljellä oleva syvyys -> solmut)}.
+        tt_hits, tt_misses: Transpositiotaulun osumat ja hudit.
+        eval_hits, eval_misses: Eval-välimuistin osumat ja hudit.
+        thinned: Ohennettujen CHANCE-solmujen määrä.
+        thinned_cells: Ohennuksessa pois jätettyjen syntypaikkojen määrä.
+        prob_cut: Todennäköisyysrajan takia lehtinä arvioidut CHANCE-solmut.
+        tt_size, eval_cache_size: Välimuistien koot haun lopussa.
+        movegen_time: Siirtojen generointiin kulunut aika (s).
+        eval_time: Heuristiikan laskentaan kulunut aika (s).
+        total_time: Koko haun kesto (s).
+        book_hit: Siirto saatiin avauskirjasta; hakua ei tehty, joten
+            solmu- ja välimuistilaskurit ovat nollia.
+    """
+    depth: int = 0
+    nodes: Dict[str, Counter] = field(default_factory=lambda: {"max": Counter(), "chance": Counter()})
+    tt_hits: int = 0
+    tt_misses: int = 0
+    eval_hits: int = 0
+    eval_misses: int = 0
+    thinned: int = 0
+    thinned_cells: int = 0
+    prob_cut: int = 0
+    tt_size: int = 0
+    eval_cache_size: int = 0
+    movegen_time: float = 0.0
+    eval_time: float = 0.0
+    total_time: float = 0.0
+    book_hit: bool = False
+
+    @property
+    def total_nodes(self) -> int:
+        return sum(self.nodes["max"].values()) + sum(self.nodes["chance"].values())
+
+    @property
+    def nodes_per_sec(self) -> float:
+        return self.total_nodes / self.total_time if self.total_time else 0.0
+
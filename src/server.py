@@ -0,0 +1,218 @@
+"""Pitkäikäinen siirtopalvelin: NDJSON Unix-soketin tai stdin/stdoutin yli.
+
+Jokainen kutsuja, joka tuo paketin omaan prosessiinsa, maksaa tuonnin ja
+kylmät välimuistit joka kerta. Palvelin pitää haun transpositiotaulun,
+eval-välimuistin ja siirtotaulukot lämpiminä pyyntöjen välillä.
+
+Pyyntö on yksi JSON-rivi:
+
+    {"id": 1, "board": [[2, 0, 0, 0], ...], "score": 0, "depth": 3}
+
+Valinnaiset kentät: "time_ms" (iteratiivinen syvennys syvyyden sijaan),
+"backend" ("grid"/"bitboard", oletus palvelimen --backend) ja "stats"
+(true = täydet hakutilastot, ks. searchstats.py). Vastaus on yksi rivi:
+
+    {"id": 1, "move": "left", "value": 1234.5,
+     "stats": {"nodes": 812, "ms": 1.9, "tt_size": 5120, "eval_cache_size": 20480}}
+
+tai virheellisestä pyynnöstä {"id": 1, "error": "..."}. Haut tehdään lukon
+alla, joten yksi pyyntö ei saa varata palvelinta: depth on väliltä
+1..MAX_DEPTH, time_ms äärellinen luku väliltä (0, MAX_TIME_MS] ja lauta
+enintään MAX_SIZE x MAX_SIZE. Laatat ovat 0 tai kahden potensseja (2, 4,
+...) ja score ei-negatiivinen kokonaisluku. Pyynnöt käsitellään
+saapumisjärjestyksessä, joten asiakas voi lähettää useita pyyntöjä
+odottamatta vastauksia (pipelining). Soketilla jokainen yhteys saa oman
+säikeensä, mutta haut tehdään lukon alla yksi kerrallaan (haun tila on
+moduulitasolla).
+
+Käyttö:
+    python -m src.server --socket /tmp/2048.sock
+    python -m src.server --stdio < pyynnot.ndjson
+    python -m benchmarks.server_load --requests 2000 --pipeline 8
+"""
+
+from __future__ import annotations
+import argparse
+import dataclasses
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+from typing import IO
+
+from . import expectiminimax as ex
+from .board import GameState
+
+_lock = threading.Lock()
+_BACKENDS = ("grid", "bitboard")
+MAX_DEPTH = 6          # pyynnön suurin syvyys (dynamic_depth voi lisätä tähän)
+MAX_TIME_MS = 10_000   # pyynnön suurin aikabudjetti
+MAX_SIZE = 6           # suurin laudan koko (NxN)
+
+# Lämmittely: haku täyttää laiskat taulukot ja välimuistit ennen ensimmäistä pyyntöä.
+_WARMUP = [[2, 4, 8, 16], [0, 2, 4, 8], [0, 0, 2, 4], [0, 0, 0, 2]]
+
+
+def _tile(v, n: int) -> bool:
+    # 0 tai kahden potenssi 2..2^(n*n+1) (suurin NxN-laudalla mahdollinen).
+    return (isinstance(v, int) and not isinstance(v, bool)
+            and (v == 0 or (v >= 2 and v & (v - 1) == 0 and v.bit_length() <= n * n + 2)))
+
+
+def _board(value) -> list:
+    if not (isinstance(value, list) and 2 <= len(value) <= MAX_SIZE
+            and all(isinstance(r, list) and len(r) == len(value) for r in value)
+            and all(_tile(v, len(value)) for r in value for v in r)):
+        raise ValueError(f"board on NxN-lista (N = 2..{MAX_SIZE}), laatat 0 tai 2, 4, 8, ...")
+    return [r[:] for r in value]
+
+
+def _score(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not 0 <= value < math.inf or value != int(value):
+        raise ValueError("score on ei-negatiivinen kokonaisluku")
+    return int(value)
+
+
+def _depth(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not 1 <= value <= MAX_DEPTH or value != int(value):
+        raise ValueError(f"depth on kokonaisluku 1..{MAX_DEPTH}")
+    return int(value)
+
+
+def _time_ms(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not math.isfinite(value) or not 0 < value <= MAX_TIME_MS:
+        raise ValueError(f"time_ms on luku väliltä (0, {MAX_TIME_MS}]")
+    return float(value)
+
+
+def handle(request: dict, backend: str = "bitboard") -> dict:
+    """Käsittelee yhden pyynnön ja palauttaa vastauksen (tai virheen)."""
+    rid = request.get("id") if isinstance(request, dict) else None
+    try:
+        if not isinstance(request, dict):
+            raise ValueError("pyyntö on JSON-olio")
+        grid = _board(request.get("board"))
+        score = _score(request.get("score", 0))
+        depth = _depth(request.get("depth", 3))
+        time_ms = request.get("time_ms")
+        if time_ms is not None:
+            time_ms = _time_ms(time_ms)
+        backend = request.get("backend", backend)
+        if backend not in _BACKENDS:
+            raise ValueError(f"tuntematon backend {backend!r}")
+        if backend == "bitboard" and ex._encode(grid) is None:
+            backend = "grid"  # bittilauta on vain 4x4 ja laatat <= 32768
+        s = GameState(grid, score, backend=backend)
+        with _lock:
+            n0 = ex._nodes
+            t0 = time.perf_counter()
+            full = None
+            if time_ms is not None:
+                move, value = ex.best_move_iterative(s, time_ms=time_ms, backend=backend)
+                nodes = ex._nodes  # iteratiivinen haku nollaa laskurin
+            elif request.get("stats"):
+                move, value, full = ex.best_move_expecti(s, depth=depth, backend=backend, stats=True)
+                nodes = full.total_nodes
+            else:
+                move, value = ex.best_move_expecti(s, depth=depth, backend=backend)
+                nodes = ex._nodes - n0
+            stats = {"nodes": nodes, "ms": 1000 * (time.perf_counter() - t0),
+                     "tt_size": len(ex.cache), "eval_cache_size": len(ex._eval_cache)}
+        if full is not None:
+            stats["search"] = dataclasses.asdict(full)
+        return {"id": rid, "move": move, "value": value, "stats": stats}
+    except (ValueError, TypeError, OverflowError) as e:
+        return {"id": rid, "error": str(e)}
+
+
+def handle_line(line, backend: str = "bitboard") -> str:
+    """Yksi NDJSON-pyyntörivi -> vastausrivi (rivinvaihdon kanssa)."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        reply = {"id": None, "error": f"virheellinen JSON: {e}"}
+    else:
+        reply = handle(request, backend)
+    return json.dumps(reply, separators=(",", ":")) + "\n"
+
+
+def serve_stdio(inp: IO[str] = None, out: IO[str] = None, backend: str = "bitboard") -> None:
+    """Lukee pyyntöjä riveittäin ja kirjoittaa vastaukset samassa järjestyksessä."""
+    inp = inp or sys.stdin
+    out = out or sys.stdout
+    for line in inp:
+        if line.strip():
+            out.write(handle_line(line, backend))
+            out.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(handle_line(line, self.server.backend).encode())
+
+
+class MoveServer(socketserver.ThreadingUnixStreamServer):
+    """Unix-soketin palvelin; jokainen yhteys omassa säikeessään."""
+    daemon_threads = True
+
+    def __init__(self, path: str, backend: str = "bitboard") -> None:
+        if os.path.exists(path):
+            os.unlink(path)  # edellisen ajon jäänne
+        self.backend = backend
+        super().__init__(path, _Handler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def warm_up(backend: str = "bitboard", depth: int = 3) -> None:
+    """Ajaa yhden haun, jotta taulukot ja välimuistit ovat valmiina."""
+    handle({"board": _WARMUP, "depth": depth}, backend)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="2048-siirtopalvelin (NDJSON).")
+    where = ap.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="Unix-soketin polku")
+    where.add_argument("--stdio", action="store_true", help="lue stdin, kirjoita stdout")
+    ap.add_argument("--backend", choices=_BACKENDS, default="bitboard",
+                    help="oletuslautatoteutus pyynnöille")
+    ap.add_argument("--ntuple", default=None, help="n-tuple-verkon painotiedosto")
+    ap.add_argument("--book", default=None, help="avauskirjan tiedosto")
+    ap.add_argument("--no-warmup", action="store_true", help="älä aja lämmittelyhakua")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.ntuple:
+        ex.set_evaluator(args.ntuple)
+    if args.book:
+        ex.set_book(args.book)
+    if not args.no_warmup:
+        warm_up(args.backend)
+    if args.stdio:
+        serve_stdio(backend=args.backend)
+        return
+    server = MoveServer(args.socket, args.backend)
+    print(f"kuunnellaan {args.socket}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,353 @@
+"""Monen pelin asyncio-palvelu: istunnot, siirrot ja haku prosessipoolissa.
+
+SessionManager pitää muistissa monta peliä (GameState istuntoa kohden) ja
+ottaa vastaan pelaajan siirtoja ja tekoälypyyntöjä rinnakkain. Haku
+(best_move_expecti) ajetaan rajatussa ProcessPoolExecutorissa, joten syvä
+haku ei pysäytä tapahtumasilmukkaa eikä muita istuntoja; työprosessien
+välimuistit pysyvät lämpiminä pyyntöjen välillä.
+
+Vastapaine: korkeintaan max_inflight hakua on poolissa kerrallaan, ja
+paikkaa odottaa korkeintaan max_queue pyyntöä; sen yli ai_move nostaa
+Overloaded-virheen heti (asiakas voi yrittää myöhemmin). Jonopaikka
+varataan ai_movessa ennen tehtävän luontia, joten samassa silmukan
+kierroksessa saapuva pyyntöryöppy ei ohita rajaa.
+
+Peruutus: istunnolla on korkeintaan yksi tekoälypyyntö. Uusi tekoälypyyntö,
+pelaajan siirto tai istunnon sulkeminen peruu edellisen pyynnön. Jonossa
+oleva haku ei käynnisty lainkaan; jo käynnissä olevaa hakua työprosessi ei
+voi keskeyttää, mutta sen tulos hylätään (istunnon sukupolvi on vaihtunut).
+
+Istuntoja voi käyttää suoraan (await manager.ai_move(sid)) tai NDJSON-
+palvelimena Unix-soketin yli. Jokainen rivi on oma tehtävänsä, joten
+vastaukset voivat tulla eri järjestyksessä kuin pyynnöt ("id" yhdistää):
+
+    {"id": 1, "op": "new"}                          -> {"id": 1, "session": "s1", "grid": ...}
+    {"id": 2, "op": "ai", "session": "s1", "depth": 3}
+    {"id": 3, "op": "move", "session": "s1", "dir": "left"}
+    {"id": 4, "op": "state", "session": "s1"}
+    {"id": 5, "op": "close", "session": "s1"}
+
+Yhteyden katketessa sen luomat istunnot suljetaan (ja niiden haut perutaan).
+Pyynnön "size" on väliltä 2..MAX_SIZE ja "depth" väliltä 1..MAX_DEPTH.
+Ilman "backend"-kenttää 4x4-peli käyttää bittilautaa ja muut ruudukkoa.
+
+Käyttö:
+    python -m src.sessions --socket /tmp/2048-sessions.sock --workers 4
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from . import expectiminimax as ex
+from .board import SIZE, Backend, Direction, GameState, new_game
+
+DIRECTIONS = ("left", "up", "right", "down")
+MAX_DEPTH = 6          # tekoälypyynnön suurin syvyys (kuten server.py)
+MAX_SIZE = 6           # uuden pelin suurin laudan koko
+
+
+class Overloaded(RuntimeError):
+    """Hakujono on täynnä; pyyntö hylättiin vastapaineen takia."""
+
+
+class Superseded(RuntimeError):
+    """Tekoälypyyntö peruttiin: uusi pyyntö, siirto tai sulkeminen ohitti sen."""
+
+
+def _init_worker(ntuple: Optional[str], book: Optional[str]) -> None:
+    """Työprosessin alustus: sama arviofunktio ja avauskirja kuin palvelulla."""
+    if ntuple:
+        ex.set_evaluator(ntuple)
+    if book:
+        ex.set_book(book)
+
+
+def _int_field(request: dict, name: str, default: int, lo: int, hi: int) -> int:
+    """Pyynnön kokonaislukukenttä väliltä lo..hi (muuten ValueError)."""
+    value = request.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not lo <= value <= hi or value != int(value):
+        raise ValueError(f"{name} on kokonaisluku {lo}..{hi}")
+    return int(value)
+
+
+def _search(grid, score: int, depth: int, backend: Backend) -> Tuple[Direction, float]:
+    """Ajetaan työprosessissa: yksi juurihaku."""
+    return ex.best_move_expecti(GameState(grid, score, backend=backend), depth=depth)
+
+
+@dataclass
+class Session:
+    """Yhden pelin tila.
+
+    Attributes:
+        id: Istunnon tunniste.
+        state: Pelitila.
+        generation: Kasvaa jokaisesta tilan muutoksesta; vanhentunut
+            hakutulos tunnistetaan tästä.
+        ai_task: Käynnissä oleva tekoälypyyntö (None = ei pyyntöä).
+    """
+    id: str
+    state: GameState
+    generation: int = 0
+    ai_task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> dict:
+        s = self.state
+        return {"session": self.id, "grid": [r[:] for r in s.grid], "score": s.score,
+                "over": s.over, "won": s.won}
+
+
+class SessionManager:
+    """Istunnot ja rajattu hakupooli.
+
+    Args:
+        workers: Hakuprosessien määrä.
+        max_inflight: Poolissa kerrallaan olevat haut (oletus workers).
+        max_queue: Paikkaa odottavien hakujen enimmäismäärä.
+        ntuple, book: Työprosesseille asetettava verkko ja avauskirja.
+    """
+
+    def __init__(self, workers: int = 2, max_inflight: Optional[int] = None,
+                 max_queue: int = 64, ntuple: Optional[str] = None,
+                 book: Optional[str] = None) -> None:
+        self.sessions: Dict[str, Session] = {}
+        self._pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                         initargs=(ntuple, book))
+        self._slots = asyncio.Semaphore(max_inflight or workers)
+        self._free = max_inflight or workers   # vapaat paikat (semaforin arvo)
+        self._max_queue = max_queue
+        self._waiting: set = set()             # jonopaikan varanneet tehtävät
+        self._superseded: set = set()
+        self._ids = itertools.count(1)
+
+    async def __aenter__(self) -> "SessionManager":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.shutdown()
+
+    def _get(self, sid: str) -> Session:
+        try:
+            return self.sessions[sid]
+        except KeyError:
+            raise KeyError(f"tuntematon istunto {sid!r}") from None
+
+    def new_session(self, size: int = SIZE, backend: Optional[Backend] = None) -> Session:
+        """Luo uuden pelin (backend None: bittilauta 4x4-laudalle, muuten ruudukko)."""
+        if backend is None:
+            backend = "bitboard" if size == SIZE else "grid"
+        sid = f"s{next(self._ids)}"
+        session = self.sessions[sid] = Session(sid, new_game(backend=backend, size=size))
+        return session
+
+    def _cancel_ai(self, session: Session) -> None:
+        if session.ai_task is not None and not session.ai_task.done():
+            self._superseded.add(session.ai_task)
+            session.ai_task.cancel()
+        session.ai_task = None
+
+    def move(self, sid: str, d: Direction) -> bool:
+        """Pelaajan siirto; peruu istunnon vanhentuneen tekoälypyynnön."""
+        if d not in DIRECTIONS:
+            raise ValueError(f"tuntematon suunta {d!r}")
+        session = self._get(sid)
+        self._cancel_ai(session)
+        if session.state.over or not session.state.move(d):
+            return False
+        session.generation += 1
+        return True
+
+    async def ai_move(self, sid: str, depth: int = 3,
+                      apply: bool = True) -> Optional[Tuple[Direction, float]]:
+        """Hakee istunnolle siirron poolissa ja tekee sen (apply=True).
+
+        Returns:
+            (suunta, arvo), tai None jos peli on ohi.
+
+        Raises:
+            Overloaded: Jono on täynnä.
+            Superseded: Pyyntö peruttiin (uusi pyyntö, siirto tai sulkeminen).
+        """
+        session = self._get(sid)
+        self._cancel_ai(session)
+        if session.state.over:
+            return None
+        if len(self._waiting) >= self._max_queue + self._free:
+            raise Overloaded("hakujono on täynnä")
+        task = asyncio.ensure_future(self._ai_move(session, depth, apply))
+        # Paikka varataan heti; tehtävä vapauttaa sen saatuaan hakupaikan, ja
+        # ennen käynnistymistään peruttu tehtävä valmistuessaan.
+        self._waiting.add(task)
+        task.add_done_callback(self._waiting.discard)
+        session.ai_task = task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task in self._superseded:
+                raise Superseded("pyyntö peruttiin") from None
+            raise
+        finally:
+            self._superseded.discard(task)
+            if session.ai_task is task:
+                session.ai_task = None
+
+    async def _ai_move(self, session: Session, depth: int,
+                       apply: bool) -> Tuple[Direction, float]:
+        generation = session.generation
+        s = session.state
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting.discard(asyncio.current_task())
+        self._free -= 1
+        loop = asyncio.get_running_loop()
+        try:
+            fut = self._pool.submit(_search, [r[:] for r in s.grid], s.score, depth, s.backend)
+        except BaseException:
+            self._release_slot()
+            raise
+        # Paikka vapautuu vasta, kun työprosessi on valmis (myös peruttu haku
+        # varaa prosessin loppuun asti); jonossa oleva future perutaan kokonaan.
+        def done(_f) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release_slot)
+
+        fut.add_done_callback(done)
+        d, value = await asyncio.wrap_future(fut)
+        if session.generation != generation:  # pragma: no cover - siirto peruu tehtävän
+            raise Superseded("tila muuttui haun aikana")
+        if apply and s.move(d):
+            session.generation += 1
+        return d, value
+
+    def _release_slot(self) -> None:
+        self._free += 1
+        self._slots.release()
+
+    def close_session(self, sid: str) -> None:
+        """Poistaa istunnon ja peruu sen tekoälypyynnön."""
+        self._cancel_ai(self._get(sid))
+        del self.sessions[sid]
+
+    async def shutdown(self) -> None:
+        """Peruu kaikki pyynnöt ja sulkee poolin."""
+        for session in self.sessions.values():
+            self._cancel_ai(session)
+        self.sessions.clear()
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._pool.shutdown(wait=True, cancel_futures=True))
+
+    async def handle(self, request: dict, owned: Optional[set] = None) -> dict:
+        """Yksi NDJSON-pyyntö (ks. moduulin kuvaus) -> vastaus.
+
+        owned: Yhteyden luomien istuntojen tunnisteet (päivitetään).
+        """
+        rid = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("pyyntö on JSON-olio")
+            op = request.get("op")
+            if op == "new":
+                session = self.new_session(_int_field(request, "size", SIZE, 2, MAX_SIZE),
+                                           request.get("backend"))
+                if owned is not None:
+                    owned.add(session.id)
+                return {"id": rid, **session.snapshot()}
+            sid = request.get("session")
+            if op == "move":
+                moved = self.move(sid, request.get("dir"))
+                return {"id": rid, "moved": moved, **self._get(sid).snapshot()}
+            if op == "ai":
+                hit = await self.ai_move(sid, _int_field(request, "depth", 3, 1, MAX_DEPTH),
+                                         bool(request.get("apply", True)))
+                move, value = hit if hit is not None else (None, None)
+                return {"id": rid, "move": move, "value": value, **self._get(sid).snapshot()}
+            if op == "state":
+                return {"id": rid, **self._get(sid).snapshot()}
+            if op == "close":
+                self.close_session(sid)
+                if owned is not None:
+                    owned.discard(sid)
+                return {"id": rid, "closed": sid}
+            raise ValueError(f"tuntematon op {op!r}")
+        except Superseded:
+            return {"id": rid, "cancelled": True}
+        except (KeyError, ValueError, TypeError, OverflowError, Overloaded) as e:
+            return {"id": rid, "error": str(e.args[0] if e.args else e)}
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        owned: set = set()  # tämän yhteyden istunnot; suljetaan yhteyden katketessa
+
+        async def answer(line: bytes) -> None:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply = {"id": None, "error": f"virheellinen JSON: {e}"}
+            else:
+                reply = await self.handle(request, owned)
+            writer.write((json.dumps(reply, separators=(",", ":")) + "\n").encode())
+            await writer.drain()  # vastapaine hitaalle lukijalle
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    t = asyncio.ensure_future(answer(line))
+                    tasks.add(t)
+                    t.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for t in tasks:
+                t.cancel()
+            for sid in owned:
+                if sid in self.sessions:
+                    self.close_session(sid)
+            writer.close()
+
+    async def serve(self, path: str) -> asyncio.AbstractServer:
+        """Käynnistää NDJSON-palvelimen Unix-sokettiin."""
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self._client, path)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    async with SessionManager(args.workers, max_queue=args.max_queue,
+                              ntuple=args.ntuple, book=args.book) as manager:
+        server = await manager.serve(args.socket)
+        print(f"kuunnellaan {args.socket}", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Monen istunnon 2048-palvelu (asyncio).")
+    ap.add_argument("--socket", required=True, help="Unix-soketin polku")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="hakuprosessien määrä")
+    ap.add_argument("--max-queue", type=int, default=64,
+                    help="jonossa odottavien hakujen enimmäismäärä")
+    ap.add_argument("--ntuple", default=None, help="n-tuple-verkon painotiedosto")
+    ap.add_argument("--book", default=None, help="avauskirjan tiedosto")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
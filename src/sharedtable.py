@@ -0,0 +1,207 @@
+"""Prosessien yhteinen transpositiotaulu (multiprocessing.shared_memory).
+
+Jokaisella työprosessilla on muuten oma ex.cache, joten rinnakkaiset haut
+laskevat uudelleen asemia, jotka sisarprosessi on jo ratkaissut.
+SharedTranspositionTable on kiinteän kokoinen hajautustaulu jaetussa
+muistissa, ja sillä on sama rajapinta kuin ttable.TranspositionTablella
+(get, put, new_search, clear, hit_rate). Se käy siis suoraan ex.cacheksi
+bittilautahaussa, jonka avaimet ovat kokonaislukuja (lauta << 1 | solmu).
+
+Muistin rakenne (little-endian):
+
+    otsake  16 tavua: sukupolvi u64, paikkojen määrä u64 (kahden potenssi)
+    paikat  24 tavua/paikka: tarkiste u64, meta u64, arvo f64
+
+meta = syvyys (8 bittiä) | sukupolvi << 8 (32 bittiä) | avaimen bitti 64
+<< 40 | käytössä-lippu << 41. Tarkiste on avain ^ meta ^ arvon bitit.
+
+Lukot: ei ole. Kirjoitus on yksi pack_into, mutta rinnakkainen kirjoitus
+samaan paikkaan voi silti repiä merkinnän. Lukija hyväksyy paikan vain,
+jos tarkiste täsmää avaimeen, joten revitty merkintä näyttää hudilta
+(Hyattin XOR-tarkiste). Pahimmillaan työ tehdään uudelleen; väärää arvoa
+ei palauteta.
+
+Syvyys: merkintä vastaa vain saman syvyyden kyselyyn (kuten
+TranspositionTable exact_depth-tilassa), joten tulos ei riipu siitä, mikä prosessi ehti
+laskea minkäkin alipuun.
+
+Korvausperiaate: avain hajautetaan neljän paikan lohkoon (syvyydestä
+riippumatta). Saman avaimen ja syvyyden merkintä korvataan. Muuten uusi
+merkintä vie lohkon ensimmäisen vapaan paikan tai heikoimman merkinnän:
+ensin vanhemman sukupolven merkinnät, niistä matalin. Ikääntyminen hoituu siis korvauksen kautta ilman erillistä
+siivousta.
+
+Sukupolvi on otsakkeessa. Taulun luonut prosessi (omistaja) kasvattaa sitä
+new_searchissa. Liittyneet prosessit vain lukevat sen omassa
+new_searchissaan, joten kaikki näkevät saman haun saman sukupolvena.
+Osumat ja hudit lasketaan prosessikohtaisesti.
+
+Käyttö:
+    table = SharedTranspositionTable(size_mb=64)         # vanhempi
+    other = SharedTranspositionTable.attach(table.name)  # työprosessi
+    ex.cache = other
+    ...
+    table.close(); table.unlink()
+"""
+
+from __future__ import annotations
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+HEADER = struct.Struct("<QQ")
+SLOT = struct.Struct("<QQd")
+WAYS = 4
+BUCKET = struct.Struct("<" + "QQQ" * WAYS)
+
+_MASK64 = (1 << 64) - 1
+_HASH_MUL = 0x9E3779B97F4A7C15
+_GEN_MASK = (1 << 32) - 1
+_HIGH_BIT = 1 << 40
+_USED = 1 << 41
+_F64 = struct.Struct("<d")
+
+
+def _bits(value: float) -> int:
+    return int.from_bytes(_F64.pack(value), "little")
+
+
+def _float(bits: int) -> float:
+    return _F64.unpack(bits.to_bytes(8, "little"))[0]
+
+
+class SharedTranspositionTable:
+    """Kiinteän kokoinen transpositiotaulu jaetussa muistissa.
+
+    Attributes:
+        name: Jaetun muistin nimi (anna attachille työprosessissa).
+        slots: Paikkojen määrä.
+        owner: Loiko tämä prosessi taulun (vain omistaja kasvattaa sukupolvea).
+        generation: Nykyisen haun sukupolvi.
+        hits, misses: Osumat ja hudit viimeisimmässä haussa (tässä prosessissa).
+        total_hits, total_misses: Osumat ja hudit yhteensä (tässä prosessissa).
+    """
+
+    def __init__(self, size_mb: float = 64.0, slots: Optional[int] = None,
+                 name: Optional[str] = None) -> None:
+        if slots is None:
+            slots = int(size_mb * 1024 * 1024) // SLOT.size
+        slots = max(WAYS, 1 << (slots.bit_length() - 1))  # alaspäin kahden potenssiin
+        self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                               size=HEADER.size + slots * SLOT.size)
+        self._shm.buf[:HEADER.size + slots * SLOT.size] = bytes(HEADER.size + slots * SLOT.size)
+        HEADER.pack_into(self._shm.buf, 0, 0, slots)
+        self.owner = True
+        self._setup()
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedTranspositionTable":
+        """Liittyy toisen prosessin luomaan tauluun."""
+        self = cls.__new__(cls)
+        # Lapsiprosessit jakavat vanhemman resource_trackerin, joten liittyminen
+        # ei lisää uutta rekisteröintiä; muistin poistaa omistaja (unlink).
+        self._shm = shared_memory.SharedMemory(name=name)
+        self.owner = False
+        self._setup()
+        return self
+
+    def _setup(self) -> None:
+        self.name = self._shm.name
+        self._buf = self._shm.buf
+        self.generation, self.slots = HEADER.unpack_from(self._buf, 0)
+        self._bits = self.slots.bit_length() - 1 - (WAYS.bit_length() - 1)
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def __enter__(self) -> "SharedTranspositionTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    def close(self) -> None:
+        """Vapauttaa tämän prosessin näkymän muistiin."""
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Poistaa jaetun muistin (omistaja, kun kaikki ovat lopettaneet)."""
+        self._shm.unlink()
+
+    def _bucket(self, key: int) -> int:
+        """Lohkon ensimmäisen paikan tavusiirtymä (Fibonacci-hajautus)."""
+        h = ((key * _HASH_MUL) & _MASK64) >> (64 - self._bits) if self._bits else 0
+        return HEADER.size + h * WAYS * SLOT.size
+
+    def get(self, key: int, depth: int) -> Optional[float]:
+        """Palauttaa depth-syvyisen haun tallennetun arvon (tai None)."""
+        lo = key & _MASK64
+        high = _HIGH_BIT if key >> 64 else 0
+        words = BUCKET.unpack_from(self._buf, self._bucket(key))
+        for i in range(0, 3 * WAYS, 3):
+            check, meta, vbits = words[i], words[i + 1], words[i + 2]
+            if (check ^ meta ^ vbits != lo or meta & _HIGH_BIT != high or not meta & _USED
+                    or meta & 0xFF != depth):
+                continue
+            self.hits += 1
+            return _float(vbits)
+        self.misses += 1
+        return None
+
+    def put(self, key: int, depth: int, value: float) -> None:
+        """Tallentaa depth-syvyisen haun arvon."""
+        lo = key & _MASK64
+        high = _HIGH_BIT if key >> 64 else 0
+        base = self._bucket(key)
+        words = BUCKET.unpack_from(self._buf, base)
+        gen = self.generation
+        victim, victim_rank = 0, None
+        for w in range(WAYS):
+            check, meta, vbits = words[3 * w], words[3 * w + 1], words[3 * w + 2]
+            if (meta & _USED and check ^ meta ^ vbits == lo and meta & _HIGH_BIT == high
+                    and meta & 0xFF == depth):
+                victim = w
+                break
+            if not meta & _USED:
+                rank = (-1, 0)        # vapaa paikka
+            else:
+                rank = (int((meta >> 8) & _GEN_MASK == gen), meta & 0xFF)
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = w, rank
+        meta = depth | (gen & _GEN_MASK) << 8 | high | _USED
+        vbits = _bits(value)
+        SLOT.pack_into(self._buf, base + victim * SLOT.size, lo ^ meta ^ vbits, meta, value)
+
+    def new_search(self) -> None:
+        """Aloittaa uuden haun.
+
+        Omistaja kasvattaa jaettua sukupolvea; liittynyt prosessi lukee sen.
+        """
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+        if self.owner:
+            self.generation = (self.generation + 1) & _GEN_MASK
+            HEADER.pack_into(self._buf, 0, self.generation, self.slots)
+        else:
+            self.generation = HEADER.unpack_from(self._buf, 0)[0]
+
+    def clear(self) -> None:
+        """Tyhjentää laskurit; omistaja tyhjentää myös jaetun muistin."""
+        if self.owner:
+            self._buf[HEADER.size:] = bytes(self.slots * SLOT.size)
+            self.generation = 0
+            HEADER.pack_into(self._buf, 0, 0, self.slots)
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def __len__(self) -> int:
+        metas = self._buf[HEADER.size:].cast("Q")[1::3]
+        return sum(1 for m in metas if m & _USED)
+
+    def hit_rate(self) -> float:
+        """Viimeisimmän haun osumaprosentti väliltä 0..1."""
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
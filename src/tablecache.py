@@ -0,0 +1,334 @@
+"""Esilaskettujen taulukoiden levyvälimuisti nopeaan käynnistykseen.
+
+Bittilaudan rivitaulukot (siirrot, pisteet, tyhjät, jumissa olevat rivit)
+ja heuristiikan rivi- ja saraketaulukot rakennetaan puhtaalla Pythonilla
+noin puolessa sekunnissa. cached() tallentaa ne ensimmäisellä kerralla
+tiedostoon ja lukee ne sen jälkeen mmapilla, joten uudet prosessit
+(työprosessit, cli, palvelimet) eivät rakenna niitä uudelleen.
+
+Tiedoston nimi ja otsake sisältävät tiivisteen (SHA-256) taulukot
+tuottavasta koodista (funktioiden tavukoodi, nimet ja vakiot, ei
+tiedostopolkua eikä rivinumeroita), niiden parametreista ja
+Python-versiosta. Jos koodi tai parametrit muuttuvat, tiiviste muuttuu ja
+taulukot rakennetaan uudelleen uuteen tiedostoon. Saman nimen muiden
+tiivisteiden tiedostot voivat kuulua toiselle kopiolle tai
+Python-versiolle samassa hakemistossa, joten niitä ei poisteta heti:
+latautuva tiedosto merkitään käytetyksi (mtime, enintään kerran
+vuorokaudessa), ja uutta tiedostoa tallennettaessa poistetaan saman nimen
+tiedostot, joita ei ole käytetty MAX_AGE_DAYS päivään. "clear" tyhjentää
+hakemiston. Tiedosto kirjoitetaan väliaikaiseen nimeen ja
+vaihdetaan paikalleen (os.replace), joten rinnakkaiset prosessit näkevät
+joko valmiin tiedoston tai eivät mitään.
+
+Tiedostomuoto (little-endian, versio 1):
+
+    otsake    48 tavua: taika b"2048TBLS", versio u32, taulukoita u32, tiiviste 32 tavua
+    hakemisto 40 tavua/taulukko: nimi 16 tavua, sanoja/arvo u8, laji u8
+              (0 = kokonaisluku, 1 = totuusarvo), 6 tavua täytettä, arvoja u64,
+              data-alkukohta u64
+    data      64 tavuun tasattuna; arvo on k 64-bittisen sanan mittainen,
+              ja sana j on erillisessä u64-taulukossa (sana 0 ensin)
+
+TableFile.view antaa mmapin päälle memoryview-näkymät ilman kopiointia.
+Kuumat skalaarihaut käyttävät listoja, koska CPythonissa listan indeksointi
+on noin kaksi kertaa nopeampi kuin memoryview'n (pienet int-oliot ovat
+valmiina), joten cached() muuntaa kuumiksi merkityt taulukot (hot)
+listoiksi kerran latauksessa (muutama millisekunti taulukkoa kohden).
+Muut yhden sanan taulukot annetaan memoryview-näkyminä, ja niiden
+tiedosto pysyy auki prosessin loppuun.
+
+Hakemisto: ympäristömuuttuja ALTE2048_CACHE_DIR, muuten
+$XDG_CACHE_HOME/alte2048 tai ~/.cache/alte2048. ALTE2048_NO_TABLE_CACHE=1
+poistaa välimuistin käytöstä. Jos hakemistoon ei voi kirjoittaa,
+taulukot rakennetaan muistiin kuten ennenkin.
+
+Käyttö:
+    python -m src.tablecache info
+    python -m src.tablecache clear
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import types
+from array import array
+from typing import Callable, Collection, Dict, List, Optional
+
+MAGIC = b"2048TBLS"
+VERSION = 1
+HEADER = struct.Struct("<8sII32s")
+ENTRY = struct.Struct("<16sBB6xQQ")
+ALIGN = 64
+WORD_MASK = (1 << 64) - 1
+MAX_AGE_DAYS = 30     # käyttämättömän toisen tiivisteen tiedoston ikä ennen poistoa
+_DAY = 24 * 60 * 60
+
+Tables = Dict[str, list]
+
+# Tiedostot, joiden memoryview-taulukoita on annettu käyttöön (auki loppuun asti).
+_open_files: List["TableFile"] = []
+
+
+def cache_dir() -> str:
+    """Välimuistihakemisto (ks. moduulin kuvaus)."""
+    path = os.environ.get("ALTE2048_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "alte2048")
+
+
+def _const_repr(c) -> str:
+    # Joukon repr riippuu merkkijonojen hajautuksesta (PYTHONHASHSEED).
+    if isinstance(c, frozenset):
+        return "frozenset(" + repr(sorted(map(_const_repr, c))) + ")"
+    return repr(c)
+
+
+def _hash_code(h, code: types.CodeType) -> None:
+    """Päivittää tiivisteen tavukoodilla, nimillä ja vakioilla (myös sisäkkäisillä)."""
+    h.update(len(code.co_code).to_bytes(4, "little") + code.co_code)
+    h.update(repr(code.co_names).encode())
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            _hash_code(h, c)
+        else:
+            h.update(_const_repr(c).encode())
+
+
+def code_digest(*parts) -> bytes:
+    """Tiiviste funktioiden koodista ja muista osista (repr).
+
+    Funktiosta otetaan vain käytös (tavukoodi, nimet, vakiot), ei
+    tiedostopolkua eikä rivinumeroita: sama koodi toisessa polussa tai
+    siirtyneillä riveillä antaa saman tiivisteen.
+    """
+    h = hashlib.sha256(f"{VERSION}|{sys.version}".encode())
+    for p in parts:
+        code = getattr(p, "__code__", None)
+        if code is not None:
+            _hash_code(h, code)
+        else:
+            h.update(repr(p).encode())
+    return h.digest()
+
+
+def save(path: str, digest: bytes, tables: Tables) -> None:
+    """Kirjoittaa taulukot tiedostoon atomisesti (väliaikainen nimi + os.replace)."""
+    entries = []
+    blobs = []
+    offset = HEADER.size + ENTRY.size * len(tables)
+    for name, values in tables.items():
+        kind = int(bool(values) and all(type(v) is bool for v in values))
+        if any(v < 0 for v in values):
+            raise ValueError(f"{name}: vain ei-negatiiviset arvot")
+        limbs = max(1, (max(values, default=0).bit_length() + 63) // 64)
+        for j in range(limbs):
+            words = array("Q", [(int(v) >> (64 * j)) & WORD_MASK for v in values])
+            if sys.byteorder == "big":  # pragma: no cover - muoto on little-endian
+                words.byteswap()
+            offset += -offset % ALIGN
+            blobs.append((offset, words.tobytes()))
+            if j == 0:
+                entries.append(ENTRY.pack(name.encode()[:16], limbs, kind, len(values), offset))
+            offset += len(values) * 8
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries), digest))
+            f.write(b"".join(entries))
+            for off, data in blobs:
+                f.write(b"\0" * (off - f.tell()))
+                f.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp luo tiedoston 0600-oikeuksin
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class TableFile:
+    """mmapilla avattu taulukkotiedosto; näkymät eivät kopioi dataa."""
+
+    def __init__(self, path: str, digest: Optional[bytes] = None) -> None:
+        """Raises: ValueError, jos tiedosto on vieras, eri versio tai eri tiiviste."""
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mm) < HEADER.size:
+                raise ValueError(f"{path}: ei taulukkotiedosto")
+            magic, version, count, stored = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: ei taulukkotiedosto")
+            if version != VERSION:
+                raise ValueError(f"{path}: tukematon versio {version}")
+            if digest is not None and stored != digest:
+                raise ValueError(f"{path}: tiiviste ei täsmää (koodi muuttunut)")
+            if HEADER.size + count * ENTRY.size > len(self._mm):
+                raise ValueError(f"{path}: katkennut tiedosto")
+            self.digest = stored
+            self._entries = {}
+            for i in range(count):
+                raw, limbs, kind, n, off = ENTRY.unpack_from(self._mm, HEADER.size + i * ENTRY.size)
+                if off + limbs * n * 8 > len(self._mm):
+                    raise ValueError(f"{path}: katkennut tiedosto")
+                self._entries[raw.rstrip(b"\0").decode()] = (limbs, kind, n, off)
+        except BaseException:
+            self._mm.close()
+            raise
+        self._views: List[memoryview] = []
+
+    def __enter__(self) -> "TableFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def view(self, name: str) -> List[memoryview]:
+        """Taulukon sanat u64-näkyminä (sana 0 ensin) suoraan mmapista."""
+        limbs, _kind, n, off = self._entries[name]
+        out = []
+        for j in range(limbs):
+            start = off + j * (n * 8 + (-(n * 8) % ALIGN))
+            out.append(memoryview(self._mm)[start:start + n * 8].cast("Q"))
+        self._views.extend(out)
+        return out
+
+    def list(self, name: str) -> list:
+        """Taulukko Python-listana (kuumia skalaarihakuja varten)."""
+        words = [v.tolist() for v in self.view(name)]
+        if len(words) == 1:
+            values = words[0]
+        elif len(words) == 2:
+            values = [a | b << 64 for a, b in zip(*words)]
+        elif len(words) == 3:  # heuristiikan pakatut rivit
+            values = [a | b << 64 | c << 128 for a, b, c in zip(*words)]
+        else:
+            values = words[0]
+            for j, more in enumerate(words[1:], 1):
+                values = [a | b << (64 * j) for a, b in zip(values, more)]
+        if self._entries[name][1] == 1:
+            values = [bool(v) for v in values]
+        return values
+
+    def close(self) -> None:
+        for v in self._views:
+            v.release()
+        self._views.clear()
+        self._mm.close()
+
+
+def _enabled() -> bool:
+    return os.environ.get("ALTE2048_NO_TABLE_CACHE", "") in ("", "0")
+
+
+def _load(path: str, digest: bytes, hot: Optional[Collection[str]]) -> Tables:
+    """Taulukot tiedostosta: kuumat listoina, muut memoryview-näkyminä."""
+    tf = TableFile(path, digest)
+    tables: Tables = {}
+    try:
+        for k in tf.names:
+            if hot is not None and k not in hot and tf._entries[k][0] == 1:
+                (tables[k],) = tf.view(k)
+            else:
+                tables[k] = tf.list(k)
+    except BaseException:
+        tf.close()
+        raise
+    if len(tables) > sum(type(v) is list for v in tables.values()):
+        _open_files.append(tf)
+    else:
+        tf.close()
+    return tables
+
+
+def _touch(path: str) -> None:
+    """Merkitsee tiedoston käytetyksi (mtime), enintään kerran vuorokaudessa."""
+    try:
+        if time.time() - os.path.getmtime(path) > _DAY:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+def _prune(name: str, keep: str) -> None:
+    """Poistaa saman nimen muut tiedostot, joita ei ole käytetty MAX_AGE_DAYS päivään."""
+    oldest = time.time() - MAX_AGE_DAYS * _DAY
+    for p in glob.glob(os.path.join(os.path.dirname(keep), f"{name}-{'?' * 16}.tbl")):
+        try:
+            if p != keep and os.path.getmtime(p) < oldest:
+                os.unlink(p)
+        except OSError:
+            pass  # toinen prosessi ehti ensin
+
+
+def cached(name: str, build: Callable[[], Tables], *parts,
+           hot: Optional[Collection[str]] = None) -> Tables:
+    """Lataa taulukot välimuistista tai rakentaa ja tallentaa ne.
+
+    Args:
+        name: Taulukkojoukon nimi (tiedoston nimen alku).
+        build: Rakentaa taulukot: {nimi: lista ei-negatiivisia kokonaislukuja}.
+        parts: Tiivisteeseen otettavat funktiot (tavukoodi) ja parametrit (repr).
+        hot: Listoiksi muunnettavat taulukot (None = kaikki); muut yhden
+            sanan taulukot ovat memoryview-näkymiä mmapin päälle.
+    """
+    if not _enabled():
+        return build()
+    digest = code_digest(name, *parts)
+    path = os.path.join(cache_dir(), f"{name}-{digest.hex()[:16]}.tbl")
+    try:
+        tables = _load(path, digest, hot)
+    except (OSError, ValueError):
+        pass
+    else:
+        _touch(path)
+        return tables
+    tables = build()
+    try:
+        save(path, digest, tables)
+    except OSError:
+        return tables  # vain luku -hakemisto tms.: taulukot ovat silti muistissa
+    _prune(name, path)
+    try:
+        return _load(path, digest, hot)  # samat tyypit kuin seuraavilla kerroilla
+    except (OSError, ValueError):
+        return tables
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Taulukkovälimuistin hallinta.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("info", help="näytä välimuistin tiedostot")
+    sub.add_parser("clear", help="poista välimuistin tiedostot")
+    args = ap.parse_args(argv)
+    paths = sorted(glob.glob(os.path.join(cache_dir(), "*.tbl")))
+    if args.cmd == "clear":
+        for p in paths:
+            os.unlink(p)
+        print(f"poistettu {len(paths)} tiedostoa ({cache_dir()})")
+        return
+    print(cache_dir())
+    for p in paths:
+        with TableFile(p) as tf:
+            sizes = ", ".join(tf.names)
+        print(f"  {os.path.basename(p)}  {os.path.getsize(p) / 1e6:.1f} MB  [{sizes}]")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
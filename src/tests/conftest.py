@@ -0,0 +1,22 @@
+"""Yhteiset pytest-asetukset.
+
+Taulukkovälimuisti (tablecache.py) ohjataan väliaikaiseen hakemistoon
+ennen kuin yksikään testi tuo moduuleja, joten testit eivät kirjoita
+käyttäjän välimuistiin eivätkä poista sieltä mitään. Aliprosessit perivät
+ympäristömuuttujan.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_CACHE_DIR = tempfile.mkdtemp(prefix="alte2048-testit-")
+os.environ["ALTE2048_CACHE_DIR"] = _CACHE_DIR
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _table_cache_dir():
+    yield _CACHE_DIR
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
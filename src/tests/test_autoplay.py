@@ -2,6 +2,9 @@
 
 from unittest.mock import patch, call
 import src.autoplay as autoplay
+from src.gamerecord import read_games
+from src.board import GameState
+from src.parallel import shutdown_pool
 
 
 class FakeState:
@@ -109,9 +112,165 @@ def test_call_order_expecti(new_game, best_move_expecti, render, print_ai, print
 @patch.object(autoplay, "run")
 def test_cli_main_invokes_run_with_args(run_mock):
     autoplay.main(["--depth", "5"])
-    run_mock.assert_called_once_with(depth=5)
+    run_mock.assert_called_once_with(depth=5, backend="grid", tt_stats=False,
+                                     time_ms=None, max_nodes=None, workers=None,
+                                     search_stats=False, engine="expecti",
+                                     rollouts=None, size=4, record=None)
 
 @patch.object(autoplay, "run")
 def test_cli_main_defaults_to_expecti(run_mock):
     autoplay.main([])
-    run_mock.assert_called_once_with(depth=4)
+    run_mock.assert_called_once_with(depth=4, backend="grid", tt_stats=False,
+                                     time_ms=None, max_nodes=None, workers=None,
+                                     search_stats=False, engine="expecti",
+                                     rollouts=None, size=4, record=None)
+
+@patch.object(autoplay, "run")
+def test_cli_main_passes_board_size(run_mock):
+    autoplay.main(["--size", "5"])
+    assert run_mock.call_args.kwargs["size"] == 5
+
+@patch.object(autoplay, "run")
+def test_cli_main_passes_backend(run_mock):
+    autoplay.main(["--backend", "bitboard"])
+    run_mock.assert_called_once_with(depth=4, backend="bitboard", tt_stats=False,
+                                     time_ms=None, max_nodes=None, workers=None,
+                                     search_stats=False, engine="expecti",
+                                     rollouts=None, size=4, record=None)
+
+
+@patch.object(autoplay, "print_tt_stats")
+@patch.object(autoplay, "print_final")
+@patch.object(autoplay, "print_ai_move")
+@patch.object(autoplay, "render")
+@patch.object(autoplay, "best_move_expecti")
+@patch.object(autoplay, "new_game")
+def test_run_prints_tt_stats_per_move(new_game, best_move_expecti, render, print_ai, print_final,
+                                      print_tt):
+    new_game.return_value = FakeState(2)
+    best_move_expecti.return_value = ("left", 0.0)
+
+    autoplay.run(depth=3, tt_stats=True)
+
+    assert print_tt.call_count == 2
+    print_tt.assert_called_with(autoplay.cache)
+
+
+@patch.object(autoplay, "print_final")
+@patch.object(autoplay, "print_ai_move")
+@patch.object(autoplay, "render")
+@patch.object(autoplay, "best_move_iterative")
+@patch.object(autoplay, "best_move_expecti")
+@patch.object(autoplay, "new_game")
+def test_run_uses_iterative_search_with_budget(new_game, best_move_expecti, best_move_iterative,
+                                               render, print_ai, print_final):
+    s = FakeState(1)
+    new_game.return_value = s
+    best_move_iterative.return_value = ("down", 0.0)
+
+    autoplay.run(time_ms=50)
+
+    best_move_expecti.assert_not_called()
+    best_move_iterative.assert_called_once_with(s, time_ms=50, max_nodes=None)
+    print_ai.assert_called_once_with(1, "down")
+
+@patch.object(autoplay, "run")
+def test_cli_main_passes_budget(run_mock):
+    autoplay.main(["--time-ms", "25", "--max-nodes", "1000"])
+    run_mock.assert_called_once_with(depth=4, backend="grid", tt_stats=False,
+                                     time_ms=25.0, max_nodes=1000, workers=None,
+                                     search_stats=False, engine="expecti",
+                                     rollouts=None, size=4, record=None)
+
+
+@patch.object(autoplay, "print_final")
+@patch.object(autoplay, "print_ai_move")
+@patch.object(autoplay, "render")
+@patch.object(autoplay, "best_move_parallel")
+@patch.object(autoplay, "best_move_expecti")
+@patch.object(autoplay, "new_game")
+def test_run_uses_parallel_search_with_workers(new_game, best_move_expecti, best_move_parallel,
+                                               render, print_ai, print_final):
+    s = FakeState(1)
+    new_game.return_value = s
+    best_move_parallel.return_value = ("right", 0.0)
+
+    autoplay.run(depth=5, workers=4)
+
+    best_move_expecti.assert_not_called()
+    best_move_parallel.assert_called_once_with(s, depth=5, workers=4)
+
+
+@patch.object(autoplay, "print_search_stats")
+@patch.object(autoplay, "print_final")
+@patch.object(autoplay, "print_ai_move")
+@patch.object(autoplay, "render")
+@patch.object(autoplay, "best_move_expecti")
+@patch.object(autoplay, "new_game")
+def test_run_prints_search_stats_per_move(new_game, best_move_expecti, render, print_ai,
+                                          print_final, print_stats):
+    s = FakeState(2)
+    new_game.return_value = s
+    best_move_expecti.return_value = ("left", 0.0, "stats")
+
+    autoplay.run(depth=3, search_stats=True, engine="expecti",
+                                     rollouts=None, size=4, record=None)
+
+    best_move_expecti.assert_called_with(s, depth=3, stats=True)
+    assert print_stats.mock_calls == [call("stats"), call("stats")]
+
+@patch.object(autoplay, "run")
+def test_cli_main_passes_search_stats(run_mock):
+    autoplay.main(["--search-stats"])
+    run_mock.assert_called_once_with(depth=4, backend="grid", tt_stats=False,
+                                     time_ms=None, max_nodes=None, workers=None,
+                                     search_stats=True, engine="expecti",
+                                     rollouts=None, size=4, record=None)
+
+
+@patch.object(autoplay, "print_final")
+@patch.object(autoplay, "print_ai_move")
+@patch.object(autoplay, "render")
+@patch.object(autoplay, "best_move_montecarlo")
+@patch.object(autoplay, "best_move_expecti")
+@patch.object(autoplay, "new_game")
+def test_run_uses_montecarlo_engine(new_game, best_move_expecti, best_move_montecarlo,
+                                    render, print_ai, print_final):
+    s = FakeState(1)
+    new_game.return_value = s
+    best_move_montecarlo.return_value = ("up", 0.0)
+
+    autoplay.run(engine="mc", rollouts=50, workers=2)
+
+    best_move_expecti.assert_not_called()
+    best_move_montecarlo.assert_called_once_with(s, rollouts=50, time_ms=None, workers=2)
+    print_ai.assert_called_once_with(1, "up")
+
+@patch.object(autoplay, "run")
+def test_cli_main_passes_engine(run_mock):
+    autoplay.main(["--engine", "mc", "--rollouts", "30", "--time-ms", "100"])
+    run_mock.assert_called_once_with(depth=4, backend="grid", tt_stats=False,
+                                     time_ms=100.0, max_nodes=None, workers=None,
+                                     search_stats=False, engine="mc", rollouts=30,
+                                     size=4, record=None)
+
+
+def test_run_with_workers_on_5x5_board(capsys):
+    # Eri laatat ja yksi tyhjä kulma: peli loppuu ensimmäiseen siirtoon.
+    grid = [[8 << (5 * r + c) for c in range(5)] for r in range(5)]
+    grid[4][4] = 0
+    try:
+        with patch("src.autoplay.new_game", return_value=GameState(grid)):
+            autoplay.run(depth=2, size=5, workers=2)
+    finally:
+        shutdown_pool()
+    assert "LOPPU" in capsys.readouterr().out
+
+
+def test_run_records_game(tmp_path, capsys):
+    path = str(tmp_path / "peli.rec")
+    autoplay.run(depth=1, size=3, record=path)
+    (g,) = read_games(path)
+    final = g.final()
+    assert g.size == 3 and g.complete and len(g) > 0
+    assert f"{final.score}" in capsys.readouterr().out
@@ -0,0 +1,65 @@
+"""Mikrobenchmarkien regressiovahdin pytest-testit."""
+
+from benchmarks import kernels
+from benchmarks.corpus import CORPUS, PHASES, all_positions
+from src.bitboard import encode
+
+
+def test_corpus_positions_are_valid_boards():
+    assert PHASES == ("early", "mid", "late")
+    for g in all_positions():
+        assert len(g) == 4 and all(len(r) == 4 for r in g)
+        encode(g)  # ValueError, jos laattaa ei voi esittää
+
+
+def test_all_positions_returns_copies():
+    all_positions()[0][0][0] = 999
+    assert CORPUS["early"][0][0][0] != 999
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {"a": {"ops_per_sec": 100.0}, "b": {"ops_per_sec": 100.0},
+                "c": {"ops_per_sec": 100.0}}
+    results = {"a": {"ops_per_sec": 80.0}, "b": {"ops_per_sec": 60.0},
+               "c": {"ops_per_sec": 150.0}, "new": {"ops_per_sec": 1.0}}
+    assert kernels.compare(results, baseline, threshold=0.3) == [("b", 100.0, 60.0)]
+
+
+def test_measure_reports_nodes_for_search():
+    r = kernels.measure(kernels.kernels((1,))["search.bitboard.d1.mid"], repeat=1, min_time=0.0)
+    assert r["ops_per_sec"] > 0
+    assert r["nodes"] > 0 and r["nodes_per_sec"] > 0
+
+
+def test_board_size_benchmark_measures_each_size():
+    from benchmarks import board_size
+    for n in (3, 5):
+        positions = board_size.sample_positions(n, 2, every=3)
+        assert all(p.size == n for p in positions)
+        r = board_size.measure(positions, depth=1)
+        assert r["ms"] > 0 and r["nodes"] > 0 and r["evals"] > 0
+
+
+def test_shared_table_benchmark_workers_share_entries():
+    from benchmarks import shared_table
+    private = shared_table._run(shared_table._ops_worker, 2, False, 1024, 2000, 100)
+    shared = shared_table._run(shared_table._ops_worker, 2, True, 1024, 2000, 100)
+    assert sum(r[2] for r in private) == 200     # kumpikin huti jokaisen avaimen kerran
+    assert sum(r[2] for r in shared) < 200
+
+
+def test_server_load_percentiles_and_run(tmp_path):
+    import threading
+    from benchmarks import server_load
+    from src.server import MoveServer
+    assert server_load.percentile([5, 1, 3, 2, 4], 50) == 3
+    assert server_load.percentile(list(range(1, 101)), 99) == 99
+    path = str(tmp_path / "s.sock")
+    srv = MoveServer(path)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        r = server_load.run_load(path, 20, pipeline=4, depth=1)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert 0 < r["p50"] <= r["p99"] <= r["max"] and r["rps"] > 0
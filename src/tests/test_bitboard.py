@@ -0,0 +1,174 @@
+"""Bittilautamoduulin pytest-testit."""
+
+import random
+
+import pytest
+import src.bitboard as bb
+import src.board as board
+import src.expectiminimax as ex
+from src.grid_ops import MOVE_FUN
+
+
+# ---------- apu ----------
+
+def G(rows):
+    """Pieni apu luettavuuteen: rakentaa ruudukon riveistä."""
+    return [row[:] for row in rows]
+
+def random_grid(rng):
+    return [[rng.choice([0, 0, 0, 2, 2, 4, 8, 16, 32]) for _ in range(4)] for _ in range(4)]
+
+
+# ---------- encode / decode / transpose ----------
+
+def test_encode_decode_roundtrip_and_layout():
+    g = G([[2, 0, 0, 4],
+           [0, 0, 0, 0],
+           [0, 0, 0, 0],
+           [32768, 0, 0, 8]])
+    b = bb.encode(g)
+    assert bb.decode(b) == g
+    # solu (0,0) on alimmassa nibblessä, rivi 3 ylimmässä 16 bitissä
+    assert b & 0xF == 1
+    assert (b >> 12) & 0xF == 2
+    assert (b >> 48) & 0xF == 15
+
+def test_encode_rejects_unrepresentable_tiles():
+    with pytest.raises(ValueError):
+        bb.encode(G([[3, 0, 0, 0]] + [[0] * 4 for _ in range(3)]))
+    with pytest.raises(ValueError):
+        bb.encode(G([[65536, 0, 0, 0]] + [[0] * 4 for _ in range(3)]))
+
+def test_transpose_matches_grid_transpose():
+    rng = random.Random(1)
+    for _ in range(50):
+        g = random_grid(rng)
+        assert bb.decode(bb.transpose(bb.encode(g))) == board.transpose(g)
+
+
+# ---------- siirrot ----------
+
+def test_moves_match_grid_ops_on_random_boards():
+    rng = random.Random(2)
+    for _ in range(300):
+        g = random_grid(rng)
+        b = bb.encode(g)
+        for d, f in MOVE_FUN.items():
+            ng, gain = f(g)
+            nb, bgain = bb.MOVE_FUN[d](b)
+            assert bb.decode(nb) == ng
+            assert bgain == gain
+
+def test_max_tiles_do_not_merge():
+    b = bb.encode(G([[32768, 32768, 0, 0]] + [[0] * 4 for _ in range(3)]))
+    nb, gain = bb.move_left(b)
+    assert nb == b and gain == 0
+
+
+# ---------- kyselyt ----------
+
+def test_count_empty_and_empty_shifts():
+    g = G([[0, 2, 0, 4],
+           [8, 0, 16, 0],
+           [0, 0, 0, 0],
+           [2, 4, 8, 16]])
+    b = bb.encode(g)
+    assert bb.count_empty(b) == 8
+    assert bb.empty_shifts(b) == [0, 8, 20, 28, 32, 36, 40, 44]
+
+def test_max_exponent():
+    assert bb.max_exponent(0) == 0
+    assert bb.max_exponent(bb.encode(G([[0, 0, 0, 0],
+                                        [0, 0, 2048, 0],
+                                        [4, 0, 0, 0],
+                                        [0, 0, 0, 2]]))) == 11
+
+def test_is_game_over():
+    full = G([[2, 4, 2, 4],
+              [4, 2, 4, 2],
+              [2, 4, 2, 4],
+              [4, 2, 4, 2]])
+    assert bb.is_game_over(bb.encode(full)) is True
+    full[3][3] = 4  # pystysuora pari (2,3)-(3,3)
+    assert bb.is_game_over(bb.encode(full)) is False
+    full[3][3] = 0
+    assert bb.is_game_over(bb.encode(full)) is False
+
+
+# ---------- symmetriat ----------
+
+def test_symmetries_form_the_dihedral_group():
+    g = G([[2, 4, 8, 16],
+           [0, 0, 0, 32],
+           [0, 0, 0, 0],
+           [0, 0, 0, 0]])  # epäsymmetrinen lauta -> 8 eri kuvaa
+    b = bb.encode(g)
+    images = {bb.apply_symmetry(b, i) for i in range(len(bb.SYMMETRIES))}
+    assert len(images) == 8
+    assert bb.canonical(b) == min(images)
+    cb, i = bb.canonical_symmetry(b)
+    assert cb == bb.canonical(b) and bb.apply_symmetry(b, i) == cb
+
+def test_map_move_commutes_with_symmetry():
+    rng = random.Random(3)
+    for _ in range(30):
+        b = bb.encode(random_grid(rng))
+        for i in range(len(bb.SYMMETRIES)):
+            sb = bb.apply_symmetry(b, i)
+            for d, f in bb.MOVE_FUN.items():
+                md = bb.map_move(d, i)
+                assert bb.apply_symmetry(f(b)[0], i) == bb.MOVE_FUN[md](sb)[0]
+                assert bb.unmap_move(md, i) == d
+
+
+# ---------- GameState ja haku bittilaudalla ----------
+
+def test_gamestate_bitboard_backend_matches_grid_backend():
+    base = G([[0, 2, 2, 0],
+              [0, 0, 4, 4],
+              [2, 0, 0, 2],
+              [0, 0, 0, 0]])
+    for d in ("left", "right", "up", "down"):
+        s1 = board.GameState(G(base))
+        s2 = board.GameState(G(base), backend="bitboard")
+        assert s1.apply_move(d) == s2.apply_move(d)
+        assert s1.grid == s2.grid and s1.score == s2.score
+    assert board.GameState(G(base), backend="bitboard").copy().backend == "bitboard"
+
+def test_bitboard_search_matches_grid_search():
+    rng = random.Random(5)
+    for _ in range(4):
+        g = random_grid(rng)
+        s = board.GameState(G(g), score=100)
+        ex.cache.clear()
+        d1, v1 = ex.best_move_expecti(s, depth=2, backend="grid")
+        d2, v2 = ex.best_move_expecti(s, depth=2, backend="bitboard")
+        assert d1 == d2
+        assert v1 == pytest.approx(v2)
+
+def test_bitboard_search_follows_state_backend():
+    s = board.GameState(G([[2, 2, 4, 4],
+                           [0, 0, 0, 0],
+                           [0, 0, 0, 0],
+                           [0, 0, 0, 0]]), backend="bitboard")
+    ex.cache.clear()
+    d, val = ex.best_move_expecti(s, depth=2)
+    assert d in ("left", "right")
+    # bittilautahaku tallentaa kokonaislukuavaimia välimuistiin
+    assert len(ex.cache) > 0
+    assert all(isinstance(k, int) for k in ex.cache)
+
+def test_symmetric_search_maps_moves_back_to_real_orientation():
+    g = G([[2, 4, 0, 0],
+           [0, 8, 0, 0],
+           [2, 0, 0, 0],
+           [0, 0, 16, 0]])
+    b = bb.encode(g)
+    ex.cache.clear()
+    d0, v0 = ex.best_move_expecti(board.GameState(g), depth=3, backend="bitboard", symmetry=True)
+    for i in range(len(bb.SYMMETRIES)):
+        # jaettu välimuisti: kierretyt asemat osuvat samoihin kanonisiin avaimiin
+        s = board.GameState(bb.decode(bb.apply_symmetry(b, i)))
+        d, v = ex.best_move_expecti(s, depth=3, backend="bitboard", symmetry=True)
+        assert d == bb.map_move(d0, i)
+        assert v == pytest.approx(v0)
@@ -196,6 +196,79 @@ def test_spawn_tile_noop_when_no_empty_cells():
     assert s.grid == before
 
 
+# ---------- SearchState ----------
+
+def test_search_state_make_move_matches_game_state_and_unmakes():
+    import random
+    rng = random.Random(5)
+    for _ in range(300):
+        g = [[rng.choice([0, 0, 2, 2, 4, 8, 16]) for _ in range(4)] for _ in range(4)]
+        ss = board.SearchState(g, score=10)
+        for d in ("left", "right", "up", "down"):
+            ref = board.GameState(make_grid(g), score=10)
+            changed = ref.apply_move(d)
+            assert ss.make_move(d) == changed
+            assert ss.grid == ref.grid and ss.score == ref.score
+            if changed:
+                assert ss.empties == sum(r.count(0) for r in ref.grid)
+                assert ss.max_tile == max(map(max, ref.grid))
+                ss.unmake_move()
+            assert ss.grid == g and ss.score == 10
+            assert ss.empties == sum(r.count(0) for r in g)
+            assert ss.max_tile == max(map(max, g))
+
+def test_search_state_place_and_remove_tile_nest_with_moves():
+    ss = board.SearchState([[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+    rows = ss.grid
+    assert ss.make_move("left") and ss.grid[0] == [4, 0, 0, 0]
+    ss.place_tile(3, 3, 8)
+    assert (ss.empties, ss.max_tile) == (14, 8)
+    assert ss.make_move("up")
+    ss.unmake_move()
+    ss.remove_tile(3, 3)
+    assert (ss.empties, ss.max_tile) == (15, 4)
+    ss.unmake_move()
+    assert ss.grid == [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    assert ss.grid is rows and ss.grid[0] is rows[0]  # muutokset paikallaan
+
+def test_search_state_unchanged_move_pushes_nothing():
+    g = [[2, 4, 8, 16], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    ss = board.SearchState(g)
+    assert not ss.make_move("left")
+    assert ss._undo == [] and ss.grid == g
+    assert not hasattr(ss, "__dict__")
+
+
+# ---------- NxN-laudat ----------
+
+def test_new_game_with_size_and_moves_on_5x5():
+    from src.grid_ops import MOVE_FUN
+    s = board.new_game(size=5)
+    assert s.size == 5 and all(len(r) == 5 for r in s.grid)
+    assert sum(v != 0 for r in s.grid for v in r) == 2
+    g = [[2, 2, 4, 0, 4], [0, 0, 0, 0, 0], [8, 0, 8, 0, 16], [0, 0, 0, 0, 0], [2, 0, 0, 0, 2]]
+    for d in ("left", "right", "up", "down"):
+        ref, gain = MOVE_FUN[d](g)
+        gs = board.GameState(make_grid(g))
+        assert gs.apply_move(d) and gs.grid == ref and gs.score == gain
+        ss = board.SearchState(g)
+        assert ss.make_move(d) and ss.grid == ref and ss.empties == sum(r.count(0) for r in ref)
+        ss.unmake_move()
+        assert ss.grid == g
+    gs = board.GameState(make_grid(g))
+    gs.apply_move("left")
+    assert gs.grid[0] == [4, 8, 0, 0, 0] and gs.grid[2] == [16, 16, 0, 0, 0] and gs.score == 32
+
+def test_board_size_validation_and_3x3_game_over():
+    import pytest
+    with pytest.raises(ValueError):
+        board.new_game(backend="bitboard", size=5)
+    with pytest.raises(ValueError):
+        board.new_game(size=1)
+    full = board.GameState([[2, 4, 2], [4, 2, 4], [2, 4, 2]])
+    assert full.is_game_over() and full.empty_cells() == []
+
+
 # ---------- new_game ----------
 
 @patch("src.board.random.choice")
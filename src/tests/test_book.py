@@ -0,0 +1,109 @@
+"""Avauskirjan (book.py) pytest-testit."""
+
+import random
+import struct
+import pytest
+import src.book as book
+import src.expectiminimax as ex
+from src import bitboard
+from src.board import GameState
+
+G1 = [[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 4], [0, 0, 0, 0]]
+G2 = [[8, 4, 2, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "kirja.bin")
+
+
+@pytest.fixture(autouse=True)
+def _no_book():
+    yield
+    ex.set_book(None)
+
+
+def test_write_and_read_round_trip(path):
+    b1, b2 = bitboard.encode(G1), bitboard.encode(G2)
+    assert book.write_book(path, [(b1, "up", 12.5, 4), (b2, "left", -3.0, 5)]) == 2
+    with book.PositionBook(path) as bk:
+        assert len(bk) == 2 and bk.slots >= 4
+        assert bk.get(b1) == ("up", 12.5, 4)
+        assert bk.get(b2) == ("left", -3.0, 5)
+        assert bk.get(bitboard.encode(G1) | 1 << 20) is None
+        assert b1 in bk
+
+
+def test_lookup_maps_move_through_symmetries(path):
+    b = bitboard.encode(G2)
+    book.write_book(path, [(b, "left", 1.0, 3)])
+    with book.PositionBook(path) as bk:
+        for i in range(len(bitboard.SYMMETRIES)):
+            move, _v, _d = bk.get(bitboard.apply_symmetry(b, i))
+            assert move == bitboard.map_move("left", i)
+
+
+def test_deepest_duplicate_wins(path):
+    b = bitboard.encode(G2)
+    book.write_book(path, [(b, "left", 1.0, 5), (bitboard.flip_v(b), "up", 2.0, 3)])
+    with book.PositionBook(path) as bk:
+        assert len(bk) == 1
+        assert bk.get(b) == ("left", 1.0, 5)
+
+
+def test_many_positions_all_found(path):
+    rng = random.Random(0)
+    boards = {bitboard.canonical(rng.getrandbits(64) | 1) for _ in range(3000)}
+    book.write_book(path, [(b, "down", float(i), 2) for i, b in enumerate(sorted(boards))])
+    with book.PositionBook(path) as bk:
+        assert len(bk) == len(boards)
+        assert all(bk.get(b) is not None for b in boards)
+
+
+def test_rejects_foreign_or_corrupt_file(path):
+    with open(path, "wb") as f:
+        f.write(b"x" * 64)
+    with pytest.raises(ValueError):
+        book.PositionBook(path)
+    book.write_book(path, [(bitboard.encode(G1), "up", 0.0, 1)])
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack("<I", 99))
+    with pytest.raises(ValueError):
+        book.PositionBook(path)
+
+
+def test_best_move_expecti_uses_book_when_deep_enough(path):
+    s = GameState(grid=[r[:] for r in G2], score=100)
+    book.write_book(path, [(bitboard.encode(G2), "down", 7.0, 4)])
+    ex.set_book(path)
+    assert ex.best_move_expecti(s, depth=4) == ("down", 107.0)
+    assert ex.best_move_expecti(s, depth=3) == ("down", 107.0)
+    searched = ex.best_move_expecti(s, depth=5)  # kirjan syvyys ei riitä
+    assert searched != ("down", 107.0)
+    assert ex.best_move_expecti(s, depth=4, use_book=False) != ("down", 107.0)
+
+
+def test_book_hit_stats_do_not_report_previous_search(path):
+    s = GameState(grid=[r[:] for r in G2], score=100)
+    ex.best_move_expecti(GameState(grid=[r[:] for r in G1]), depth=3)
+    assert ex.cache.hits + ex.cache.misses > 0
+    book.write_book(path, [(bitboard.encode(G2), "down", 7.0, 4)])
+    ex.set_book(path)
+    d, v, st = ex.best_move_expecti(s, depth=4, stats=True)
+    assert (d, v) == ("down", 107.0)
+    assert st.book_hit and (st.tt_hits, st.tt_misses, st.total_nodes) == (0, 0, 0)
+    _d, _v, st = ex.best_move_expecti(s, depth=5, stats=True)
+    assert not st.book_hit and st.tt_hits + st.tt_misses > 0
+
+
+def test_build_book_contains_searched_opening_positions(path):
+    n = book.build_book(path, games=2, plies=4, depth=2)
+    assert n > 0
+    with book.PositionBook(path) as bk:
+        assert len(bk) == n
+        random.seed(0)
+        from src.board import new_game
+        s = new_game(backend="bitboard")
+        move, _v, depth = bk.get(bitboard.encode(s.grid))
+        assert depth == 2 and move in book.MOVE_ORDER
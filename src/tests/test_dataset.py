@@ -0,0 +1,107 @@
+"""Opetusdatan (dataset.py) pytest-testit."""
+
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import src.expectiminimax as ex
+from src import bitboard
+from src.board import new_game
+from src.dataset import (ROW, Dataset, ShardWriter, export_records, export_selfplay,
+                         exponents, game_rows, main, selfplay_rows)
+from src.gamerecord import MOVE_ORDER, GameRecordWriter
+
+
+def test_selfplay_rows_describe_the_game():
+    rows = selfplay_rows(3, depth=1)
+    assert rows.dtype == ROW and ROW.itemsize == 19
+    assert rows["moves_left"].tolist() == list(range(len(rows), 0, -1))
+    assert len(set(rows["final_score"].tolist())) == 1
+    # Siirto ja yksi syntynyt laatta (yksi solu) johtavat seuraavan rivin lautaan.
+    for a, b, m in zip(rows["board"][:-1], rows["board"][1:], rows["move"][:-1]):
+        diff = int(b) ^ bitboard.MOVE_FUN[MOVE_ORDER[m]](int(a))[0]
+        k = (diff.bit_length() - 1) // 4 * 4
+        assert diff >> k in (1, 2)
+
+
+def test_shard_writer_rotates_and_files_load_with_numpy(tmp_path):
+    rows = game_rows([1, 2, 3, 4, 5], [0, 1, 2, 3, 0], [1.0] * 5, 100)
+    with ShardWriter(str(tmp_path), rows_per_shard=3) as w:
+        w.add_game(rows)
+        # Otsake on ajan tasalla jo ennen sulkemista.
+        assert np.load(w.paths[-1]).tolist() == rows[3:].tolist()
+        w.add_game(rows[:2])
+    assert [len(np.load(p)) for p in w.paths] == [3, 3, 1]
+    data = Dataset(str(tmp_path))
+    assert len(data) == 7
+    assert data[4]["board"] == 5 and data[-1]["board"] == 2
+    assert data[[0, 6, 3]]["board"].tolist() == [1, 2, 4]
+    with pytest.raises(IndexError):
+        data[7]
+
+
+def test_shard_writer_does_not_overwrite_existing_shards(tmp_path):
+    rows = game_rows([1, 2, 3], [0, 1, 2], [1.0] * 3, 100)
+    with ShardWriter(str(tmp_path)) as w:
+        w.add_game(rows)
+    with ShardWriter(str(tmp_path)) as w2:
+        w2.add_game(rows[:1])
+    assert w2.paths[0] != w.paths[0]
+    assert np.load(w.paths[0]).tolist() == rows.tolist()
+    assert len(Dataset(str(tmp_path))) == 4
+
+
+def test_parallel_export_matches_serial(tmp_path):
+    serial = list(export_selfplay(str(tmp_path / "a"), 3, depth=1, workers=1, seed=7))
+    parallel = list(export_selfplay(str(tmp_path / "b"), 3, depth=1, workers=2, seed=7))
+    assert sorted(serial) == sorted(parallel)
+    a, b = Dataset(str(tmp_path / "a")), Dataset(str(tmp_path / "b"))
+    assert sorted(a[np.arange(len(a))].tolist()) == sorted(b[np.arange(len(b))].tolist())
+
+
+def test_export_from_game_records(tmp_path):
+    path = str(tmp_path / "pelit.rec")
+    random.seed(5)
+    s = new_game()
+    boards, moves = [], []
+    with GameRecordWriter(path) as w:
+        w.begin_game(5, s.grid)
+        for _ in range(30):
+            d, _ = ex.best_move_expecti(s, depth=1)
+            before = [r[:] for r in s.grid]
+            boards.append(bitboard.encode(before))
+            if not s.move(d):
+                boards.pop()
+                break
+            moves.append(MOVE_ORDER.index(d))
+            w.add_move(before, d, s.grid)
+    # 3x3-peliä ei voi esittää bittilautana: se ohitetaan.
+    random.seed(6)
+    small = new_game(size=3)
+    with GameRecordWriter(path) as w:
+        w.begin_game(6, small.grid)
+        before = [r[:] for r in small.grid]
+        d = next(d for d in MOVE_ORDER if small.copy().apply_move(d))
+        small.move(d)
+        w.add_move(before, d, small.grid)
+        w.end_game()
+    assert list(export_records(str(tmp_path / "data"), [path], depth=1)) == [len(boards)]
+    data = Dataset(str(tmp_path / "data"))
+    rows = data[np.arange(len(data))]
+    assert rows["board"].tolist() == boards and rows["move"].tolist() == moves
+    assert set(rows["final_score"].tolist()) == {s.score}
+
+
+def test_exponents_unpack_boards():
+    grid = [[2, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 128]]
+    e = exponents([bitboard.encode(grid)])
+    assert e.shape == (1, 4, 4)
+    assert e[0].tolist() == [[(v.bit_length() - 1) if v else 0 for v in r] for r in grid]
+
+
+def test_cli_selfplay_and_info(tmp_path, capsys):
+    main(["selfplay", "--out", str(tmp_path), "--games", "1", "--depth", "1"])
+    main(["info", str(tmp_path)])
+    out = capsys.readouterr().out
+    assert "1 peliä" in out and "1 osaa" in out
@@ -3,6 +3,7 @@
 from unittest.mock import patch
 import pytest
 import src.expectiminimax as ex
+from src.board import GameState
 
 
 # ---------- yleis-fixture ----------
@@ -43,10 +44,10 @@ class FakeState:
 
 def test_make_key_is_deterministic():
     g = [[0, 2], [4, 0]]
-    t = ex.make_key(g, 3, "chance")
+    t = ex.make_key(g, "chance")
     assert isinstance(t, tuple)
-    # tuple(grid), depth, node-tyyppi
-    assert t[1] == 3 and t[2] == "chance"
+    # tuple(grid), node-tyyppi (syvyys tallennetaan merkintään)
+    assert t[1] == "chance"
     # muutokset gridiin eivät muuta avainta retroaktiivisesti
     g[0][0] = 99
     assert t[0][0][0] == 0
@@ -69,6 +70,15 @@ def test_dynamic_depth_rules():
     assert ex.dynamic_depth(4, 4, largest=2048) >= 5
 
 
+def test_canonical_grid_key_is_shared_by_all_symmetries():
+    t = ((2, 4, 0, 0), (0, 0, 0, 0), (0, 0, 0, 8), (0, 0, 0, 0))
+    mirrored = tuple(r[::-1] for r in t)
+    rotated = tuple(zip(*t[::-1]))
+    key = ex.canonical_grid_key(t)
+    assert key == ex.canonical_grid_key(mirrored) == ex.canonical_grid_key(rotated)
+    assert key <= t and key <= mirrored and key <= rotated
+
+
 # ---------- best_move_expecti ----------
 
 @patch.object(ex, "exp_value")
@@ -177,6 +187,26 @@ def test_exp_value_with_no_empties_returns_leaf_and_caches(leaf_value):
     assert v1 == 7.0 and v2 == 7.0
     leaf_value.assert_called_once()  # toinen kerta tuli välimuistista
 
+@patch.object(ex, "max_value", return_value=2.0)
+def test_exp_value_cache_is_score_relative_and_depth_aware(max_value):
+    # sama asema eri pisteillä jakaa merkinnän; arvo siirtyy pisteiden mukana
+    s = FakeState([[0]*4 for _ in range(4)], empties=[(0, 0)], score=0)
+    assert ex.exp_value(s, d=3) == 2.0
+    rich = FakeState([[0]*4 for _ in range(4)], empties=[(0, 0)], score=100)
+    assert ex.exp_value(rich, d=3) == 102.0
+    # syvempi tulos kelpaa matalampaan kyselyyn, matalampi ei syvempään
+    assert ex.exp_value(s, d=2) == 2.0
+    assert max_value.call_count == 2
+    ex.exp_value(s, d=4)
+    assert max_value.call_count == 4
+
+@patch.object(ex, "exp_value", return_value=1.0)
+def test_best_move_expecti_keeps_cache_between_moves(exp_value):
+    s = FakeState([[0, 2, 0, 0]] + [[0]*4 for _ in range(3)])
+    ex.cache.put(ex.make_key(s.grid, "max"), 5, 3.0)
+    ex.best_move_expecti(s, depth=2)
+    assert ex.make_key(s.grid, "max") in ex.cache
+
 
 # ---------- max_value (MAX-solmu) ----------
 
@@ -223,3 +253,294 @@ def test_max_value_cache_hits(exp_value, leaf_value):
     v2 = ex.max_value(s, d=3)
     assert v1 == v2 == 5.0
     exp_value.assert_called_once()
+
+
+# ---------- best_move_iterative ----------
+
+def _midgame_state():
+    # 5 tyhjää ja pieni maksimi -> dynamic_depth(d) == d
+    import src.board as board
+    return board.GameState([[2, 4, 8, 16],
+                            [4, 8, 16, 2],
+                            [0, 2, 4, 0],
+                            [0, 0, 2, 0]], score=50)
+
+def test_iterative_matches_fixed_depth_search():
+    for backend in ("grid", "bitboard"):
+        s = _midgame_state()
+        ex.cache.clear()
+        d1, v1 = ex.best_move_expecti(s, depth=3, backend=backend)
+        ex.cache.clear()
+        d2, v2 = ex.best_move_iterative(s, max_depth=3, backend=backend)
+        assert d1 == d2
+        assert v1 == pytest.approx(v2)
+
+def test_iterative_respects_node_budget():
+    s = _midgame_state()
+    d, v = ex.best_move_iterative(s, max_nodes=200, max_depth=20, backend="bitboard")
+    assert d in ex.MOVE_ORDER
+    assert ex._nodes <= 200 + 20  # ensimmäinen kierros ajetaan aina loppuun
+    # budjetti poistetaan haun jälkeen
+    assert ex._deadline is None and ex._node_limit is None
+
+def test_iterative_time_budget_returns_completed_iteration():
+    s = _midgame_state()
+    d, v = ex.best_move_iterative(s, time_ms=0, max_depth=20, backend="bitboard")
+    # aikaa ei ole lainkaan -> vain syvyys 1 valmistuu
+    ex.cache.clear()
+    d1, v1 = ex.best_move_iterative(s, max_depth=1, backend="bitboard")
+    assert (d, v) == (d1, v1)
+
+
+# ---------- todennäköisyysraja (prob_cutoff) ----------
+
+@pytest.fixture
+def _cutoff():
+    def set_cutoff(value):
+        ex._begin_search(False, value)
+    yield set_cutoff
+    ex._begin_search(False)
+
+@patch.object(ex, "leaf_value", return_value=7.0)
+def test_exp_value_scores_unlikely_node_as_leaf(leaf_value, _cutoff):
+    s = FakeState([[0]*4 for _ in range(4)], empties=[(0, 0)])
+    _cutoff(0.05)
+    assert ex.exp_value(s, d=3, p=0.01) == 7.0
+    leaf_value.assert_called_once()
+
+@patch.object(ex, "max_value", return_value=1.0)
+def test_exp_value_passes_path_probability_to_children(max_value, _cutoff):
+    s = FakeState([[0]*4 for _ in range(4)], empties=[(0, 0), (1, 1)])
+    _cutoff(0.001)
+    ex.exp_value(s, d=3, p=0.5)
+    pf = ex.PROB_FOUR
+    probs = [c.args[2] for c in max_value.call_args_list]
+    assert probs == pytest.approx([0.25 * (1 - pf), 0.25 * pf] * 2)
+
+@patch.object(ex, "max_value", return_value=1.0)
+def test_path_probability_counts_all_empties_when_thinned(max_value, _cutoff):
+    cells = [(r, c) for r in range(3) for c in range(3)]   # 9 tyhjää, ohennetaan 6:een
+    s = FakeState([[0]*4 for _ in range(4)], empties=cells)
+    _cutoff(0.0001)
+    ex.exp_value(s, d=3)
+    pf = ex.PROB_FOUR
+    probs = [c.args[2] for c in max_value.call_args_list]
+    assert len(probs) == 2 * ex._THIN_CELLS
+    assert probs == pytest.approx([(1 - pf) / 9, pf / 9] * ex._THIN_CELLS)
+
+@pytest.mark.parametrize("backend", ["grid", "bitboard"])
+def test_cut_subtrees_are_not_cached(backend, _cutoff):
+    early = [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]]
+
+    def value():
+        if backend == "grid":
+            return ex.exp_value(GameState(grid=[r[:] for r in early]), d=3)
+        return ex._bb_exp_value(ex.bitboard.encode(early), 3)
+
+    ex.cache.clear()
+    ex._eval_cache.clear()
+    full = value()
+    ex.cache.clear()
+    _cutoff(0.2)            # lapsen CHANCE-solmut jäävät rajan alle
+    assert value() != full
+    key = ex.make_key(early, "chance") if backend == "grid" else (ex.bitboard.encode(early) << 1) | 1
+    assert ex.cache.get(key, 3) is None
+    _cutoff(0.0)            # todennäköinen polku ei saa käyttää karsittua arvoa
+    assert value() == full
+
+def test_prob_cutoff_prunes_nodes_and_backends_agree():
+    early = [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]]
+    results = {}
+    for backend in ("grid", "bitboard"):
+        for cut in (0.0, 0.03):
+            ex.cache.clear()
+            ex._eval_cache.clear()
+            n0 = ex._nodes
+            d, v = ex.best_move_expecti(GameState(grid=[r[:] for r in early]), depth=4,
+                                        backend=backend, prob_cutoff=cut)
+            results[backend, cut] = (d, v, ex._nodes - n0)
+    for cut in (0.0, 0.03):
+        g, b = results["grid", cut], results["bitboard", cut]
+        assert g[0] == b[0] and g[1] == pytest.approx(b[1]) and g[2] == b[2]
+    assert results["bitboard", 0.03][2] < results["bitboard", 0.0][2]
+    assert ex._prob_cutoff == 0.03
+    ex.best_move_expecti(GameState(grid=[r[:] for r in early]), depth=1)
+    assert ex._prob_cutoff == 0.0  # raja ei jää voimaan seuraavaan hakuun
+
+
+# ---------- ohennus ja symmetria ----------
+
+def test_thinning_picks_the_same_cells_in_every_orientation():
+    g = [[2, 0, 0, 0], [0, 0, 4, 0], [0, 0, 0, 0], [0, 8, 0, 0]]
+    b = ex.bitboard.encode(g)
+    chosen = set()
+    for i in range(len(ex.bitboard.SYMMETRIES)):
+        sb = ex.bitboard.apply_symmetry(b, i)
+        sg = ex.bitboard.decode(sb)
+        cells = [(r, c) for r in range(4) for c in range(4) if sg[r][c] == 0]
+        thinned = ex._order_cells(sg, cells)[:ex._THIN_CELLS]
+        shifts = ex._bb_thin(sb, [4 * (4 * r + c) for r, c in cells])
+        assert set(thinned) == {divmod(sh >> 2, 4) for sh in shifts}
+        # Valitut solut merkittyinä ja vietyinä kanoniseen suuntaan.
+        marked = sb
+        for sh in shifts:
+            marked |= 0xF << sh
+        chosen.add(ex.bitboard.canonical(marked))
+    assert len(chosen) == 1
+
+def test_symmetry_does_not_change_search_and_backends_agree():
+    positions = [
+        [[2, 0, 0, 0], [0, 0, 4, 0], [0, 0, 0, 0], [0, 8, 0, 0]],
+        [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]],
+        [[0, 0, 0, 4], [0, 2, 0, 0], [16, 0, 0, 0], [2, 0, 0, 8]],
+    ]
+    ex.cache.exact_depth = True  # arvo ei riipu välimuistin historiasta
+    try:
+        for g in positions:
+            out = {}
+            for backend in ("grid", "bitboard"):
+                for symmetry in (False, True):
+                    ex.cache.clear()
+                    ex._eval_cache.clear()
+                    out[backend, symmetry] = ex.best_move_expecti(
+                        GameState(grid=[r[:] for r in g]), depth=4,
+                        backend=backend, symmetry=symmetry)
+            d, v = out["grid", False]
+            for d2, v2 in out.values():
+                assert d2 == d and v2 == pytest.approx(v)
+    finally:
+        ex.cache.exact_depth = False
+
+
+# ---------- inkrementaalinen arvio ----------
+
+@pytest.mark.parametrize("backend", ["grid", "bitboard"])
+@pytest.mark.parametrize("symmetry", [False, True])
+def test_incremental_evaluation_does_not_change_search(backend, symmetry):
+    positions = [
+        [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]],
+        [[0, 0, 0, 64], [0, 0, 8, 32], [2, 0, 256, 8], [2, 4, 16, 4]],
+        [[64, 128, 1024, 64], [4, 64, 32, 16], [4, 4, 2, 2], [0, 4, 0, 0]],
+    ]
+    try:
+        for g in positions:
+            out = {}
+            for incremental in (False, True):
+                ex._incremental = incremental
+                ex.cache.clear()
+                ex._eval_cache.clear()
+                n0 = ex._nodes
+                d, v = ex.best_move_expecti(GameState(grid=[r[:] for r in g]), depth=3,
+                                            backend=backend, symmetry=symmetry)
+                out[incremental] = (d, v, ex._nodes - n0, dict(ex._eval_cache))
+            assert out[True][:3] == out[False][:3]
+            # Esitäytetyt arviot ovat täsmälleen koko laudan arvioita.
+            fresh = out[False][3]
+            assert all(fresh.get(k, v) == v for k, v in out[True][3].items())
+    finally:
+        ex._incremental = True
+
+def test_incremental_evaluation_skips_huge_tiles():
+    # 65536 ei mahdu bittilautaan: esitäyttö ohitetaan, haku toimii silti.
+    g = [[65536, 2, 0, 0], [4, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]]
+    ex._eval_cache.clear()
+    d, v = ex.best_move_expecti(GameState(grid=g), depth=2, backend="grid")
+    assert d in ex.MOVE_ORDER and v == v
+
+
+# ---------- hakutila (SearchState) ----------
+
+def test_node_functions_agree_on_search_and_game_state():
+    from src.board import SearchState
+    g = [[2, 4, 8, 16], [4, 8, 16, 2], [0, 2, 4, 0], [0, 0, 2, 0]]
+    for fn in (ex.exp_value, ex.max_value):
+        ex.cache.clear()
+        plain = fn(GameState(grid=[r[:] for r in g], score=50), 3)
+        ex.cache.clear()
+        ss = SearchState(g, score=50)
+        assert fn(ss, 3) == plain
+        # kaikki muutokset on peruttu
+        assert ss.grid == g and ss.score == 50 and ss._undo == []
+
+
+# ---------- NxN-laudat ----------
+
+@pytest.mark.parametrize("n", [3, 5, 6])
+def test_grid_search_runs_on_nxn_boards(n):
+    import random
+    import src.board as board
+    random.seed(n)
+    s = board.new_game(size=n)
+    for _ in range(3):
+        s.move(ex.best_move_expecti(s, depth=2)[0])
+    d, v = ex.best_move_expecti(s, depth=2)
+    assert s.copy().apply_move(d)
+    d2, v2 = ex.best_move_iterative(s, max_depth=2)
+    assert d2 in ex.MOVE_ORDER and v2 == v2
+    with pytest.raises(ValueError):
+        ex.best_move_expecti(s, depth=1, backend="bitboard")
+    ex.cache.clear()
+    assert ex.best_move_expecti(s, depth=2, batch=True) == (d, v)  # ruudukkohaku
+
+def test_dynamic_depth_scales_with_cell_count():
+    assert ex.dynamic_depth(3, 18, 0, cells=36) == ex.dynamic_depth(3, 8, 0)
+    assert ex.dynamic_depth(3, 9, 0, cells=9) == ex.dynamic_depth(3, 16, 0)
+
+
+# ---------- eräarvio (batch) ----------
+
+@pytest.mark.parametrize("symmetry", [False, True])
+def test_batch_search_matches_scalar_bitboard_search(symmetry):
+    pytest.importorskip("numpy")
+    positions = [
+        [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]],
+        [[0, 0, 0, 64], [0, 0, 8, 32], [2, 0, 256, 8], [2, 4, 16, 4]],
+        [[64, 128, 1024, 64], [4, 64, 32, 16], [4, 4, 2, 2], [0, 4, 0, 0]],
+    ]
+    for g in positions:
+        out = {}
+        for batch in (False, True):
+            ex.cache.clear()
+            ex._eval_cache.clear()
+            n0 = ex._nodes
+            d, v = ex.best_move_expecti(GameState(grid=[r[:] for r in g]), depth=3,
+                                        backend="bitboard", symmetry=symmetry, batch=batch)
+            out[batch] = (d, v, ex._nodes - n0, len(ex.cache), len(ex._eval_cache),
+                          ex.cache.hits, ex.cache.misses)
+        assert out[True][0] == out[False][0]
+        assert out[True][1] == pytest.approx(out[False][1])
+        assert out[True][2:] == out[False][2:]
+
+@pytest.mark.parametrize("symmetry", [False, True])
+def test_batch_frontier_reads_and_stores_like_scalar(symmetry):
+    pytest.importorskip("numpy")
+    boards = [
+        # 2-laatta kulmaan jumittaa laudan: lapsella ei ole siirtoja
+        [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 0]],
+        # lävistäjän suhteen symmetrinen: symmetriatilassa lapset toistuvat
+        [[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ]
+    try:
+        for g in boards:
+            out = {}
+            for batch in (False, True):
+                ex.cache.clear()
+                ex._eval_cache.clear()
+                ex._begin_search(symmetry, batch=batch)
+                n0 = ex._nodes
+                v = ex._bb_exp_value(ex.bitboard.encode(g), 2)
+                out[batch] = (ex._nodes - n0, ex.cache.hits, ex.cache.misses,
+                              {k: sorted(e) for k, e in ex.cache._data.items()})
+                out[batch, "v"] = v
+            assert out[True] == out[False]
+            assert out[True, "v"] == pytest.approx(out[False, "v"])
+    finally:
+        ex._begin_search(False)
+
+def test_batch_search_uses_bitboard_for_grid_state():
+    pytest.importorskip("numpy")
+    s = _midgame_state()
+    d1, v1 = ex.best_move_expecti(s, depth=3, backend="bitboard")
+    ex.cache.clear()
+    d2, v2 = ex.best_move_expecti(s, depth=3, batch=True)
+    assert d1 == d2 and v1 == pytest.approx(v2)
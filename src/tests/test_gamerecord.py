@@ -0,0 +1,97 @@
+"""Pelitallenteiden pytest-testit."""
+
+import random
+import pytest
+import src.expectiminimax as ex
+import src.tournament as tour
+from src import bitboard
+from src.board import new_game
+from src.gamerecord import (HEADER, GameRecordReader, GameRecordWriter, encode_turn,
+                            main, read_games)
+
+
+def _play(size, seed, writer, moves=40):
+    """Pelaa ja tallentaa pelin; palauttaa tilat (ruudukko, pisteet) vuoroittain."""
+    random.seed(seed)
+    s = new_game(size=size)
+    writer.begin_game(seed, s.grid)
+    seen = [([r[:] for r in s.grid], s.score)]
+    while not s.over and len(seen) <= moves:
+        d, _ = ex.best_move_expecti(s, depth=1)
+        before = [r[:] for r in s.grid]
+        if not s.move(d):
+            break
+        writer.add_move(before, d, s.grid)
+        seen.append(([r[:] for r in s.grid], s.score))
+    writer.end_game()
+    return seen
+
+
+def test_round_trip_regenerates_states(tmp_path):
+    path = str(tmp_path / "pelit.rec")
+    with GameRecordWriter(path) as w:
+        played = [_play(4, seed, w) for seed in (1, 2)]
+    games = list(read_games(path))
+    assert [g.seed for g in games] == [1, 2]
+    for g, seen in zip(games, played):
+        assert g.complete and g.size == 4 and len(g) == len(seen) - 1
+        assert [(s.grid, s.score) for s in g.states()] == seen
+        assert list(g.boards()) == [bitboard.encode(grid) for grid, _ in seen]
+    # 4x4: yksi tavu vuorolta, otsakkeet ja lopettimet päälle.
+    turns = sum(len(g) for g in games)
+    assert (tmp_path / "pelit.rec").stat().st_size == HEADER.size + turns + 2 * (10 + 2 + 1)
+
+
+def test_larger_boards_use_two_byte_records(tmp_path):
+    path = str(tmp_path / "5x5.rec")
+    with GameRecordWriter(path) as w:
+        seen = _play(5, 3, w, moves=20)
+    (g,) = read_games(path)
+    assert g.size == 5 and len(g.turns) == 2 * len(g)
+    assert [(s.grid, s.score) for s in g.states()] == seen
+    with pytest.raises(ValueError):
+        list(g.boards())
+
+
+def test_interrupted_game_is_reported_and_truncated_on_append(tmp_path):
+    path = str(tmp_path / "pelit.rec")
+    with GameRecordWriter(path) as w:
+        _play(4, 1, w)
+    w = GameRecordWriter(path)
+    _play(4, 2, w)
+    w.begin_game(3, [[2, 0, 0, 0], [0] * 4, [0] * 4, [0, 0, 0, 4]])
+    w.add_turn("left", 0, 1, 2)
+    w._f.flush()  # "kaatuu" ennen pelin loppua
+    games = list(read_games(path))
+    assert [g.complete for g in games] == [True, True, False]
+    assert len(games[-1]) == 1
+    with GameRecordWriter(path) as w2:
+        _play(4, 4, w2)
+    assert [(g.seed, g.complete) for g in read_games(path)] == [(1, True), (2, True), (4, True)]
+
+
+def test_rejects_foreign_files_and_bad_tiles(tmp_path):
+    path = tmp_path / "x.rec"
+    path.write_bytes(b"x" * 16)
+    with pytest.raises(ValueError):
+        GameRecordReader(str(path))
+    with pytest.raises(ValueError):
+        GameRecordWriter(str(path))
+    with pytest.raises(ValueError):
+        encode_turn(4, "left", 0, 0, 8)
+    with pytest.raises(ValueError):
+        encode_turn(9, "left", 0, 0, 2)
+
+
+def test_tournament_records_games(tmp_path, capsys):
+    path = str(tmp_path / "turnaus.rec")
+    settings = tour.Settings(depth=1, record=path)
+    results = sorted(tour.run_tournament(2, settings, workers=1, seed=5), key=lambda r: r.seed)
+    games = list(read_games(path))
+    assert [g.seed for g in games] == [5, 6]
+    for g, r in zip(games, results):
+        final = g.final()
+        assert len(g) == r.moves and final.score == r.score
+        assert max(v for row in final.grid for v in row) == r.max_tile
+    main(["info", path, "--replay"])
+    assert "2 peliä" in capsys.readouterr().out
@@ -0,0 +1,71 @@
+"""grid_ops-moduulin vektorisoitujen siirtojen pytest-testit."""
+
+import pytest
+import src.grid_ops as go
+
+np = pytest.importorskip("numpy")
+
+
+def _random_exponents(n, seed=0, top=6):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, top, (n, 4, 4), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("d", ["left", "right", "up", "down"])
+def test_batch_moves_match_scalar_moves(d):
+    e = _random_exponents(300, seed=1)
+    new, gains, changed = go.MOVE_FUN_BATCH[d](e)
+    assert new.shape == e.shape and new.dtype == np.uint8
+    grids = go.from_exponents(e).tolist()
+    expect = go.from_exponents(new).tolist()
+    for i, g in enumerate(grids):
+        ng, gained = go.MOVE_FUN[d](g)
+        assert expect[i] == ng
+        assert gains[i] == gained
+        assert changed[i] == (ng != g)
+
+
+def test_batch_moves_accept_flat_boards():
+    e = _random_exponents(50, seed=2)
+    new, gains, changed = go.move_up_batch(e.reshape(50, 16))
+    new2, gains2, changed2 = go.move_up_batch(e)
+    assert new.shape == (50, 16)
+    assert (new.reshape(50, 4, 4) == new2).all()
+    assert (gains == gains2).all() and (changed == changed2).all()
+
+
+def test_batch_move_does_not_modify_input():
+    e = _random_exponents(20, seed=3)
+    before = e.copy()
+    go.move_left_batch(e)
+    assert (e == before).all()
+
+
+def test_spawn_batch_is_seeded_and_fills_one_empty_cell():
+    e = _random_exponents(1000, seed=4, top=3)
+    e[0] = 1  # täysi lauta
+    a, spawned_a = go.spawn_batch(e, 7)
+    b, spawned_b = go.spawn_batch(e, 7)
+    assert (a == b).all() and (spawned_a == spawned_b).all()
+    assert not spawned_a[0] and (a[0] == e[0]).all()
+
+    diff = (a != e).reshape(1000, 16)
+    assert (diff.sum(axis=1) == spawned_a).all()  # täsmälleen yksi uusi laatta
+    assert ((e.reshape(1000, 16) == 0) | ~diff).all()  # vain tyhjiin soluihin
+    new_tiles = a.reshape(1000, 16)[diff]
+    assert set(new_tiles.tolist()) <= {1, 2}
+    assert 0.05 < (new_tiles == 2).mean() < 0.15
+
+
+def test_spawn_batch_picks_cells_uniformly():
+    e = np.zeros((20000, 4, 4), dtype=np.uint8)
+    a, _ = go.spawn_batch(e, np.random.default_rng(0))
+    counts = (a.reshape(-1, 16) != 0).sum(axis=0)
+    assert counts.min() > 0.8 * 20000 / 16
+
+
+def test_exponent_round_trip():
+    grids = [[[0, 2, 4, 8], [16, 32, 64, 128], [256, 512, 1024, 2048], [0, 0, 0, 32768]]]
+    e = go.to_exponents(grids)
+    assert e[0, 0].tolist() == [0, 1, 2, 3]
+    assert go.from_exponents(e).tolist() == grids
@@ -48,6 +48,15 @@ def test_render_prints_correct_structure(capsys):
     assert "| 128| 256|1024|2048|" in out
 
 
+def test_render_scales_border_to_board_size(capsys):
+    s = FakeState([[0] * 5 for _ in range(4)] + [[2, 0, 0, 0, 65536]],
+                  score=0, won=False, over=False)
+    gui.render(s)
+    out = capsys.readouterr().out
+    assert out.count("+-----+-----+-----+-----+-----+") == 6
+    assert "|    2|     |     |     |65536|" in out
+
+
 # ---------- read_command ----------
 
 @pytest.mark.parametrize(
@@ -83,6 +92,17 @@ def test_ai_step_calls_best_move_and_move(monkeypatch):
     assert s.moved == "up" and s.move_calls == 1
 
 
+def test_ai_step_uses_montecarlo_engine(monkeypatch):
+    s = FakeState([[0] * 4 for _ in range(4)])
+    monkeypatch.setattr(gui, "best_move_expecti", None)
+    monkeypatch.setattr(gui, "best_move_montecarlo", lambda state: ("left", 1.0))
+
+    ok, d = gui.ai_step(s, depth=3, engine="mc")
+
+    assert ok is True and d == "left"
+    assert s.moved == "left"
+
+
 # ---------- print_ai_move ja print_final ----------
 
 def test_print_ai_move_prints(capsys):
@@ -98,3 +118,33 @@ def test_print_final_prints(capsys):
     gui.print_final(s)
     out = capsys.readouterr().out
     assert "LOPPU - Pisteet: 999 Suurin laatta: 16" in out
+
+def test_print_tt_stats_prints(capsys):
+    from src.ttable import TranspositionTable
+    tt = TranspositionTable()
+    tt.put("k", 1, 0.0)
+    tt.get("k", 1)
+    tt.get("x", 1)
+    gui.print_tt_stats(tt)
+    out = capsys.readouterr().out
+    assert "TT-osumat: 1/2 (50.0 %), merkintöjä 1" in out
+
+def test_print_search_stats_prints(capsys):
+    from src.searchstats import SearchStats
+    st = SearchStats(depth=3, tt_hits=1, tt_misses=3, eval_hits=2, eval_misses=2,
+                     thinned=1, thinned_cells=4, total_time=0.5)
+    st.nodes["max"][2] = 5
+    st.nodes["chance"][1] = 7
+    gui.print_search_stats(st)
+    out = capsys.readouterr().out
+    assert "syvyys 3, solmuja 12" in out
+    assert "2:5/0 1:0/7" in out
+    assert "TT 1/4 (25.0 %)" in out
+    assert "ohennettu 1 (-4 solua)" in out
+
+
+def test_search_engines_are_imported_lazily():
+    import importlib
+    assert gui.best_move_expecti is importlib.import_module("src.expectiminimax").best_move_expecti
+    with pytest.raises(AttributeError):
+        gui.no_such_name
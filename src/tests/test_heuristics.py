@@ -1,7 +1,10 @@
 """Heuristiikka-moduulin pytest-testit (päivitetty nykyiselle heuristiikalle)."""
 
 import math
+import random
+import pytest
 import src.heuristics as h
+from src.bitboard import encode
 
 
 # ---------- apu ----------
@@ -74,6 +77,43 @@ def test_snake_score_prefers_monotonic_snake_row():
     assert h.snake_score(snake_like) > h.snake_score(broken)
 
 
+def test_evaluate_is_symmetric_under_rotations_and_reflections():
+    g = G([[64, 32, 4, 0],
+           [2,   8, 0, 0],
+           [0,   2, 0, 0],
+           [0,   0, 0, 0]])
+    variants = []
+    for base in (g, [row[::-1] for row in g]):
+        for _ in range(4):
+            variants.append(base)
+            base = [list(col) for col in zip(*base[::-1])]
+    assert len(h._SNAKES) == 8
+    assert len({h.evaluate(v) for v in variants}) == 1
+
+
+def test_snake_weights_are_generated_per_size():
+    assert h._base_snake(4) == [[15, 14, 13, 12], [8, 9, 10, 11], [7, 6, 5, 4], [0, 1, 2, 3]]
+    assert h.snake_weights(4) == h._SNAKES
+    assert h.snake_weights(5) is h.snake_weights(5)  # välimuistista
+    for n in (3, 5, 6):
+        W = h.snake_weights(n)
+        assert len(W) == 8 and all(len(w) == n for w in W)
+        assert sorted(v for row in W[0] for v in row) == list(range(n * n))
+
+@pytest.mark.parametrize("n", [3, 5, 6])
+def test_evaluate_on_nxn_is_symmetric_and_matches_batch(n):
+    rng = random.Random(n)
+    g = [[rng.choice([0, 0, 2, 4, 8, 64, 512]) for _ in range(n)] for _ in range(n)]
+    variants = []
+    for base in (g, [row[::-1] for row in g]):
+        for _ in range(4):
+            variants.append(base)
+            base = [list(col) for col in zip(*base[::-1])]
+    assert len({h.evaluate(v) for v in variants}) == 1
+    if h.np is not None:
+        assert h.evaluate_batch(variants) == pytest.approx([h.evaluate(g)] * 8)
+
+
 # ---------- smoothness ----------
 # Smoothness on negatiivinen log-erojen summa (vain ei-nollaparit).
 
@@ -157,3 +197,107 @@ def test_evaluate_rewards_merge_potential():
                 [0, 0, 0, 0],
                 [0, 0, 0, 0]])
     assert h.evaluate(paired) > h.evaluate(split)
+
+
+# ---------- evaluate_bitboard (taulukkopohjainen) ----------
+
+def test_evaluate_bitboard_matches_evaluate_exactly():
+    rng = random.Random(7)
+    tiles = [0, 0, 0, 2, 4, 8, 16, 64, 256, 2048, 32768]
+    for _ in range(500):
+        g = [[rng.choice(tiles) for _ in range(4)] for _ in range(4)]
+        assert h.evaluate_bitboard(encode(g)) == h.evaluate(g)
+
+def test_evaluate_bitboard_empty_and_full_boards():
+    empty = G([[0] * 4 for _ in range(4)])
+    full = G([[2, 4, 2, 4],
+              [4, 2, 4, 2],
+              [2, 4, 2, 4],
+              [4, 2, 4, 2]])
+    assert h.evaluate_bitboard(0) == h.evaluate(empty)
+    assert h.evaluate_bitboard(encode(full)) == h.evaluate(full)
+
+
+# ---------- inkrementaalinen arvio ----------
+
+def test_incremental_spawn_and_move_match_full_evaluate_exactly():
+    from src.bitboard import MOVE_FUN, empty_shifts
+    rng = random.Random(13)
+    tiles = [0, 0, 0, 0, 2, 4, 8, 16, 64, 256, 2048, 32768]
+    for _ in range(300):
+        g = [[rng.choice(tiles) for _ in range(4)] for _ in range(4)]
+        b = encode(g)
+        acc = h.eval_acc(b)
+        assert h.evaluate_acc(acc, b) == h.evaluate(g)
+        for sh in empty_shifts(b):
+            for e in (1, 2):
+                child = h.eval_acc_spawn(acc, b, sh, e)
+                assert child == h.eval_acc(b | (e << sh))
+                r, c = divmod(sh >> 2, 4)
+                g2 = [row[:] for row in g]
+                g2[r][c] = 1 << e
+                assert h.evaluate_acc(child, b | (e << sh)) == h.evaluate(g2)
+        for move in MOVE_FUN.values():
+            nb, _gained = move(b)
+            assert h.eval_acc_move(acc, b, nb) == h.eval_acc(nb)
+            assert h.evaluate_acc(h.eval_acc_move(acc, b, nb), nb) == h.evaluate_bitboard(nb)
+
+
+# ---------- painot ----------
+
+def test_set_weights_changes_evaluation_and_round_trips():
+    g = G([[2, 2, 0, 0],
+           [4, 0, 0, 0],
+           [0, 0, 0, 0],
+           [0, 0, 0, 0]])
+    orig = h.get_weights()
+    base = h.evaluate(g)
+    try:
+        h.set_weights({"empty": orig["empty"] * 2})
+        assert h.get_weights()["empty"] == orig["empty"] * 2
+        assert h.evaluate(g) != base
+    finally:
+        h.set_weights(orig)
+    assert h.evaluate(g) == base
+
+def test_set_weights_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        h.set_weights({"nope": 1.0})
+
+def test_heuristic_weights_match_set_weights_without_changing_module():
+    g = G([[2, 2, 0, 0],
+           [4, 0, 0, 0],
+           [0, 8, 0, 0],
+           [0, 0, 0, 2]])
+    b = encode(g)
+    orig = h.get_weights()
+    hw = h.Heuristic({"empty": 1.0, "corner": 3.0})
+    assert h.get_weights() == orig
+    assert hw.weights == {**orig, "empty": 1.0, "corner": 3.0}
+    try:
+        h.set_weights(hw.weights)
+        expected = h.evaluate(g)
+    finally:
+        h.set_weights(orig)
+    assert hw.evaluate(g) == expected
+    assert hw.evaluate_bitboard(b) == expected
+    assert hw.evaluate_acc(h.eval_acc(b), b) == expected
+    assert h.evaluate(g) != expected
+    with pytest.raises(ValueError):
+        h.Heuristic({"nope": 1.0})
+
+
+# ---------- NumPy-eräarvio ----------
+
+def test_evaluate_batch_matches_scalar_evaluate():
+    pytest.importorskip("numpy")
+    rng = random.Random(11)
+    tiles = [0, 0, 0, 2, 4, 8, 16, 64, 256, 2048, 32768]
+    grids = [[[rng.choice(tiles) for _ in range(4)] for _ in range(4)] for _ in range(300)]
+    grids.append([[0] * 4 for _ in range(4)])
+    batch = h.evaluate_batch(grids)
+    assert batch.shape == (len(grids),)
+    for g, v in zip(grids, batch):
+        assert v == pytest.approx(h.evaluate(g), abs=1e-9)
+    bb = h.evaluate_bitboard_batch([encode(g) for g in grids])
+    assert list(bb) == pytest.approx(list(batch), abs=1e-9)
@@ -0,0 +1,60 @@
+"""Monte Carlo -moottorin pytest-testit."""
+
+import random
+import pytest
+import src.montecarlo as mc
+import src.parallel as par
+from src.board import GameState
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _pool():
+    yield
+    par.shutdown_pool()
+
+
+MID = [[2, 4, 8, 16], [4, 8, 16, 2], [0, 2, 4, 0], [0, 0, 2, 0]]
+
+
+def test_rollout_does_not_modify_board_and_is_seeded():
+    g = [r[:] for r in MID]
+    a = mc.rollout(g, random.Random(5))
+    b = mc.rollout(g, random.Random(5))
+    assert a == b
+    assert g == MID
+
+def test_rollout_of_dead_board_is_zero():
+    dead = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    assert mc.rollout(dead, random.Random(0)) == 0.0
+
+def test_best_move_is_legal_and_deterministic_with_seed():
+    s = GameState(grid=[r[:] for r in MID], score=100)
+    d1, v1 = mc.best_move_montecarlo(s, rollouts=10, seed=3)
+    d2, v2 = mc.best_move_montecarlo(s, rollouts=10, seed=3)
+    assert (d1, v1) == (d2, v2)
+    assert s.copy().move(d1, spawn=False)
+    assert v1 > 100
+
+def test_no_legal_moves_returns_score():
+    dead = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    assert mc.best_move_montecarlo(GameState(grid=dead, score=7), rollouts=5) == ("left", 7.0)
+
+def test_prefers_merging_move():
+    # Vain vaakasiirto yhdistää 1024-laatat.
+    g = [[1024, 1024, 0, 0], [2, 4, 0, 0], [4, 2, 0, 0], [2, 4, 0, 0]]
+    d, _v = mc.best_move_montecarlo(GameState(grid=g), rollouts=20, seed=1, rollout_depth=3)
+    assert d in ("left", "right")
+
+def test_workers_split_rollouts_deterministically():
+    s = GameState(grid=[r[:] for r in MID])
+    a = mc.best_move_montecarlo(s, rollouts=9, seed=2, workers=2)
+    b = mc.best_move_montecarlo(s, rollouts=9, seed=2, workers=2)
+    assert a == b
+
+def test_time_budget_stops():
+    import time
+    s = GameState(grid=[r[:] for r in MID])
+    t0 = time.perf_counter()
+    d, _v = mc.best_move_montecarlo(s, time_ms=50, seed=0)
+    assert d in mc.MOVE_ORDER
+    assert time.perf_counter() - t0 < 1.0
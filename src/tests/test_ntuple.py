@@ -0,0 +1,141 @@
+"""N-tuple-verkon pytest-testit."""
+
+import pickle
+import random
+import pytest
+import src.expectiminimax as ex
+from src import bitboard, heuristics
+from src.board import GameState
+from src.ntuple import MAGIC, NTupleNetwork, TUPLES_4, _runs
+
+GRID = [[2, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 128]]
+
+
+def _random_net(seed=0):
+    net = NTupleNetwork()
+    rng = random.Random(seed)
+    for i in range(net.size):
+        net.weights[i] = rng.random()
+    return net
+
+
+@pytest.fixture(autouse=True)
+def _restore_evaluator():
+    yield
+    ex.set_evaluator(None)
+
+
+def test_runs_split_tuple_into_contiguous_cells():
+    assert _runs((0, 1, 2, 3)) == ((0, 0xFFFF, 0),)
+    assert _runs((0, 1, 4, 5)) == ((0, 0xFF, 0), (16, 0xFF, 8))
+    assert len(_runs((0, 4, 8))) == 3
+
+
+def test_value_is_sum_over_features_and_symmetric():
+    net = _random_net()
+    b = bitboard.encode(GRID)
+    assert net.evaluate_bitboard(b) == pytest.approx(sum(net.weights[i] for i in net.features(b)))
+    for i in range(len(bitboard.SYMMETRIES)):
+        assert net.evaluate_bitboard(bitboard.apply_symmetry(b, i)) == \
+            pytest.approx(net.evaluate_bitboard(b))
+    assert net.evaluate(GRID) == net.evaluate_bitboard(b)
+
+
+def test_evaluate_clamps_tiles_above_32768():
+    net = _random_net()
+    huge = [[65536, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 1 << 20]]
+    clamped = [[32768, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 32768]]
+    assert net.evaluate(huge) == net.evaluate_bitboard(bitboard.encode(clamped))
+    with pytest.raises(ValueError):
+        net.evaluate([[0] * 5 for _ in range(5)])
+
+
+def test_batch_matches_scalar():
+    pytest.importorskip("numpy")
+    net = _random_net(1)
+    boards = [bitboard.encode(GRID), 0x1234_5678_9ABC_DEF0, 1]
+    assert net.evaluate_bitboard_batch(boards).tolist() == \
+        pytest.approx([net.evaluate_bitboard(b) for b in boards])
+
+
+def test_invalid_tuples_rejected():
+    with pytest.raises(ValueError):
+        NTupleNetwork([(0, 16)])
+    with pytest.raises(ValueError):
+        NTupleNetwork([(1, 1)])
+
+
+def test_save_and_mmap_load_round_trip(tmp_path):
+    path = str(tmp_path / "verkko.bin")
+    net = _random_net(2)
+    net.save(path)
+    loaded = NTupleNetwork.load(path)
+    try:
+        assert loaded.tuples == TUPLES_4
+        b = bitboard.encode(GRID)
+        assert loaded.evaluate_bitboard(b) == net.evaluate_bitboard(b)
+        with pytest.raises(TypeError):
+            loaded.weights[0] = 1.0   # vain luku
+    finally:
+        loaded.close()
+
+
+def test_pickle_reopens_loaded_network_and_copies_others(tmp_path):
+    path = str(tmp_path / "verkko.bin")
+    net = _random_net(3)
+    net.save(path)
+    loaded = NTupleNetwork.load(path)
+    b = bitboard.encode(GRID)
+    try:
+        for original in (net, loaded):
+            copy = pickle.loads(pickle.dumps(original))
+            assert copy.tuples == original.tuples
+            assert copy.evaluate_bitboard(b) == original.evaluate_bitboard(b)
+            copy.close()
+    finally:
+        loaded.close()
+
+
+def test_load_rejects_foreign_and_truncated_files(tmp_path):
+    path = tmp_path / "x.bin"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        NTupleNetwork.load(str(path))
+    NTupleNetwork([(0, 1)]).save(str(path))
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        NTupleNetwork.load(str(path))
+    assert path.read_bytes()[:8] == MAGIC
+
+
+def test_td_training_learns_and_is_deterministic(tmp_path):
+    a, b = NTupleNetwork(), NTupleNetwork()
+    scores = a.train(20, seed=3)
+    assert scores == b.train(20, seed=3)
+    assert len(scores) == 20 and all(s > 0 for s in scores)
+    # Alkulaudan jälkitilat ennustavat tulevia pisteitä (> 0).
+    assert a.evaluate_bitboard(bitboard.encode(GRID)) > 0
+    # Jatko mmapista ladatusta verkosta tekee kirjoitettavan kopion.
+    path = str(tmp_path / "v.bin")
+    a.save(path)
+    c = NTupleNetwork.load(path)
+    c.train(1, seed=4)
+    assert c._mm is None and len(c.weights) == c.size
+
+
+def test_set_evaluator_replaces_heuristic_in_search(tmp_path):
+    net = _random_net(5)
+    path = str(tmp_path / "v.bin")
+    net.save(path)
+    s = GameState([r[:] for r in GRID], score=0)
+    heuristic = ex.best_move_expecti(s, depth=2, backend="bitboard")
+    ex.set_evaluator(path)
+    assert not ex._incremental  # inkrementaalinen arvio on vain heuristiikalle
+    assert ex.evaluate_bitboard(1) == pytest.approx(net.evaluate_bitboard(1))
+    assert ex._bb_eval(bitboard.encode(GRID)) == net.evaluate_bitboard(bitboard.encode(GRID))
+    assert ex.best_move_expecti(s, depth=2, backend="bitboard") != heuristic
+    ex.set_evaluator(None)
+    assert ex._incremental
+    assert ex.evaluate is heuristics.evaluate
+    assert ex.evaluate_bitboard is heuristics.evaluate_bitboard
+    assert ex.best_move_expecti(s, depth=2, backend="bitboard") == heuristic
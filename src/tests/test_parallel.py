@@ -0,0 +1,102 @@
+"""Rinnakkaisen juurihaun pytest-testit."""
+
+import random
+import pytest
+import src.board as board
+import src.expectiminimax as ex
+import src.heuristics as heuristics
+import src.parallel as par
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _pool():
+    # Vertailukohta on sarjahaku samalla syvyyssäännöllä kuin työprosesseissa.
+    ex.cache.exact_depth = True
+    yield
+    ex.cache.exact_depth = False
+    par.shutdown_pool()
+
+
+POSITIONS = [
+    [[2, 2, 0, 0], [0, 4, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]],
+    [[2, 4, 8, 16], [4, 8, 16, 2], [0, 2, 4, 0], [0, 0, 2, 0]],
+    [[128, 64, 32, 4], [2, 16, 8, 2], [0, 4, 2, 0], [0, 0, 0, 2]],
+]
+
+
+@pytest.mark.parametrize("split_chance", [False, True])
+@pytest.mark.parametrize("grid", POSITIONS)
+def test_parallel_matches_serial_exactly(grid, split_chance):
+    s = board.GameState([r[:] for r in grid], score=40)
+    par.clear_caches()
+    serial = ex.best_move_expecti(s, depth=3, backend="bitboard")
+    par.clear_caches()
+    parallel = par.best_move_parallel(s, depth=3, workers=2, split_chance=split_chance)
+    assert parallel == serial
+
+def test_parallel_matches_serial_with_symmetry():
+    s = board.GameState([r[:] for r in POSITIONS[1]])
+    par.clear_caches()
+    serial = ex.best_move_expecti(s, depth=3, backend="bitboard", symmetry=True)
+    par.clear_caches()
+    assert par.best_move_parallel(s, depth=3, workers=2, symmetry=True, split_chance=True) == serial
+
+@pytest.mark.parametrize("split_chance", [False, True])
+def test_parallel_matches_serial_with_warm_caches(split_chance):
+    # Välimuisteja ei tyhjennetä siirtojen välillä: sarjahaun ja työprosessien
+    # taulut täyttyvät eri alipuista, mutta tuloksen pitää silti täsmätä.
+    random.seed(0)
+    s = board.new_game(backend="bitboard")
+    par.clear_caches()
+    for _ in range(8):
+        serial = ex.best_move_expecti(s, depth=3, backend="bitboard")
+        parallel = par.best_move_parallel(s, depth=3, workers=3, split_chance=split_chance)
+        assert parallel == serial
+        assert s.move(serial[0])
+
+def test_evaluator_switched_after_pool_exists_reaches_workers():
+    s = board.GameState([r[:] for r in POSITIONS[2]], score=40)
+    par.best_move_parallel(s, depth=2, workers=2)   # pooli on jo olemassa
+    flat = heuristics.Heuristic({"empty": 1.0, "snake": 0.0, "smooth": 0.0,
+                                 "merge": 0.0, "corner": 0.0})
+    with ex.using_evaluator(flat):
+        par.clear_caches()
+        serial = ex.best_move_expecti(s, depth=3, backend="bitboard")
+        parallel = par.best_move_parallel(s, depth=3, workers=2, split_chance=True)
+    assert parallel == serial
+    par.clear_caches()
+    assert par.best_move_parallel(s, depth=3, workers=2) != serial
+
+@pytest.mark.parametrize("split_chance", [False, True])
+@pytest.mark.parametrize("options", [{"prob_cutoff": 0.03}, {"batch": True}])
+def test_prob_cutoff_and_batch_reach_workers(options, split_chance):
+    s = board.GameState([r[:] for r in POSITIONS[0]], score=40)
+    par.clear_caches()
+    serial = ex.best_move_expecti(s, depth=4, backend="bitboard", **options)
+    par.clear_caches()
+    assert par.best_move_parallel(s, depth=4, workers=2, split_chance=split_chance,
+                                  **options) == serial
+
+def test_non_4x4_board_falls_back_to_serial_grid_search():
+    random.seed(5)
+    s = board.new_game(size=5)
+    for _ in range(3):
+        s.move(ex.best_move_expecti(s, depth=1)[0])
+    par.clear_caches()
+    serial = ex.best_move_expecti(s, depth=2)
+    par.clear_caches()
+    assert par.best_move_parallel(s, depth=2, workers=2) == serial
+
+def test_pool_is_reused_between_calls():
+    p1 = par.get_pool(2)
+    s = board.GameState([r[:] for r in POSITIONS[0]])
+    par.best_move_parallel(s, depth=2, workers=2)
+    assert par.get_pool(2) is p1
+
+def test_no_legal_moves_returns_leaf_without_pool():
+    s = board.GameState([[2, 4, 2, 4],
+                         [4, 2, 4, 2],
+                         [2, 4, 2, 4],
+                         [4, 2, 4, 2]], score=10)
+    d, v = par.best_move_parallel(s, depth=3, workers=2)
+    assert d == "left" and v == pytest.approx(10 + ex._bb_eval(ex.bitboard.encode(s.grid)))
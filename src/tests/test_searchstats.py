@@ -0,0 +1,123 @@
+"""Hakutilastojen (SearchStats) pytest-testit."""
+
+import sys
+import pytest
+import src.expectiminimax as ex
+from src.board import GameState
+from src.searchstats import SearchStats
+
+EARLY = [[2, 2, 32, 8], [0, 0, 4, 4], [0, 0, 0, 0], [0, 0, 2, 0]]
+LATE = [[64, 128, 1024, 64], [4, 64, 32, 16], [4, 4, 2, 2], [0, 4, 0, 0]]
+
+
+def _fresh():
+    ex.cache.clear()
+    ex._eval_cache.clear()
+
+
+@pytest.mark.parametrize("backend", ["grid", "bitboard"])
+def test_stats_do_not_change_result(backend):
+    for g in (EARLY, LATE):
+        _fresh()
+        plain = ex.best_move_expecti(GameState(grid=[r[:] for r in g]), depth=3, backend=backend)
+        _fresh()
+        d, v, st = ex.best_move_expecti(GameState(grid=[r[:] for r in g]), depth=3,
+                                        backend=backend, stats=True)
+        assert (d, v) == plain
+        assert isinstance(st, SearchStats)
+
+
+@pytest.mark.parametrize("backend", ["grid", "bitboard"])
+def test_stats_count_nodes_caches_and_thinning(backend):
+    _fresh()
+    s = GameState(grid=[r[:] for r in EARLY])
+    _d, _v, st = ex.best_move_expecti(s, depth=3, backend=backend, stats=True)
+
+    assert st.depth == 4  # 9 tyhjää -> +1
+    assert sum(st.nodes["chance"].values()) > 0 and sum(st.nodes["max"].values()) > 0
+    assert set(st.nodes["chance"]) <= {1, 3} and set(st.nodes["max"]) <= {0, 2}
+    assert st.thinned > 0 and st.thinned_cells >= st.thinned
+    assert st.tt_hits + st.tt_misses > 0
+    assert st.eval_misses == st.eval_cache_size  # tyhjästä välimuistista
+    assert st.tt_size == len(ex.cache)
+    assert 0 < st.eval_time <= st.total_time
+    assert 0 <= st.movegen_time <= st.total_time
+    assert st.nodes_per_sec > 0
+
+
+def test_stats_agree_between_backends():
+    counts = {}
+    for backend in ("grid", "bitboard"):
+        _fresh()
+        _d, _v, st = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=3,
+                                          backend=backend, stats=True)
+        counts[backend] = (st.depth, st.nodes, st.thinned, st.tt_hits, st.tt_misses)
+    assert counts["grid"] == counts["bitboard"]
+
+
+def test_stats_search_does_not_patch_the_module():
+    originals = (ex.exp_value, ex._bb_max_value, ex.evaluate, ex.MOVE_FUN, ex.dynamic_depth)
+    ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=2, stats=True)
+    assert (ex.exp_value, ex._bb_max_value, ex.evaluate, ex.MOVE_FUN, ex.dynamic_depth) == originals
+    assert ex._stats is None and ex._check_at == sys.maxsize
+
+
+def test_stats_are_released_when_search_fails(monkeypatch):
+    def boom(*args):
+        raise RuntimeError("arvio epäonnistui")
+    _fresh()
+    monkeypatch.setattr(ex, "evaluate_bitboard", boom)
+    with pytest.raises(RuntimeError):
+        ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=2,
+                             backend="bitboard", stats=True)
+    assert ex._stats is None and ex._check_at == sys.maxsize
+
+
+def test_nested_stats_searches_keep_their_own_counts():
+    _fresh()
+    _d, _v, alone = ex.best_move_expecti(GameState(grid=[r[:] for r in LATE]), depth=2,
+                                         backend="bitboard", stats=True)
+    _fresh()
+    _d, _v, alone_outer = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=3,
+                                               backend="bitboard", stats=True)
+    inner = []
+    real = ex.dynamic_depth
+
+    def depth_and_search(*args):
+        # Sisäkkäinen tilastohaku kesken ulomman haun (esim. kutsuva koodi).
+        if not inner:
+            inner.append(None)
+            _fresh()
+            inner[0] = ex.best_move_expecti(GameState(grid=[r[:] for r in LATE]), depth=2,
+                                            backend="bitboard", stats=True)[2]
+        return real(*args)
+
+    ex.dynamic_depth = depth_and_search
+    try:
+        _fresh()
+        _d, _v, outer = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=3,
+                                             backend="bitboard", stats=True)
+    finally:
+        ex.dynamic_depth = real
+    # Sisempi haku alkaa ennen ulomman solmuja: kumpikin laskee vain omansa.
+    assert inner[0].nodes == alone.nodes
+    assert (outer.depth, outer.nodes) == (alone_outer.depth, alone_outer.nodes)
+
+
+def test_batch_stats_count_frontier_nodes_and_evals():
+    _fresh()
+    _d, _v, st = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=2,
+                                      backend="bitboard", stats=True, batch=True)
+    assert st.nodes["chance"][0] > 0 and st.nodes["max"][1] > 0
+    assert st.eval_misses == st.eval_cache_size
+
+
+def test_stats_count_probability_cutoffs():
+    _fresh()
+    _d, _v, st = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=4,
+                                      backend="bitboard", stats=True, prob_cutoff=0.03)
+    assert st.prob_cut > 0
+    _fresh()
+    _d, _v, st = ex.best_move_expecti(GameState(grid=[r[:] for r in EARLY]), depth=4,
+                                      backend="bitboard", stats=True)
+    assert st.prob_cut == 0
@@ -0,0 +1,97 @@
+"""Siirtopalvelimen pytest-testit."""
+
+import io
+import json
+import socket
+import threading
+
+import src.expectiminimax as ex
+from src import server
+from src.board import GameState
+
+GRID = [[2, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 128]]
+
+
+def test_handle_matches_direct_search():
+    reply = server.handle({"id": 7, "board": GRID, "score": 100, "depth": 2})
+    move, value = ex.best_move_expecti(GameState([r[:] for r in GRID], 100, backend="bitboard"),
+                                       depth=2)
+    assert reply["id"] == 7 and reply["move"] == move
+    assert reply["value"] == value
+    assert set(reply["stats"]) == {"nodes", "ms", "tt_size", "eval_cache_size"}
+    assert reply["stats"]["tt_size"] > 0
+
+
+def test_handle_time_budget_full_stats_and_fallback_to_grid():
+    assert server.handle({"board": GRID, "time_ms": 5})["move"] in ("left", "up", "right", "down")
+    full = server.handle({"board": GRID, "depth": 2, "stats": True})
+    assert full["stats"]["search"]["total_time"] > 0
+    big = [r[:] for r in GRID]
+    big[0][0] = 65536   # ei mahdu bittilaudalle
+    assert "move" in server.handle({"board": big, "depth": 1})
+    assert "move" in server.handle({"board": [[2, 0, 0], [0, 0, 0], [0, 0, 4]], "depth": 1})
+
+
+def test_invalid_requests_get_error_replies():
+    assert "error" in server.handle({"id": 1, "board": [[2, 4], [8]]})
+    assert server.handle({"id": 2, "board": GRID, "backend": "gpu"})["id"] == 2
+    assert "error" in json.loads(server.handle_line("{ei json"))
+    assert "error" in json.loads(server.handle_line("[1, 2]"))
+
+
+def test_depth_and_time_budget_are_bounded():
+    for depth in (0, -1, server.MAX_DEPTH + 1, 10 ** 9, 2.5, "3", None, True,
+                  float("inf"), float("nan")):
+        assert "error" in server.handle({"id": 1, "board": GRID, "depth": depth}), depth
+    for time_ms in (0, -5, "nan", "5", float("nan"), float("inf"), server.MAX_TIME_MS + 1, False):
+        assert "error" in server.handle({"id": 1, "board": GRID, "time_ms": time_ms}), time_ms
+    # JSONin NaN/Infinity jäsentyvät liukuluvuiksi, mutta hylätään silti.
+    assert "error" in json.loads(server.handle_line('{"board": %s, "time_ms": NaN}' % GRID))
+    assert "error" in json.loads(server.handle_line('{"board": %s, "depth": Infinity}' % GRID))
+    assert "move" in server.handle({"board": GRID, "depth": 2.0})
+
+
+def test_score_and_board_are_validated():
+    for score in (-1, 2.5, "100", None, True, float("inf"), float("nan")):
+        assert "error" in server.handle({"id": 1, "board": GRID, "score": score}), score
+    assert server.handle({"board": GRID, "score": 40.0, "depth": 1})["value"] > 40
+    bad = [r[:] for r in GRID]
+    for tile in (1, 3, 6, -2, True, 2.0, 1 << 40):
+        bad[0][0] = tile
+        assert "error" in server.handle({"board": bad, "depth": 1}), tile
+    size = server.MAX_SIZE + 1
+    assert "error" in server.handle({"board": [[0] * size for _ in range(size)], "depth": 1})
+    # Infinity-pisteet eivät kaada stdio-palvelinta.
+    lines = '{"id": 1, "board": %s, "score": Infinity}\n{"id": 2, "board": %s, "depth": 1}\n' \
+        % (GRID, GRID)
+    out = io.StringIO()
+    server.serve_stdio(io.StringIO(lines), out)
+    replies = [json.loads(l) for l in out.getvalue().splitlines()]
+    assert "error" in replies[0] and "move" in replies[1]
+
+
+def test_stdio_answers_pipelined_requests_in_order():
+    lines = "".join(json.dumps({"id": i, "board": GRID, "depth": 1}) + "\n" for i in range(3))
+    out = io.StringIO()
+    server.serve_stdio(io.StringIO(lines + "\n"), out)
+    assert [json.loads(l)["id"] for l in out.getvalue().splitlines()] == [0, 1, 2]
+
+
+def test_unix_socket_round_trip(tmp_path):
+    path = str(tmp_path / "s.sock")
+    srv = server.MoveServer(path)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    try:
+        with socket.socket(socket.AF_UNIX) as s:
+            s.connect(path)
+            s.sendall(b"".join((json.dumps({"id": i, "board": GRID, "depth": 1}) + "\n").encode()
+                               for i in range(4)))
+            f = s.makefile("rb")
+            replies = [json.loads(f.readline()) for _ in range(4)]
+        assert [r["id"] for r in replies] == [0, 1, 2, 3]
+        assert len({r["move"] for r in replies}) == 1
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert not (tmp_path / "s.sock").exists()
@@ -0,0 +1,163 @@
+"""Istuntopalvelun (sessions.py) pytest-testit."""
+
+import asyncio
+import json
+import pytest
+
+from src.sessions import Overloaded, SessionManager, Superseded
+
+GRID = [[2, 4, 8, 16], [0, 2, 4, 0], [0, 0, 2, 0], [0, 0, 0, 128]]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_ai_moves_for_many_sessions_concurrently():
+    async def main():
+        async with SessionManager(workers=2) as m:
+            sessions = [m.new_session() for _ in range(4)]
+            results = await asyncio.gather(*(m.ai_move(s.id, depth=1) for s in sessions))
+            for s, (d, value) in zip(sessions, results):
+                assert d in ("left", "up", "right", "down") and value > 0
+                assert s.generation == 1
+            # Pelaajan siirto ja tila toimivat hakujen välissä.
+            before = sessions[0].generation
+            moved = any(m.move(sessions[0].id, d) for d in ("left", "up", "right", "down"))
+            assert moved and sessions[0].generation == before + 1
+    _run(main())
+
+
+def test_new_ai_request_and_move_supersede_stale_request():
+    async def main():
+        async with SessionManager(workers=1) as m:
+            s = m.new_session()
+            slow = asyncio.ensure_future(m.ai_move(s.id, depth=4))
+            await asyncio.sleep(0)
+            fast = asyncio.ensure_future(m.ai_move(s.id, depth=1))
+            with pytest.raises(Superseded):
+                await slow
+            assert (await fast) is not None
+            pending = asyncio.ensure_future(m.ai_move(s.id, depth=1, apply=False))
+            await asyncio.sleep(0)
+            m.close_session(s.id)
+            with pytest.raises(Superseded):
+                await pending
+            with pytest.raises(KeyError):
+                m.move(s.id, "left")
+    _run(main())
+
+
+def test_backpressure_rejects_when_queue_is_full():
+    async def main():
+        async with SessionManager(workers=1, max_queue=1) as m:
+            a, b, c = (m.new_session() for _ in range(3))
+            first = asyncio.ensure_future(m.ai_move(a.id, depth=2))
+            second = asyncio.ensure_future(m.ai_move(b.id, depth=1))
+            while m._free or not m._waiting:  # first saa paikan, second jonottaa
+                await asyncio.sleep(0)
+            with pytest.raises(Overloaded):
+                await m.ai_move(c.id, depth=1)
+            await asyncio.gather(first, second)
+            assert (await m.ai_move(c.id, depth=1)) is not None
+    _run(main())
+
+
+def test_backpressure_holds_for_a_burst_of_requests():
+    async def main():
+        async with SessionManager(workers=1, max_queue=1) as m:
+            sessions = [m.new_session() for _ in range(6)]
+            # Kaikki kutsut alkavat samalla silmukan kierroksella.
+            results = await asyncio.gather(*(m.ai_move(s.id, depth=1) for s in sessions),
+                                           return_exceptions=True)
+            overloaded = [r for r in results if isinstance(r, Overloaded)]
+            assert len(overloaded) == 4  # yksi haussa, yksi jonossa
+            assert all(isinstance(r, tuple) for r in results if r not in overloaded)
+            assert not m._waiting and m._free == 1
+    _run(main())
+
+
+def test_request_cancelled_before_it_starts_releases_its_queue_place():
+    async def main():
+        async with SessionManager(workers=1, max_queue=1) as m:
+            s = m.new_session()
+            first = asyncio.ensure_future(m.ai_move(s.id, depth=1))
+            second = asyncio.ensure_future(m.ai_move(s.id, depth=1))
+            with pytest.raises(Superseded):
+                await first          # second peruu firstin ennen kuin se käynnistyy
+            assert (await second) is not None
+            assert not m._waiting and m._free == 1
+    _run(main())
+
+
+def test_disconnect_closes_clients_sessions(tmp_path):
+    path = str(tmp_path / "s.sock")
+
+    async def main():
+        async with SessionManager(workers=1) as m:
+            kept = m.new_session()
+            server = await m.serve(path)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(path)
+                for i in range(2):
+                    writer.write((json.dumps({"id": i, "op": "new"}) + "\n").encode())
+                    await writer.drain()
+                    await reader.readline()
+                writer.write(b'{"id": 9, "op": "ai", "session": "s2", "depth": 3}\n')
+                await writer.drain()
+                assert set(m.sessions) == {kept.id, "s2", "s3"}
+                writer.close()
+                await writer.wait_closed()
+                for _ in range(500):
+                    if set(m.sessions) == {kept.id}:
+                        break
+                    await asyncio.sleep(0.01)
+                assert set(m.sessions) == {kept.id}
+    _run(main())
+
+
+def test_ndjson_socket_protocol(tmp_path):
+    path = str(tmp_path / "s.sock")
+
+    async def main():
+        async with SessionManager(workers=1) as m:
+            server = await m.serve(path)
+            async with server:
+                reader, writer = await asyncio.open_unix_connection(path)
+
+                async def call(req):
+                    writer.write((json.dumps(req) + "\n").encode())
+                    await writer.drain()
+                    return json.loads(await reader.readline())
+
+                new = await call({"id": 1, "op": "new"})
+                sid = new["session"]
+                assert sum(v > 0 for r in new["grid"] for v in r) == 2
+                ai = await call({"id": 2, "op": "ai", "session": sid, "depth": 1})
+                assert ai["move"] in ("left", "up", "right", "down") and ai["score"] >= 0
+                assert "error" in await call({"id": 3, "op": "move", "session": sid, "dir": "x"})
+                assert "error" in await call({"id": 4, "op": "state", "session": "ei"})
+                assert (await call({"id": 5, "op": "close", "session": sid}))["closed"] == sid
+                writer.close()
+                await writer.wait_closed()
+    _run(main())
+
+
+def test_handle_validates_size_and_depth_and_picks_backend():
+    async def main():
+        async with SessionManager(workers=1) as m:
+            big = await m.handle({"id": 1, "op": "new", "size": 5})
+            assert len(big["grid"]) == 5 and m.sessions[big["session"]].state.backend == "grid"
+            small = await m.handle({"id": 2, "op": "new"})
+            assert m.sessions[small["session"]].state.backend == "bitboard"
+            assert "error" in await m.handle({"op": "new", "size": 5, "backend": "bitboard"})
+            for size in (1, 7, 10 ** 9, 4.5, "4", True, float("inf"), float("nan")):
+                assert "error" in await m.handle({"op": "new", "size": size}), size
+            sid = small["session"]
+            for depth in (0, 7, 10 ** 9, 2.5, "3", None, float("inf"), float("nan")):
+                reply = await m.handle({"id": 3, "op": "ai", "session": sid, "depth": depth})
+                assert reply["id"] == 3 and "error" in reply, depth
+            assert not m._waiting and m._free == 1   # hylätty pyyntö ei varaa paikkaa
+            reply = await m.handle({"op": "ai", "session": big["session"], "depth": 1})
+            assert reply["move"] in ("left", "up", "right", "down")
+    _run(main())
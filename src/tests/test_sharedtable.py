@@ -0,0 +1,122 @@
+"""Jaetun transpositiotaulun pytest-testit."""
+
+import multiprocessing
+import pytest
+import src.board as board
+import src.expectiminimax as ex
+import src.parallel as par
+from src.sharedtable import HEADER, SLOT, WAYS, SharedTranspositionTable
+
+
+@pytest.fixture
+def table():
+    with SharedTranspositionTable(slots=64) as t:
+        yield t
+
+
+def test_get_requires_exact_depth(table):
+    table.put(12345, 3, 1.5)
+    table.new_search()
+    assert table.get(12345, 3) == 1.5
+    assert table.get(12345, 1) is None     # syvempi tulos ei vastaa matalampaan
+    assert table.get(12345, 4) is None     # eikä matalampi syvempään
+    assert table.get(999, 0) is None
+    assert (table.hits, table.misses) == (1, 3)
+    assert table.hit_rate() == 0.25
+
+
+def test_depths_are_separate_entries(table):
+    table.put(7, 5, 1.0)
+    table.put(7, 2, 9.0)
+    assert table.get(7, 5) == 1.0
+    assert table.get(7, 2) == 9.0
+    table.put(7, 5, 2.0)
+    assert table.get(7, 5) == 2.0
+    assert len(table) == 2
+
+
+def test_65_bit_keys_are_distinct(table):
+    b = (1 << 64) - 3
+    table.put(b << 1, 2, 1.0)
+    table.put((b << 1) | 1, 2, 2.0)
+    table.put(((b << 1) | 1) & ((1 << 64) - 1), 2, 3.0)
+    assert table.get(b << 1, 2) == 1.0
+    assert table.get((b << 1) | 1, 2) == 2.0
+
+
+def test_replacement_prefers_old_generation_then_shallow():
+    with SharedTranspositionTable(slots=WAYS) as t:   # yksi lohko
+        t.put(1, 5, 1.0)
+        t.new_search()
+        for k, d in ((2, 1), (3, 4), (4, 6)):
+            t.put(k, d, float(k))
+        t.put(5, 2, 5.0)       # korvaa vanhan sukupolven merkinnän (1), vaikka se on syvin
+        assert t.get(1, 5) is None and t.get(5, 2) == 5.0
+        t.put(6, 3, 6.0)       # nyt kaikki nykyisiä: korvataan matalin (2)
+        assert t.get(2, 1) is None
+        assert [t.get(k, d) for k, d in ((3, 4), (4, 6), (6, 3))] == [3.0, 4.0, 6.0]
+
+
+def test_torn_entry_reads_as_miss(table):
+    table.put(42, 2, 1.25)
+    raw = table._shm.buf
+    for off in range(HEADER.size, HEADER.size + table.slots * SLOT.size, SLOT.size):
+        if raw[off:off + SLOT.size] != bytes(SLOT.size):
+            raw[off + 16] ^= 0xFF   # revitty arvo: tarkiste ei enää täsmää
+    assert table.get(42, 2) is None
+
+
+def test_attached_table_shares_entries_and_generation(table):
+    other = SharedTranspositionTable.attach(table.name)
+    try:
+        table.new_search()
+        table.put(11, 3, 4.0)
+        other.new_search()
+        assert other.generation == table.generation
+        assert other.get(11, 3) == 4.0
+        other.put(12, 1, 5.0)
+        assert table.get(12, 1) == 5.0
+        other.clear()                  # liittynyt ei tyhjennä jaettua muistia
+        assert table.get(11, 3) == 4.0
+        table.clear()
+        assert other.get(11, 3) is None
+    finally:
+        other.close()
+
+
+def _worker_put(name, keys):
+    t = SharedTranspositionTable.attach(name)
+    t.new_search()
+    for k in keys:
+        t.put(k, 1, float(k))
+    t.close()
+
+
+def test_entries_written_by_other_process_are_visible():
+    with SharedTranspositionTable(slots=1024) as t:
+        t.new_search()
+        p = multiprocessing.Process(target=_worker_put, args=(t.name, range(1, 101)))
+        p.start()
+        p.join()
+        assert p.exitcode == 0
+        assert all(t.get(k, 1) == float(k) for k in range(1, 101))
+
+
+@pytest.mark.parametrize("split_chance", [False, True])
+def test_parallel_with_shared_table_matches_serial(split_chance):
+    grid = [[2, 4, 8, 16], [4, 8, 16, 2], [0, 2, 4, 0], [0, 0, 2, 0]]
+    s = board.GameState([r[:] for r in grid], score=40)
+    try:
+        par.clear_caches()
+        ex.cache.exact_depth = True
+        serial = ex.best_move_expecti(s, depth=3, backend="bitboard")
+        with SharedTranspositionTable(size_mb=4) as t:
+            assert par.best_move_parallel(s, depth=3, workers=2, split_chance=split_chance,
+                                          shared_table=t) == serial
+            assert len(t) > 0
+            # Toinen haku samalla taululla: kelpaa yhä, nyt osumin.
+            assert par.best_move_parallel(s, depth=3, workers=2, split_chance=split_chance,
+                                          shared_table=t) == serial
+    finally:
+        ex.cache.exact_depth = False
+        par.shutdown_pool()
@@ -0,0 +1,157 @@
+"""Taulukkovälimuistin (tablecache.py) pytest-testit."""
+
+import os
+import subprocess
+import sys
+import pytest
+
+from src import bitboard, heuristics, tablecache
+from src.tablecache import TableFile, cached, code_digest, save
+
+TABLES = {"pieni": [0, 1, 2, 65535], "leveä": [0, 1 << 70, (1 << 190) - 1, 5],
+          "lippu": [True, False, True, True]}
+
+
+def test_save_and_mmap_round_trip(tmp_path):
+    path = str(tmp_path / "t.tbl")
+    digest = code_digest("t", 1)
+    save(path, digest, TABLES)
+    with TableFile(path, digest) as tf:
+        assert tf.names == list(TABLES)
+        for name, values in TABLES.items():
+            assert tf.list(name) == values
+        assert [type(v) for v in tf.list("lippu")] == [bool] * 4
+        (words,) = tf.view("pieni")
+        assert words.readonly and words.format == "Q" and words.tolist() == TABLES["pieni"]
+        assert len(tf.view("leveä")) == 3
+
+
+def test_rejects_foreign_and_mismatched_files(tmp_path):
+    path = str(tmp_path / "t.tbl")
+    save(path, code_digest("a"), TABLES)
+    with pytest.raises(ValueError):
+        TableFile(path, code_digest("b"))
+    (tmp_path / "x.tbl").write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        TableFile(str(tmp_path / "x.tbl"))
+
+
+def test_digest_depends_on_code_and_parameters():
+    def f():
+        return 1
+
+    def g():
+        return 2
+
+    assert code_digest(f, 4) == code_digest(f, 4)
+    assert code_digest(f, 4) != code_digest(g, 4)
+    assert code_digest(f, 4) != code_digest(f, 5)
+
+
+def test_digest_ignores_file_name_and_line_numbers():
+    src = "def f(x):\n    return [y in {'a', 'b'} for y in x] + [lambda: 3]\n"
+    a, b = {}, {}
+    exec(compile(src, "/koti/a/tablecache.py", "exec"), a)
+    exec(compile("\n\n" + src, "/toinen/polku/tablecache.py", "exec"), b)
+    assert code_digest(a["f"]) == code_digest(b["f"])
+    c = {}
+    exec(compile(src.replace("3", "4"), "/koti/a/tablecache.py", "exec"), c)
+    assert code_digest(a["f"]) != code_digest(c["f"])  # sisäkkäisen koodin vakio
+
+
+def test_digest_is_stable_across_hash_seeds():
+    code = ("import src.bitboard as b, src.tablecache as t; "
+            "print(t.code_digest(b._build_tables, lambda v: v in {'x', 'y', 'z'}).hex())")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    out = {subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root,
+                          env={**os.environ, "PYTHONHASHSEED": seed}, check=True).stdout
+           for seed in ("1", "2", "3")}
+    assert len(out) == 1
+
+
+def test_cached_builds_once_then_loads(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALTE2048_CACHE_DIR", str(tmp_path))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"a": [1, 2, 3]}
+
+    assert cached("koe", build, "v1") == {"a": [1, 2, 3]}
+    assert cached("koe", build, "v1") == {"a": [1, 2, 3]}
+    assert len(calls) == 1
+    # Muuttunut parametri: uusi tiedosto; toisen tiivisteen tiedosto säilyy.
+    cached("koe", build, "v2")
+    assert len(calls) == 2 and len(list(tmp_path.glob("koe-*.tbl"))) == 2
+    cached("koe", build, "v1")
+    assert len(calls) == 2
+    # Rikkinäinen tiedosto rakennetaan uudelleen.
+    f = tmp_path / f"koe-{code_digest('koe', 'v2').hex()[:16]}.tbl"
+    f.write_bytes(f.read_bytes()[:60])
+    assert cached("koe", build, "v2") == {"a": [1, 2, 3]} and len(calls) == 3
+    monkeypatch.setenv("ALTE2048_NO_TABLE_CACHE", "1")
+    cached("koe", build, "v2")
+    assert len(calls) == 4
+
+
+def test_cold_tables_are_mmap_views(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALTE2048_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(tablecache, "_open_files", [])
+    for _ in range(2):   # rakennus ja lataus antavat samat tyypit
+        tables = cached("koe", lambda: dict(TABLES), "v1", hot={"lippu"})
+        assert type(tables["lippu"]) is list
+        assert isinstance(tables["pieni"], memoryview) and tables["pieni"].readonly
+        assert tables["pieni"].tolist() == TABLES["pieni"]
+        assert tables["leveä"] == TABLES["leveä"]   # monisanainen on aina lista
+    assert len(tablecache._open_files) == 2
+    assert type(cached("koe", lambda: dict(TABLES), "v1")["pieni"]) is list
+    assert len(tablecache._open_files) == 2      # kaikki listoina: tiedosto suljettu
+    for tf in tablecache._open_files:
+        tf.close()
+
+
+def test_unused_files_of_other_digests_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALTE2048_CACHE_DIR", str(tmp_path))
+    build = lambda: {"a": [1, 2, 3]}
+    cached("koe", build, "v1")
+    cached("koe", build, "v2")
+    cached("muu", build, "v1")
+    old = tmp_path / f"koe-{code_digest('koe', 'v1').hex()[:16]}.tbl"
+    recent = tmp_path / f"koe-{code_digest('koe', 'v2').hex()[:16]}.tbl"
+    other = tmp_path / f"muu-{code_digest('muu', 'v1').hex()[:16]}.tbl"
+    stale = os.path.getmtime(old) - (tablecache.MAX_AGE_DAYS + 1) * 24 * 3600
+    for f in (old, other):
+        os.utime(f, (stale, stale))
+    cached("koe", build, "v3")   # uusi tiedosto karsii vanhat saman nimen tiedostot
+    assert not old.exists() and recent.exists() and other.exists()
+    assert len(list(tmp_path.glob("koe-*.tbl"))) == 2
+    cached("muu", build, "v1")   # käyttö päivittää iän
+    assert os.path.getmtime(other) > stale + 24 * 3600
+
+
+def test_module_tables_match_fresh_build():
+    fresh = bitboard._build_tables()
+    loaded = (bitboard._ROW_LEFT, bitboard._ROW_RIGHT, bitboard._COL_UP, bitboard._COL_DOWN,
+              bitboard._GAIN_LEFT, bitboard._GAIN_RIGHT, bitboard._ROW_EMPTY, bitboard._ROW_STUCK)
+    assert all(a == list(b) for a, b in zip(fresh, loaded))
+    rows, cols, row_max = heuristics._build_eval_tables()
+    assert rows == heuristics._EVAL_ROWS and cols == heuristics._EVAL_COL
+    assert row_max == heuristics._ROW_MAX
+
+
+def test_cli_import_does_not_load_search_stack():
+    code = ("import sys, src.cli; "
+            "print(any(m in sys.modules for m in "
+            "('src.expectiminimax', 'src.heuristics', 'src.bitboard', 'numpy')))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                         check=True).stdout
+    assert out.strip() == "False"
+
+
+def test_cache_dir_from_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("ALTE2048_CACHE_DIR", str(tmp_path))
+    assert tablecache.cache_dir() == str(tmp_path)
+    monkeypatch.delenv("ALTE2048_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert tablecache.cache_dir() == os.path.join(str(tmp_path), "alte2048")
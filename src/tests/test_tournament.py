@@ -0,0 +1,81 @@
+"""Itsepeliturnauksen pytest-testit."""
+
+import src.expectiminimax as ex
+import src.heuristics as h
+import src.tournament as tour
+from src.tournament import GameResult, Settings, TournamentStats
+
+FAST = Settings(depth=1)
+
+
+def test_play_game_is_deterministic_per_seed():
+    a = tour.play_game(3, FAST)
+    b = tour.play_game(3, FAST)
+    assert (a.score, a.max_tile, a.moves) == (b.score, b.max_tile, b.moves)
+    assert a.moves > 0 and a.max_tile >= 4
+    assert a.nodes == b.nodes and a.nodes >= a.moves
+
+
+def test_play_game_weights_do_not_touch_module_or_evaluator():
+    orig = h.get_weights()
+    plain = tour.play_game(0, FAST)
+    weighted = tour.play_game(0, Settings(depth=1, weights={"empty": 0.0, "snake": 5.0}))
+    assert h.get_weights() == orig
+    assert ex._evaluator is None and ex.evaluate is h.evaluate and ex._incremental
+    assert (weighted.score, weighted.moves) != (plain.score, plain.moves)
+    again = tour.play_game(0, FAST)
+    assert (again.score, again.moves) == (plain.score, plain.moves)
+
+
+def test_play_game_keeps_callers_evaluator():
+    own = h.Heuristic({"merge": 4.0})
+    ex.set_evaluator(own)
+    try:
+        tour.play_game(0, Settings(depth=1, weights={"empty": 1.0}))
+        assert ex._evaluator is own and ex.evaluate == own.evaluate
+    finally:
+        ex.set_evaluator(None)
+
+
+def test_stats_aggregate_incrementally():
+    st = TournamentStats()
+    for r in [GameResult(0, 1000, 128, 100, 1.0, 500),
+              GameResult(1, 3000, 256, 300, 2.0, 1500),
+              GameResult(2, 2000, 256, 200, 1.0, 1000)]:
+        st.add(r)
+    assert st.games == 3
+    assert st.mean_score == 2000
+    assert abs(st.std_score - 1000) < 1e-9
+    assert (st.score_min, st.score_max) == (1000, 3000)
+    assert st.moves_per_game == 200
+    assert st.moves_per_second == 150
+    assert st.nodes_per_move == 5
+    assert st.max_tiles == {128: 1, 256: 2}
+    assert st.tile_rate(256) == 2 / 3
+    assert st.tile_rate(128) == 1.0
+
+
+def test_run_tournament_workers_match_in_process():
+    serial = {r.seed: r for r in tour.run_tournament(3, FAST, workers=1, seed=10)}
+    pooled = {r.seed: r for r in tour.run_tournament(3, FAST, workers=2, seed=10)}
+    assert sorted(serial) == [10, 11, 12]
+    for seed in serial:
+        assert (serial[seed].score, serial[seed].moves) == (pooled[seed].score, pooled[seed].moves)
+
+
+def test_parse_weights():
+    assert tour.parse_weights(None) is None
+    assert tour.parse_weights("empty=9, snake=1.5") == {"empty": 9.0, "snake": 1.5}
+
+
+def test_main_prints_summary(capsys):
+    tour.main(["--games", "2", "--workers", "1", "--depth", "1", "--quiet"])
+    out = capsys.readouterr().out
+    assert "Pelejä: 2" in out
+    assert "Suurin laatta" in out
+
+
+def test_prob_cutoff_reduces_nodes_per_game():
+    plain = tour.play_game(1, Settings(depth=3))
+    cut = tour.play_game(1, Settings(depth=3, prob_cutoff=0.05))
+    assert cut.nodes / cut.moves < plain.nodes / plain.moves
@@ -0,0 +1,81 @@
+"""Transpositiotaulun pytest-testit."""
+
+from src.ttable import TranspositionTable
+
+
+def test_deeper_result_answers_shallower_query():
+    tt = TranspositionTable()
+    tt.put("k", 3, 1.5)
+    assert tt.get("k", 3) == 1.5
+    assert tt.get("k", 1) == 1.5      # syvempi tulos vastaa matalampaan
+    assert tt.get("k", 4) is None     # mutta matalampi ei syvempään
+    assert tt.get("x", 0) is None
+    assert (tt.hits, tt.misses) == (2, 2)
+    assert tt.hit_rate() == 0.5
+
+def test_same_depth_first_then_deepest():
+    tt = TranspositionTable()
+    tt.put("k", 3, 1.5)
+    tt.put("k", 5, 2.5)
+    tt.new_search()
+    assert tt.get("k", 2) == 2.5      # syvin tulos
+    assert tt.get("k", 4) == 2.5
+    assert tt.get("k", 3) == 1.5      # sama syvyys ensin
+    assert tt.get("k", 6) is None
+    tt.put("k", 2, 9.0)               # syvempi ei estä matalamman tallennusta
+    assert tt.get("k", 2) == 9.0
+
+def test_exact_depth_answer_does_not_depend_on_history():
+    tt = TranspositionTable(exact_depth=True)
+    tt.put("k", 3, 1.5)
+    tt.new_search()
+    assert tt.get("k", 2) is None     # aiemman haun syvempikään ei kelpaa
+    assert tt.get("k", 3) == 1.5
+
+def test_depths_are_separate_entries():
+    tt = TranspositionTable()
+    tt.put("k", 5, 1.0)
+    tt.put("k", 2, 9.0)
+    assert tt.get("k", 5) == 1.0
+    assert tt.get("k", 2) == 9.0
+    tt.put("k", 5, 2.0)
+    assert tt.get("k", 5) == 2.0
+    assert len(tt) == 1
+
+def test_new_search_ages_out_unused_entries():
+    tt = TranspositionTable(max_age=1)
+    tt.put("old", 1, 1.0)
+    tt.put("used", 1, 2.0)
+    tt.put("used", 3, 3.0)
+    tt.new_search()
+    assert tt.get("used", 1) == 2.0   # osuma päivittää sukupolven
+    tt.new_search()
+    assert "used" in tt
+    assert "old" not in tt
+    assert len(tt) == 1
+    assert tt.get("used", 3) is None  # saman aseman käyttämätön syvyys poistuu
+
+def test_new_search_resets_per_search_counters():
+    tt = TranspositionTable()
+    tt.put("k", 1, 1.0)
+    tt.get("k", 1)
+    tt.get("y", 1)
+    tt.new_search()
+    assert (tt.hits, tt.misses) == (0, 0)
+    assert (tt.total_hits, tt.total_misses) == (1, 1)
+    assert tt.hit_rate() == 0.0
+
+def test_size_limit_clears_table():
+    tt = TranspositionTable(max_entries=2)
+    for k in range(3):
+        tt.put(k, 1, 0.0)
+    tt.new_search()
+    assert len(tt) == 0
+
+def test_clear_resets_everything():
+    tt = TranspositionTable()
+    tt.put("k", 1, 1.0)
+    tt.get("k", 1)
+    tt.new_search()
+    tt.clear()
+    assert len(tt) == 0 and tt.generation == 0 and tt.total_hits == 0
@@ -0,0 +1,62 @@
+"""Painojen virittimen pytest-testit."""
+
+import json
+import pytest
+import src.heuristics as h
+import src.tuner as tuner
+from src.tournament import Settings, parse_weights
+
+FAST = Settings(depth=1)
+CONFIG = {"games": 1, "depth": 1, "seed": 0, "prob_cutoff": 0.0}
+
+
+def test_evaluate_candidates_uses_same_seeds_and_keeps_weights():
+    orig = h.get_weights()
+    a, b, c = tuner.evaluate_candidates([orig, {**orig, "empty": 0.0}, orig], FAST, games=2)
+    assert h.get_weights() == orig
+    assert a.games == b.games == c.games == 2
+    assert (a.score_sum, a.moves) == (c.score_sum, c.moves)
+
+
+def test_initial_state_fills_missing_weights_and_steps():
+    st = tuner.initial_state(CONFIG, {"corner": 0.0}, step=0.5)
+    assert set(st.weights) == set(h._WEIGHT_NAMES)
+    assert st.weights["corner"] == 0.0 and st.steps["corner"] == 0.5
+    assert st.steps["empty"] == 0.5 * h.get_weights()["empty"]
+
+
+def test_tune_checkpoints_and_resumes(tmp_path):
+    path = str(tmp_path / "viritys.json")
+    logs = []
+    st = tuner.tune(tuner.initial_state(CONFIG), rounds=1, checkpoint=path, log=logs.append)
+    assert (st.round, st.index) == (1, 0)
+    assert len(st.history) == 1 + 2 * len(h._WEIGHT_NAMES)
+    assert st.fitness == max(r["mean_score"] for r in st.history)
+
+    loaded = tuner.load_checkpoint(path)
+    assert loaded == st
+    # Jo tehdyt kierrokset ohitetaan: ei uusia pelejä.
+    again = tuner.tune(loaded, rounds=1, log=logs.append)
+    assert len(again.history) == len(st.history)
+
+
+def test_load_checkpoint_rejects_unknown_version(tmp_path):
+    path = tmp_path / "x.json"
+    path.write_text(json.dumps({"version": 99}))
+    with pytest.raises(ValueError):
+        tuner.load_checkpoint(str(path))
+
+
+def test_format_weights_round_trips():
+    w = {"empty": 9.0, "snake": 1.25}
+    assert parse_weights(tuner.format_weights(w)) == w
+
+
+def test_main_prints_weights_and_report(tmp_path, capsys):
+    path = str(tmp_path / "v.json")
+    tuner.main(["--games", "1", "--depth", "1", "--rounds", "0", "--workers", "1",
+                "--checkpoint", path, "--report-depths", "1"])
+    out = capsys.readouterr().out
+    assert "Painot: empty=" in out and "viritetty" in out
+    with pytest.raises(SystemExit):
+        tuner.main(["--games", "2", "--depth", "1", "--checkpoint", path, "--resume"])
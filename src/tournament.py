@@ -0,0 +1,284 @@
+"""Monen pelin itsepeliturnaus työprosesseilla.
+
+Pelaa N siemennettyä peliä rinnakkain ja kokoaa tuloksista tilastot
+(pisteet, suurimman laatan jakauma, siirrot per peli, siirrot sekunnissa,
+seinäkelloaika). Tulokset virtaavat sitä mukaa kuin pelit valmistuvat, ja
+kooste päivitetään inkrementaalisesti, joten pelejä ei pidetä muistissa.
+
+Jokainen peli on toistettava: siemen määrää syntyvät laatat, ja haun
+transpositiotaulu tyhjennetään pelin alussa.
+
+Käyttö komentoriviltä:
+    python -m src.tournament --games 1000 --workers 8 --depth 3
+
+Argumentit:
+- --games: Pelien määrä.
+- --workers: Työprosessien määrä (1 = samassa prosessissa).
+- --depth: Haun syvyys.
+- --backend: Lautatoteutus ("bitboard" tai "grid").
+- --time-ms: Siirtokohtainen aikabudjetti (iteratiivinen syvennys).
+- --prob-cutoff: CHANCE-solmujen polun todennäköisyysraja (0 = pois).
+- --weights: Heuristiikan painot, esim. "empty=9,snake=1.2".
+- --seed: Ensimmäisen pelin siemen (pelit käyttävät siemeniä seed, seed+1, ...).
+- --record: Tallenna pelit tiedostoon (ks. gamerecord.py); työprosessit
+  kirjoittavat omiin osatiedostoihinsa PATH-<pid>.
+- --quiet: Älä tulosta jokaista peliä.
+"""
+
+from __future__ import annotations
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+from . import expectiminimax as ex
+from . import heuristics
+from .board import Backend, new_game
+from .gamerecord import GameRecordWriter
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Yhden turnauksen pelaajan asetukset.
+
+    Attributes:
+        depth: Haun perussyvyys.
+        backend: Lautatoteutus.
+        symmetry: Kanonisoidaanko välimuistiavaimet.
+        time_ms: Siirtokohtainen aikabudjetti (None = kiinteä syvyys).
+        weights: Heuristiikan painot nimillä (None = oletukset).
+        prob_cutoff: Polun todennäköisyysraja (0 = ei karsintaa).
+        record: Pelitallenteen polku (None = ei tallenneta).
+    """
+    depth: int = 3
+    backend: Backend = "bitboard"
+    symmetry: bool = False
+    time_ms: Optional[float] = None
+    weights: Optional[Dict[str, float]] = None
+    prob_cutoff: float = 0.0
+    record: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class GameResult:
+    """Yhden pelin tulos (nodes = haun solmut yhteensä)."""
+    seed: int
+    score: int
+    max_tile: int
+    moves: int
+    seconds: float
+    nodes: int = 0
+
+
+_writers: Dict[str, GameRecordWriter] = {}
+
+
+def record_path(path: str) -> str:
+    """Prosessin tallennetiedosto: työprosessit kirjoittavat omiin osiinsa PATH-<pid>."""
+    if multiprocessing.parent_process() is None:
+        return path
+    return f"{path}-{os.getpid()}"
+
+
+def _writer(path: str) -> GameRecordWriter:
+    """Prosessin avoin kirjoittaja (pidetään auki pelien yli)."""
+    path = record_path(path)
+    w = _writers.get(path)
+    if w is None:
+        w = _writers[path] = GameRecordWriter(path)
+    return w
+
+
+def close_records() -> None:
+    """Sulkee prosessin tallennekirjoittajat."""
+    while _writers:
+        _writers.popitem()[1].close()
+
+
+def play_game(seed: int, settings: Settings) -> GameResult:
+    """Pelaa yhden täyden pelin annetulla siemenellä.
+
+    Painot (settings.weights) sidotaan haulle arvioijaksi vain pelin ajaksi
+    (ex.using_evaluator); moduulin painoja ei muuteta.
+    """
+    if settings.weights is None:
+        return _play_game(seed, settings)
+    with ex.using_evaluator(heuristics.Heuristic(settings.weights)):
+        return _play_game(seed, settings)
+
+
+def _play_game(seed: int, settings: Settings) -> GameResult:
+    ex.cache.clear()
+    random.seed(seed)
+    t0 = time.perf_counter()
+    s = new_game(backend=settings.backend)
+    rec = _writer(settings.record) if settings.record else None
+    if rec is not None:
+        rec.begin_game(seed, s.grid)
+    moves = nodes = 0
+    while not s.over:
+        n0 = ex._nodes
+        if settings.time_ms is not None:
+            d, _ = ex.best_move_iterative(s, time_ms=settings.time_ms,
+                                          backend=settings.backend, symmetry=settings.symmetry,
+                                          prob_cutoff=settings.prob_cutoff)
+            nodes += ex._nodes  # iteratiivinen haku nollaa laskurin
+        else:
+            d, _ = ex.best_move_expecti(s, depth=settings.depth,
+                                        backend=settings.backend, symmetry=settings.symmetry,
+                                        prob_cutoff=settings.prob_cutoff)
+            nodes += ex._nodes - n0
+        before = [r[:] for r in s.grid] if rec is not None else None
+        if not s.move(d):
+            break  # ei laillista siirtoa (haku palauttaa "left")
+        if rec is not None:
+            rec.add_move(before, d, s.grid)
+        moves += 1
+    if rec is not None:
+        rec.end_game()
+    return GameResult(seed, s.score, max(v for r in s.grid for v in r), moves,
+                      time.perf_counter() - t0, nodes)
+
+
+def _play_task(args) -> GameResult:
+    return play_game(*args)
+
+
+@dataclass
+class TournamentStats:
+    """Inkrementaalinen kooste tuloksista (muisti ei kasva pelien mukana)."""
+    games: int = 0
+    score_sum: float = 0.0
+    score_sq_sum: float = 0.0
+    score_min: Optional[int] = None
+    score_max: Optional[int] = None
+    moves: int = 0
+    nodes: int = 0
+    game_seconds: float = 0.0
+    max_tiles: Counter = field(default_factory=Counter)
+
+    def add(self, r: GameResult) -> None:
+        self.games += 1
+        self.score_sum += r.score
+        self.score_sq_sum += r.score * r.score
+        self.score_min = r.score if self.score_min is None else min(self.score_min, r.score)
+        self.score_max = r.score if self.score_max is None else max(self.score_max, r.score)
+        self.moves += r.moves
+        self.nodes += r.nodes
+        self.game_seconds += r.seconds
+        self.max_tiles[r.max_tile] += 1
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_sum / self.games if self.games else 0.0
+
+    @property
+    def std_score(self) -> float:
+        if self.games < 2:
+            return 0.0
+        var = (self.score_sq_sum - self.score_sum ** 2 / self.games) / (self.games - 1)
+        return math.sqrt(max(0.0, var))
+
+    @property
+    def moves_per_game(self) -> float:
+        return self.moves / self.games if self.games else 0.0
+
+    @property
+    def nodes_per_move(self) -> float:
+        return self.nodes / self.moves if self.moves else 0.0
+
+    @property
+    def moves_per_second(self) -> float:
+        """Siirrot sekunnissa yhtä työprosessia kohden."""
+        return self.moves / self.game_seconds if self.game_seconds else 0.0
+
+    def tile_rate(self, tile: int) -> float:
+        """Osuus peleistä, joissa saavutettiin vähintään laatta tile."""
+        if not self.games:
+            return 0.0
+        return sum(n for t, n in self.max_tiles.items() if t >= tile) / self.games
+
+
+def run_tournament(games: int, settings: Settings, workers: int = 1,
+                   seed: int = 0) -> Iterator[GameResult]:
+    """Pelaa pelit siemenillä seed..seed+games-1 ja tuottaa tulokset valmistumisjärjestyksessä."""
+    tasks = ((seed + i, settings) for i in range(games))
+    if workers <= 1:
+        try:
+            yield from map(_play_task, tasks)
+        finally:
+            close_records()
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(_play_task, tasks)
+
+
+def parse_weights(text: Optional[str]) -> Optional[Dict[str, float]]:
+    """Jäsentää muodon "empty=9,snake=1.2" sanakirjaksi."""
+    if not text:
+        return None
+    out = {}
+    for part in text.split(","):
+        name, _, value = part.partition("=")
+        out[name.strip()] = float(value)
+    return out
+
+
+def print_summary(st: TournamentStats, wall: float) -> None:
+    """Tulostaa turnauksen koosteen."""
+    print(f"\nPelejä: {st.games} | seinäkelloaika {wall:.1f} s"
+          f" | {st.games / wall if wall else 0.0:.2f} peliä/s")
+    print(f"Pisteet: ka {st.mean_score:.0f} ± {st.std_score:.0f}"
+          f" | min {st.score_min} | max {st.score_max}")
+    print(f"Siirrot: {st.moves_per_game:.0f}/peli | {st.moves_per_second:.0f} siirtoa/s/prosessi"
+          f" | {st.moves / wall if wall else 0.0:.0f} siirtoa/s yhteensä"
+          f" | {st.nodes_per_move:.0f} solmua/siirto")
+    print("Suurin laatta:")
+    for tile in sorted(st.max_tiles):
+        print(f"  {tile:>6}: {st.max_tiles[tile]:>6} ({100 * st.max_tiles[tile] / st.games:5.1f} %)"
+              f"  ≥{tile}: {100 * st.tile_rate(tile):5.1f} %")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Pelaa joukko siemennettyjä 2048-pelejä rinnakkain.")
+    ap.add_argument("--games", type=int, default=100, help="pelien määrä")
+    ap.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                    help="työprosessien määrä")
+    ap.add_argument("--depth", type=int, default=3, help="haun syvyys")
+    ap.add_argument("--backend", choices=("grid", "bitboard"), default="bitboard",
+                    help="lautatoteutus")
+    ap.add_argument("--symmetry", action="store_true", help="kanonisoi välimuistiavaimet")
+    ap.add_argument("--time-ms", type=float, default=None,
+                    help="siirtokohtainen aikabudjetti (iteratiivinen syvennys)")
+    ap.add_argument("--prob-cutoff", type=float, default=0.0,
+                    help="CHANCE-solmujen polun todennäköisyysraja (0 = pois)")
+    ap.add_argument("--weights", default=None, help='heuristiikan painot, esim. "empty=9,snake=1.2"')
+    ap.add_argument("--seed", type=int, default=0, help="ensimmäisen pelin siemen")
+    ap.add_argument("--record", default=None,
+                    help="tallenna pelit tiedostoon (python -m src.gamerecord info ...)")
+    ap.add_argument("--quiet", action="store_true", help="älä tulosta jokaista peliä")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    settings = Settings(depth=args.depth, backend=args.backend, symmetry=args.symmetry,
+                        time_ms=args.time_ms, weights=parse_weights(args.weights),
+                        prob_cutoff=args.prob_cutoff, record=args.record)
+    st = TournamentStats()
+    t0 = time.perf_counter()
+    for r in run_tournament(args.games, settings, workers=args.workers, seed=args.seed):
+        st.add(r)
+        if not args.quiet:
+            print(f"[{st.games}/{args.games}] siemen {r.seed}: pisteet {r.score},"
+                  f" suurin {r.max_tile}, siirtoja {r.moves} ({r.seconds:.1f} s)", flush=True)
+    print_summary(st, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
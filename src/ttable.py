@@ -0,0 +1,117 @@
+"""Hakujen yli säilyvä transpositiotaulu Expectiminimaxille.
+
+Taulu tallentaa jokaiselle avaimelle (asema + solmutyyppi) merkinnän
+syvyyttä kohden: kolmikon (arvo, tallennussukupolvi, käyttösukupolvi).
+
+- Arvo on suhteessa solmun pisteisiin (arvo - s.score), joten sama asema
+  eri pistemäärillä jakaa saman merkinnän.
+- Syvempi tulos kelpaa vastaukseksi matalampaan kyselyyn, mutta ei toisin
+  päin. Saman syvyyden merkintä on ensisijainen, muuten käytetään syvintä.
+  Eri syvyyksien tulokset ovat rinnakkain, joten syvempi merkintä ei estä
+  matalamman tallentamista.
+- exact_depth=True: vain saman syvyyden merkintä kelpaa. Arvo on silloin
+  aina sama kuin uudelleen laskettuna, joten tulos ei riipu välimuistin
+  historiasta; rinnakkaishaun työprosessit (parallel.py) käyttävät tätä.
+- Jokainen haku (new_search) aloittaa uuden sukupolven. Merkinnät, joihin
+  ei ole osuttu max_age edellisessä haussa, poistetaan siirtojen välillä.
+
+Osumat ja hudit lasketaan sekä viimeisimmälle haulle että kumulatiivisesti.
+"""
+
+from __future__ import annotations
+from typing import Dict, Hashable, Iterator, Optional, Tuple
+
+Entry = Tuple[float, int, int]  # (arvo, tallennettu, käytetty)
+
+
+class TranspositionTable:
+    """Syvyyden huomioiva, ikääntyvä transpositiotaulu.
+
+    Attributes:
+        exact_depth: Kelpaako vain saman syvyyden merkintä (ks. moduulin kuvaus).
+        max_age: Montako hakua merkintä saa olla käyttämättä ennen poistoa.
+        max_entries: Kokoraja; jos se ylittyy ikääntämisen jälkeenkin,
+            taulu tyhjennetään.
+        generation: Nykyisen haun järjestysnumero.
+        hits: Osumat viimeisimmässä haussa.
+        misses: Hudit viimeisimmässä haussa.
+        total_hits: Osumat yhteensä.
+        total_misses: Hudit yhteensä.
+    """
+
+    def __init__(self, max_age: int = 2, max_entries: int = 1_000_000,
+                 exact_depth: bool = False) -> None:
+        self.exact_depth = exact_depth
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Dict[int, Entry]] = {}
+        self.generation = 0
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._data)
+
+    def get(self, key: Hashable, depth: int) -> Optional[float]:
+        """Palauttaa tallennetun arvon, jos se kelpaa depth-syvyiseen kyselyyn."""
+        entries = self._data.get(key)
+        if entries is None:
+            self.misses += 1
+            return None
+        e = entries.get(depth)
+        if e is None and not self.exact_depth:
+            deeper = [d for d in entries if d > depth]
+            if deeper:
+                depth = max(deeper)
+                e = entries[depth]
+        if e is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if e[2] != self.generation:
+            entries[depth] = (e[0], e[1], self.generation)
+        return e[0]
+
+    def put(self, key: Hashable, depth: int, value: float) -> None:
+        """Tallentaa depth-syvyisen haun arvon."""
+        entries = self._data.get(key)
+        e = (value, self.generation, self.generation)
+        if entries is None:
+            self._data[key] = {depth: e}
+        else:
+            entries[depth] = e
+
+    def new_search(self) -> None:
+        """Aloittaa uuden haun: kasvattaa sukupolvea ja poistaa vanhentuneet."""
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+        self.generation += 1
+        oldest = self.generation - self.max_age
+        if self._data and oldest > 0:
+            kept = {}
+            for k, entries in self._data.items():
+                live = {d: e for d, e in entries.items() if e[2] >= oldest}
+                if live:
+                    kept[k] = live
+            self._data = kept
+        if len(self._data) > self.max_entries:
+            self._data.clear()
+
+    def clear(self) -> None:
+        """Tyhjentää taulun ja laskurit."""
+        self._data.clear()
+        self.generation = 0
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def hit_rate(self) -> float:
+        """Viimeisimmän haun osumaprosentti väliltä 0..1."""
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
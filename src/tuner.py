@@ -0,0 +1,255 @@
+"""Heuristiikan painojen viritys itsepelillä (koordinaattihaku).
+
+Painot (heuristics._WEIGHT_NAMES) käsitellään parametreina: ehdokas on
+sanakirja, joka välitetään pelille Settings.weightsina. Peli hakee
+ehdokkaan painoilla omalla arvioijallaan (heuristics.Heuristic), joten
+moduulin painoja ei muuteta missään prosessissa.
+
+Algoritmi on koordinaattihaku. Jokaisella kierroksella jokaista painoa
+kokeillaan askeleen verran ylös ja alas. Parempi ehdokas hyväksytään;
+muuten painon askel puolitetaan. Kaikki ehdokkaat pelaavat samat
+siemennetyt pelit (seed, seed+1, ...), joten ne kohtaavat samat laatat ja
+kohina erojen välillä pienenee. Hyvyys on keskipisteet.
+
+Saman koordinaatin ehdokkaiden kaikki pelit jaetaan yhdelle prosessipoolille
+kerralla. Tila tallennetaan JSON-tarkistuspisteeseen jokaisen koordinaatin
+jälkeen (atomisesti). --resume jatkaa siitä samoilla asetuksilla.
+
+Lopuksi tulostetaan painot --weights-muodossa sekä raportti nopeudesta ja
+pelivoimasta: oletus- ja viritetyt painot syvyyksillä --report-depths
+(keskipisteet, ≥2048-osuus, ms/siirto, solmua/siirto). Raportti pelaa eri
+siemenet kuin viritys, joten se mittaa painoja pelien ulkopuolella.
+
+Käyttö:
+    python -m src.tuner --games 200 --depth 2 --rounds 3 --workers 8 \\
+        --checkpoint viritys.json
+    python -m src.tuner --checkpoint viritys.json --resume
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import heuristics
+from .tournament import GameResult, Settings, TournamentStats, play_game
+
+Weights = Dict[str, float]
+
+CHECKPOINT_VERSION = 1
+
+
+@dataclass
+class TunerState:
+    """Virityksen tila (tallennetaan tarkistuspisteeseen).
+
+    Attributes:
+        config: Asetukset, joilla viritys aloitettiin (jatko vaatii samat).
+        weights: Paras löydetty painosarja.
+        steps: Painokohtaiset askeleet.
+        fitness: Parhaan painosarjan keskipisteet.
+        round: Nykyinen kierros (0-pohjainen).
+        index: Seuraavaksi kokeiltavan painon indeksi kierroksella.
+        history: Jokaisen arvioidun ehdokkaan tulos (ks. _summary).
+    """
+    config: dict
+    weights: Weights
+    steps: Weights
+    fitness: float = float("-inf")
+    round: int = 0
+    index: int = 0
+    history: List[dict] = field(default_factory=list)
+
+
+def _summary(weights: Weights, st: TournamentStats) -> dict:
+    return {
+        "weights": weights,
+        "mean_score": st.mean_score,
+        "std_score": st.std_score,
+        "tile_2048": st.tile_rate(2048),
+        "moves_per_second": st.moves_per_second,
+        "nodes_per_move": st.nodes_per_move,
+    }
+
+
+def _candidate_task(args) -> Tuple[int, GameResult]:
+    k, seed, settings = args
+    return k, play_game(seed, settings)
+
+
+def evaluate_candidates(candidates: List[Weights], settings: Settings, games: int,
+                        seed: int = 0, pool=None) -> List[TournamentStats]:
+    """Pelaa jokaisella painosarjalla samat games siemennettyä peliä.
+
+    Args:
+        candidates: Painosarjat.
+        settings: Pelaajan muut asetukset (weights korvataan).
+        games: Pelejä ehdokasta kohden (siemenet seed..seed+games-1).
+        pool: multiprocessing.Pool; None = tässä prosessissa.
+
+    Returns:
+        Ehdokkaiden tilastot samassa järjestyksessä.
+    """
+    tasks = [(k, seed + i, replace(settings, weights=w))
+             for k, w in enumerate(candidates) for i in range(games)]
+    results: Iterable[Tuple[int, GameResult]]
+    if pool is None:
+        results = map(_candidate_task, tasks)
+    else:
+        results = pool.imap_unordered(_candidate_task, tasks)
+    stats = [TournamentStats() for _ in candidates]
+    for k, r in results:
+        stats[k].add(r)
+    return stats
+
+
+def save_checkpoint(path: str, state: TunerState) -> None:
+    """Kirjoittaa tilan JSONina (korvataan atomisesti)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": CHECKPOINT_VERSION, **asdict(state)}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> TunerState:
+    """Lukee tarkistuspisteen; tuntematon versio -> ValueError."""
+    with open(path) as f:
+        doc = json.load(f)
+    if doc.pop("version", None) != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: tukematon tarkistuspisteen versio")
+    return TunerState(**doc)
+
+
+def initial_state(config: dict, weights: Optional[Weights] = None,
+                  step: float = 0.25) -> TunerState:
+    """Aloitustila: painot (puuttuvat nykyisistä) ja askel step * |paino|."""
+    w = {**heuristics.get_weights(), **(weights or {})}
+    steps = {name: step * abs(v) or step for name, v in w.items()}
+    return TunerState(config=config, weights=w, steps=steps)
+
+
+def tune(state: TunerState, rounds: int, checkpoint: Optional[str] = None,
+         workers: int = 1, log=print) -> TunerState:
+    """Jatkaa koordinaattihakua tilasta state, kunnes rounds kierrosta on tehty.
+
+    Tila tallennetaan checkpoint-tiedostoon jokaisen koordinaatin jälkeen.
+    """
+    cfg = state.config
+    settings = Settings(depth=cfg["depth"], prob_cutoff=cfg.get("prob_cutoff", 0.0))
+    names = list(state.weights)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        if state.fitness == float("-inf"):
+            st, = evaluate_candidates([state.weights], settings, cfg["games"], cfg["seed"], pool)
+            state.fitness = st.mean_score
+            state.history.append(_summary(state.weights, st))
+            log(f"lähtö: {state.fitness:.0f}")
+            if checkpoint:
+                save_checkpoint(checkpoint, state)
+        while state.round < rounds:
+            name = names[state.index]
+            step = state.steps[name]
+            cands = [{**state.weights, name: state.weights[name] + sign * step}
+                     for sign in (1, -1)]
+            stats = evaluate_candidates(cands, settings, cfg["games"], cfg["seed"], pool)
+            state.history.extend(_summary(w, st) for w, st in zip(cands, stats))
+            best = max(range(len(cands)), key=lambda k: stats[k].mean_score)
+            if stats[best].mean_score > state.fitness:
+                state.weights, state.fitness = cands[best], stats[best].mean_score
+                log(f"kierros {state.round + 1} {name}={state.weights[name]:.3g}:"
+                    f" {state.fitness:.0f} (parannus)")
+            else:
+                state.steps[name] = step / 2
+                log(f"kierros {state.round + 1} {name}: ei parannusta,"
+                    f" askel {state.steps[name]:.3g}")
+            state.index += 1
+            if state.index == len(names):
+                state.index, state.round = 0, state.round + 1
+            if checkpoint:
+                save_checkpoint(checkpoint, state)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return state
+
+
+def format_weights(w: Weights) -> str:
+    """Painot muodossa, jonka --weights (tournament, tuner) hyväksyy."""
+    return ",".join(f"{name}={value:.4g}" for name, value in w.items())
+
+
+def report(weights: Weights, depths: List[int], games: int, seed: int = 0,
+           workers: int = 1, log=print) -> List[Tuple[str, int, TournamentStats]]:
+    """Nopeus vs. pelivoima: oletus- ja viritetyt painot eri syvyyksillä."""
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    rows = []
+    try:
+        log(f"{'painot':<10}{'syvyys':>7}{'pisteet':>10}{'≥2048':>8}"
+            f"{'ms/siirto':>11}{'solmua/siirto':>15}")
+        for depth in depths:
+            stats = evaluate_candidates([heuristics.get_weights(), weights],
+                                        Settings(depth=depth), games, seed, pool)
+            for label, st in zip(("oletus", "viritetty"), stats):
+                ms = 1000 / st.moves_per_second if st.moves_per_second else 0.0
+                log(f"{label:<10}{depth:>7}{st.mean_score:>10.0f}{100 * st.tile_rate(2048):>7.0f}%"
+                    f"{ms:>11.2f}{st.nodes_per_move:>15.0f}")
+                rows.append((label, depth, st))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return rows
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Viritä heuristiikan painot itsepelillä.")
+    ap.add_argument("--games", type=int, default=100, help="pelejä ehdokasta kohden")
+    ap.add_argument("--depth", type=int, default=2, help="haun syvyys virityksessä")
+    ap.add_argument("--prob-cutoff", type=float, default=0.0,
+                    help="CHANCE-solmujen polun todennäköisyysraja")
+    ap.add_argument("--rounds", type=int, default=3, help="koordinaattikierrosten määrä")
+    ap.add_argument("--step", type=float, default=0.25, help="alkuaskel suhteessa painoon")
+    ap.add_argument("--seed", type=int, default=0, help="ensimmäisen pelin siemen")
+    ap.add_argument("--weights", default=None, help="aloituspainot, esim. \"empty=9,snake=1.2\"")
+    ap.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                    help="työprosessien määrä")
+    ap.add_argument("--checkpoint", default=None, help="tarkistuspisteen JSON-tiedosto")
+    ap.add_argument("--resume", action="store_true", help="jatka tarkistuspisteestä")
+    ap.add_argument("--report-depths", type=int, nargs="*", default=[1, 2, 3],
+                    help="raportin syvyydet (tyhjä = ei raporttia)")
+    ap.add_argument("--report-games", type=int, default=None,
+                    help="raportin pelit syvyyttä kohden (oletus --games)")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    from .tournament import parse_weights
+
+    args = parse_args(argv)
+    config = {"games": args.games, "depth": args.depth, "seed": args.seed,
+              "prob_cutoff": args.prob_cutoff}
+    if args.resume:
+        if not args.checkpoint:
+            raise SystemExit("--resume vaatii --checkpointin")
+        state = load_checkpoint(args.checkpoint)
+        if state.config != config:
+            raise SystemExit(f"tarkistuspisteen asetukset eroavat: {state.config}")
+        print(f"Jatketaan kierrokselta {state.round + 1}, paras {state.fitness:.0f}")
+    else:
+        state = initial_state(config, parse_weights(args.weights), args.step)
+
+    state = tune(state, args.rounds, args.checkpoint, args.workers)
+    print(f"\nPainot: {format_weights(state.weights)}")
+    print(f"Keskipisteet: {state.fitness:.0f} ({args.games} peliä, syvyys {args.depth})")
+    if args.report_depths:
+        print()
+        report(state.weights, args.report_depths, args.report_games or args.games,
+               args.seed + args.games, args.workers)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()